@@ -0,0 +1,173 @@
+"""Check that chat admission is first come, first served and sheds load cleanly.
+
+Drives AdmissionController with short sleeps in place of chats, then runs
+the /chat endpoint with a stub chain, asserts on the outcomes and exits 1 if
+any assertion fails:
+
+- queued requests are admitted in arrival order, also when slots are
+  released from a worker thread and while new requests keep arriving
+- a request arriving just as a slot frees up does not take it from a waiter
+- a request arriving to a full queue is rejected at once with 429
+- a request that waits past the queue timeout is rejected with 503
+- both rejections reach the client with a Retry-After header
+
+Run from app/services/v1:
+
+    $ python -m benchmarks.admission_check
+"""
+import argparse
+import asyncio
+import sys
+from typing import List
+
+from utils.concurrency import AdmissionControllerV1, OverloadedV1
+
+
+async def hold(controller: AdmissionControllerV1, name: str, admitted: List[str],
+               seconds: float) -> None:
+    async with controller.admit():
+        admitted.append(name)
+        await asyncio.sleep(seconds)
+
+
+def check_fifo() -> None:
+    """Waiters get slots in arrival order, late arrivals do not overtake them"""
+    async def scenario():
+        controller = AdmissionControllerV1(max_concurrent=2, max_queue=20, queue_timeout=5)
+        admitted: List[str] = []
+        tasks = []
+        for i in range(10):
+            tasks.append(asyncio.create_task(hold(controller, f"r{i}", admitted, 0.01)))
+            # Arrivals keep coming while earlier ones are queued
+            await asyncio.sleep(0.002)
+        await asyncio.gather(*tasks)
+        return admitted, controller.stats()
+
+    admitted, stats = asyncio.run(scenario())
+    assert admitted == [f"r{i}" for i in range(10)], f"admitted out of order: {admitted}"
+    assert stats["active"] == 0 and stats["queue_depth"] == 0, f"slots leaked: {stats}"
+
+
+def check_no_barging() -> None:
+    """A request arriving as a slot frees up queues behind the waiters"""
+    async def scenario():
+        controller = AdmissionControllerV1(max_concurrent=1, max_queue=10, queue_timeout=5)
+        order: List[str] = []
+
+        async def wait(name):
+            ticket = await controller.acquire()
+            order.append(name)
+            await asyncio.sleep(0.01)
+            ticket.release()
+
+        first = await controller.acquire()
+        waiter = asyncio.create_task(wait("queued"))
+        await asyncio.sleep(0.01)
+        first.release()
+        # Arrives before the woken waiter has run
+        await wait("late")
+        await waiter
+        return order
+
+    order = asyncio.run(scenario())
+    assert order == ["queued", "late"], f"a late arrival took the slot: {order}"
+
+
+def check_thread_release() -> None:
+    """Tickets released from a worker thread hand the slot to the oldest waiter"""
+    async def scenario():
+        controller = AdmissionControllerV1(max_concurrent=1, max_queue=10, queue_timeout=5)
+        admitted: List[str] = []
+        first = await controller.acquire()
+        waiters = []
+        for i in range(3):
+            waiters.append(asyncio.create_task(controller.acquire()))
+            await asyncio.sleep(0)
+        await asyncio.to_thread(first.release)
+        for i, waiter in enumerate(waiters):
+            ticket = await waiter
+            admitted.append(f"w{i}")
+            await asyncio.to_thread(ticket.release)
+        return admitted, controller.stats()
+
+    admitted, stats = asyncio.run(scenario())
+    assert admitted == ["w0", "w1", "w2"], f"admitted out of order: {admitted}"
+    assert stats["active"] == 0, f"slots leaked: {stats}"
+
+
+def check_rejections() -> None:
+    """429 when the queue is full, 503 after the queue timeout, both with Retry-After"""
+    async def scenario():
+        controller = AdmissionControllerV1(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        ticket = await controller.acquire()
+        queued = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        errors = []
+        try:
+            await controller.acquire()
+        except OverloadedV1 as e:
+            errors.append(e)
+        try:
+            await queued
+        except OverloadedV1 as e:
+            errors.append(e)
+        ticket.release()
+        # The slot is free again and the queue empty after both rejections
+        late = await asyncio.wait_for(controller.acquire(), 1)
+        late.release()
+        return errors, controller.stats()
+
+    errors, stats = asyncio.run(scenario())
+    codes = [e.status_code for e in errors]
+    assert codes == [429, 503], f"expected 429 then 503, got {codes}"
+    assert all(e.retry_after >= 1 for e in errors), "rejection without a Retry-After"
+    assert stats["rejected"] == {"queue_full": 1, "queue_timeout": 1}, stats["rejected"]
+    assert stats["active"] == 0 and stats["queue_depth"] == 0, f"slots leaked: {stats}"
+
+
+def check_endpoint() -> None:
+    """/chat answers 429 and 503 with a Retry-After header when admission rejects"""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    client = TestClient(main.app)
+    original = main.admission
+    try:
+        for status_code, reason in ((429, "queue_full"), (503, "queue_timeout")):
+            class Rejecting(AdmissionControllerV1):
+                async def acquire(self):
+                    raise OverloadedV1(status_code, 3, reason)
+
+            main.admission = Rejecting()
+            response = client.post("/chat", json={"message": "When does Paysoko CBD open?"})
+            assert response.status_code == status_code, \
+                f"{reason}: got {response.status_code}, expected {status_code}"
+            assert response.headers.get("Retry-After") == "3", f"{reason}: no Retry-After header"
+    finally:
+        main.admission = original
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skip-endpoint", action="store_true",
+                        help="Only check the controller, without importing the service")
+    args = parser.parse_args()
+
+    checks = [check_fifo, check_no_barging, check_thread_release, check_rejections]
+    if not args.skip_endpoint:
+        checks.append(check_endpoint)
+    failures = 0
+    for check in checks:
+        try:
+            check()
+            print(f"ok   {check.__doc__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"FAIL {e}")
+    print("OK" if not failures else f"{failures} check(s) failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Check which Cypher the embedded graph runs, and that the rest is answered gracefully.
+
+The embedded backend runs a read-only subset of Cypher. Queries built from
+the constructs the Cypher prompt allows must run on it, the constructs the
+prompt rules out (the ones LLMs like to write) must raise UnsupportedCypher,
+and a chain whose model writes such a query must still answer instead of
+raising. Exits 1 if any check fails.
+
+Run from app/services/v1:
+
+    $ python -m benchmarks.cypher_subset_check
+"""
+import argparse
+import asyncio
+import sys
+
+from utils.chatbots import PaysokoQAV1
+from utils.extractors import LocalEntityExtractorV1
+from utils.graphs import EmbeddedGraphV1, UnsupportedCypherV1
+from utils.models import StageModelsV1
+from benchmarks.stubs import StubGraph, stub_model_factory
+
+
+SUPPORTED = [
+    ("match and return", "MATCH (o:OfficeLocation) RETURN o.location_name AS name"),
+    ("where on a map literal", "MATCH (o:OfficeLocation {location_name: 'Paysoko CBD'}) RETURN o.address"),
+    ("relationship and where",
+     "MATCH (o:OfficeLocation)-[:WORKING_HOURS]->(h:OfficeHour) "
+     "WHERE h.day_of_week = 'Monday' RETURN o.location_name, h.opening_time"),
+    ("relationship variable", "MATCH (a:Appointment)-[r:SCHEDULED_AT]->(o:OfficeLocation) RETURN type(r), o.location_name"),
+    ("undirected relationship", "MATCH (o:OfficeLocation)-[:SCHEDULED_AT]-(a:Appointment) RETURN count(a)"),
+    ("optional match",
+     "MATCH (o:OfficeLocation) OPTIONAL MATCH (o)<-[:SCHEDULED_AT]-(a:Appointment) "
+     "RETURN o.location_name, count(a) AS appointments"),
+    ("with distinct and aggregates",
+     "MATCH (a:Appointment)-[:FOR_SERVICE]->(s:Services) WITH DISTINCT s "
+     "RETURN count(*) AS services, avg(s.cost_ksh) AS cost, min(s.duration_minutes), max(s.duration_minutes)"),
+    ("collect of a map",
+     "MATCH (o:OfficeLocation)-[:WORKING_HOURS]->(h:OfficeHour) "
+     "RETURN o.location_name, collect({day: h.day_of_week, opens: h.opening_time}) AS hours"),
+    ("order by, skip and limit", "MATCH (s:Services) RETURN s.service_name ORDER BY s.cost_ksh DESC SKIP 1 LIMIT 2"),
+    ("case and functions",
+     "MATCH (s:Services) RETURN toUpper(s.service_name), round(s.cost_ksh), "
+     "CASE WHEN s.cost_ksh > 100 THEN 'high' ELSE 'low' END AS band"),
+    ("string predicates",
+     "MATCH (o:OfficeLocation) WHERE toLower(o.location_name) CONTAINS 'cbd' "
+     "OR o.location_name STARTS WITH 'Paysoko K' OR o.address =~ '.*Road.*' RETURN o"),
+    ("in list and null checks",
+     "MATCH (a:Appointment) WHERE a.appointment_id IN ['APT001', 'APT002'] AND a.status IS NOT NULL "
+     "RETURN a.status, coalesce(a.notes, '') AS notes"),
+    ("labels and size", "MATCH (n:Services) RETURN labels(n), size(n.service_name)"),
+    ("two match clauses",
+     "MATCH (a:Appointment {appointment_id: 'APT001'}) MATCH (a)-[:SCHEDULED_AT]->(o:OfficeLocation) "
+     "RETURN o.address"),
+]
+
+UNSUPPORTED = [
+    ("map projection", "MATCH (o:OfficeLocation) RETURN o {.address, .location_name}"),
+    ("named path", "MATCH p = (a:Appointment)-[:SCHEDULED_AT]->(o:OfficeLocation) RETURN p"),
+    ("pattern predicate", "MATCH (o:OfficeLocation) WHERE NOT (o)<-[:SCHEDULED_AT]-() RETURN o"),
+    ("exists subquery", "MATCH (o:OfficeLocation) WHERE EXISTS { (o)-[:WORKING_HOURS]->() } RETURN o"),
+    ("list comprehension", "MATCH (s:Services) RETURN [x IN collect(s.cost_ksh) WHERE x > 100] AS costs"),
+    ("variable-length path", "MATCH (a:Appointment)-[*1..2]-(s:Services) RETURN s"),
+    ("return star", "MATCH (o:OfficeLocation) RETURN *"),
+    ("call", "CALL db.labels()"),
+    ("unwind", "UNWIND [1, 2] AS x RETURN x"),
+    ("union", "MATCH (o:OfficeLocation) RETURN o.location_name AS n UNION MATCH (s:Services) RETURN s.service_name AS n"),
+    ("write", "CREATE (o:OfficeLocation {location_name: 'New'})"),
+]
+
+
+def check_supported(graph) -> None:
+    """Every construct the prompt allows runs without error"""
+    for name, query in SUPPORTED:
+        try:
+            graph.query(query)
+        except UnsupportedCypherV1 as e:
+            raise AssertionError(f"{name}: rejected, {e}")
+
+
+def check_unsupported(graph) -> None:
+    """Every construct the prompt rules out raises UnsupportedCypher"""
+    for name, query in UNSUPPORTED:
+        try:
+            graph.query(query)
+        except UnsupportedCypherV1:
+            continue
+        raise AssertionError(f"{name}: ran instead of raising UnsupportedCypher")
+
+
+def check_prompt(graph) -> None:
+    """The embedded backend's rules are in the Cypher prompt"""
+    assert graph.cypher_rules, "embedded backend has no Cypher rules for the prompt"
+    qa = PaysokoQAV1(graph=graph, use_async_graph=False,
+                     entity_extractor=LocalEntityExtractorV1.from_csv(),
+                     stage_models=StageModelsV1(factory=stub_model_factory()))
+    system = qa.cypher_prompt_full.messages[0].prompt.template
+    assert graph.cypher_rules in system, "Cypher rules missing from the Cypher prompt"
+
+
+def check_chain() -> None:
+    """A chain whose model writes unsupported Cypher still answers, sync and async"""
+    for name, query in UNSUPPORTED[:3]:
+        factory = stub_model_factory(cypher=query)
+        qa = PaysokoQAV1(graph=StubGraph(latency_ms=0), use_async_graph=False,
+                         entity_extractor=LocalEntityExtractorV1.from_csv(),
+                         stage_models=StageModelsV1(factory=factory))
+        try:
+            answers = [qa.ask("Which offices have no appointments?", ""),
+                       asyncio.run(qa.a_ask("Which offices are never booked?", ""))]
+        except UnsupportedCypherV1 as e:
+            raise AssertionError(f"{name}: chain raised {e!r}")
+        assert all(answers), f"{name}: chain returned no answer"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    graph = EmbeddedGraphV1()
+    checks = [("supported", lambda: check_supported(graph)),
+              ("unsupported", lambda: check_unsupported(graph)),
+              ("prompt", lambda: check_prompt(graph)),
+              ("chain", check_chain)]
+    failures = 0
+    for name, check in checks:
+        try:
+            check()
+            print(f"ok   {name}")
+        except AssertionError as e:
+            failures += 1
+            print(f"FAIL {e}")
+    print("OK" if not failures else f"{failures} check(s) failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare batched, per-entity and graph mirror entity mapping.
+
+Run from app/services/v1:
+
+    $ python -m benchmarks.map_to_database_benchmark --latency-ms 2
+    $ python -m benchmarks.map_to_database_benchmark --live
+"""
+import argparse
+import statistics
+import time
+from types import SimpleNamespace
+
+from utils.graphs import EntityMapperV1, GraphMirrorV1
+from benchmarks.stubs import StubGraph
+
+
+def run(mapper: EntityMapperV1, entities, batched, iterations: int):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        mappings = mapper.resolve(entities, batched=batched)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, EntityMapperV1.format(mappings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=2.0,
+                        help="Simulated round trip per query for the stub graph")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--live", action="store_true",
+                        help="Use Neo4j from the NEO4J_* environment instead of the stub")
+    args = parser.parse_args()
+
+    if args.live:
+        from dotenv import load_dotenv
+        from utils.graphs import Neo4jBackendV1
+        load_dotenv()
+        graph = Neo4jBackendV1()
+    else:
+        graph = StubGraph(latency_ms=args.latency_ms)
+
+    # Three services and two days, the example from the request
+    entities = SimpleNamespace(
+        office_locations=[],
+        services=["Money Transfer", "Bill Payment", "International Remittance"],
+        appointments=[],
+        office_hours=["Monday", "Saturday"],
+    )
+    mapper = EntityMapperV1(graph)
+    mirror = GraphMirrorV1(graph)
+    mirror.refresh()
+
+    results = {}
+    for name, mapper, batched in [("per-entity", mapper, False),
+                                  ("batched", mapper, True),
+                                  ("mirror", EntityMapperV1(graph, mirror=mirror), None)]:
+        trips_before = getattr(graph, "round_trips", 0)
+        timings, text = run(mapper, entities, batched, args.iterations)
+        trips = (getattr(graph, "round_trips", 0) - trips_before) / args.iterations
+        results[name] = text
+        print(f"{name:>10}: mean {statistics.mean(timings):7.2f} ms  "
+              f"p50 {statistics.median(timings):7.2f} ms  "
+              f"max {max(timings):7.2f} ms  round trips/question {trips:.0f}")
+
+    if results["per-entity"] != results["batched"]:
+        print("WARNING: batched mapping text differs from the per-entity loop")
+    # Mirror scores are not Lucene scores, only the matched values must agree
+    if [line.split(" with score")[0] for line in results["mirror"].splitlines()] != \
+            [line.split(" with score")[0] for line in results["batched"].splitlines()]:
+        print("WARNING: mirror mapping matches differ from the graph")
+    print(results["batched"])
+
+
+if __name__ == "__main__":
+    main()
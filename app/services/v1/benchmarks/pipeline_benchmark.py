@@ -0,0 +1,260 @@
+"""Per-stage and end-to-end latency of the QA pipeline at several concurrency levels.
+
+Runs PaysokoQA's chains against stub chat models with canned structured
+outputs and the stub graph, so no Anthropic or Neo4j access is needed.
+Stage timings come from the pipeline's own timing spans. Results are
+written as JSON and can be compared with an earlier run. Run from
+app/services/v1:
+
+    $ python -m benchmarks.pipeline_benchmark --concurrency 1,4,16
+    $ python -m benchmarks.pipeline_benchmark --compare benchmarks/results/pipeline-abc1234.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from utils.caches import AnswerCacheV1, CypherTemplateCacheV1, QueryResultCacheV1
+from utils.chatbots import PaysokoQAV1
+from utils.graphs import EmbeddedGraphV1
+from utils.models import StageModelsV1
+from benchmarks.stubs import AsyncStubGraph, MODEL_LATENCY_MS, StubGraph, stub_model_factory
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Stages faster than this are all noise, they are shown but never fail a comparison
+MIN_COMPARE_MS = 1.0
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Linearly interpolated percentile, share between 0 and 1"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = share * (len(ordered) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+    }
+
+
+def question_pool(graph: StubGraph, size: int, seed: int) -> Dict[str, Dict[str, List[str]]]:
+    """Questions about real offices, services and appointments with their entities"""
+    rng = random.Random(seed)
+    offices = [row["location_name"] for row in graph.rows["OfficeLocation"]]
+    services = [row["service_name"] for row in graph.rows["Services"]]
+    appointments = [row["appointment_id"] for row in graph.rows["Appointment"]]
+    days = sorted({row["day_of_week"] for row in graph.rows["OfficeHour"]})
+    pool = {}
+    while len(pool) < size:
+        kind = rng.randrange(3)
+        number = len(pool)
+        if kind == 0:
+            office, day = rng.choice(offices), rng.choice(days)
+            pool[f"When does {office} open on {day}? (#{number})"] = {
+                "office_locations": [office], "office_hours": [day]}
+        elif kind == 1:
+            service = rng.choice(services)
+            pool[f"How much does {service} cost and how long does it take? (#{number})"] = {
+                "services": [service]}
+        else:
+            appointment = rng.choice(appointments)
+            pool[f"What is the status of appointment {appointment}? (#{number})"] = {
+                "appointments": [appointment]}
+    return pool
+
+
+def build_qa(args, pool: Dict[str, Dict]) -> PaysokoQAV1:
+    def structured(schema, prompt_text: str) -> Dict:
+        for question, entities in pool.items():
+            if question in prompt_text:
+                return entities
+        return {}
+
+    latency_ms = {model: latency * args.latency_scale
+                  for model, latency in MODEL_LATENCY_MS.items()}
+    stage_models = StageModelsV1(factory=stub_model_factory(
+        latency_ms, slow_rate=args.slow_rate, seed=args.seed, structured=structured))
+    if args.graph == "embedded":
+        # Real Cypher over data/*.csv, no simulated round trip
+        graph = EmbeddedGraphV1()
+        async_graph = graph.async_graph()
+    else:
+        graph = StubGraph(latency_ms=args.graph_latency_ms)
+        async_graph = AsyncStubGraph(graph)
+    caches = {}
+    if not args.caches:
+        # Every question pays for every stage
+        caches = {"answer_cache": AnswerCacheV1(max_size=0),
+                  "template_cache": CypherTemplateCacheV1(max_size=0),
+                  "result_cache": QueryResultCacheV1(max_bytes=0)}
+    return PaysokoQAV1(
+        graph=graph, async_graph=async_graph, stage_models=stage_models,
+        use_local_extractor=False, use_router=False,
+        parallel_stages=args.parallel_stages, micro_batching=args.micro_batching,
+        **caches)
+
+
+async def run_level(qa: PaysokoQAV1, questions: List[str], concurrency: int) -> Dict:
+    """Closed loop: `concurrency` workers ask the questions as fast as they can"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for question in questions:
+        queue.put_nowait(question)
+    chain_ms: List[float] = []
+    stage_ms: Dict[str, List[float]] = defaultdict(list)
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            question = queue.get_nowait()
+            trace = {}
+            start = time.perf_counter()
+            try:
+                await qa.a_ask(question, tone_of_voice="friendly", trace=trace)
+            except Exception as e:
+                errors += 1
+                print(f"Error answering benchmark question: {e}")
+                continue
+            chain_ms.append((time.perf_counter() - start) * 1000)
+            for stage, ms in trace.get("stage_ms", {}).items():
+                stage_ms[stage].append(ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": len(questions),
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(chain_ms) / wall, 3) if wall else 0.0,
+        "chain": summarize(chain_ms),
+        "stages": {stage: summarize(values) for stage, values in sorted(stage_ms.items())},
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_level(level: Dict) -> None:
+    print(f"concurrency {level['concurrency']:>3}: {level['throughput_rps']:7.1f} req/s  "
+          f"errors {level['errors']}")
+    rows = [("chain", level["chain"])] + list(level["stages"].items())
+    for name, stats in rows:
+        print(f"  {name:>12}: p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+              f"p99 {stats['p99_ms']:8.2f} ms  n={stats['count']}")
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Print p95 changes against a baseline, returns the regressions past threshold"""
+    regressions = []
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\nAgainst {baseline['meta'].get('commit') or 'baseline'} (p95, + is slower):")
+    for level in current["levels"]:
+        old = previous.get(level["concurrency"])
+        if old is None:
+            continue
+        rows = [("chain", level["chain"], old["chain"])] + [
+            (stage, stats, old["stages"][stage])
+            for stage, stats in level["stages"].items() if stage in old["stages"]]
+        for name, new_stats, old_stats in rows:
+            if not old_stats["p95_ms"]:
+                continue
+            change = new_stats["p95_ms"] / old_stats["p95_ms"] - 1
+            print(f"  c={level['concurrency']:<3} {name:>12}: {old_stats['p95_ms']:8.2f} -> "
+                  f"{new_stats['p95_ms']:8.2f} ms ({change:+.1%})")
+            if change > threshold and old_stats["p95_ms"] >= MIN_COMPARE_MS:
+                regressions.append(f"c={level['concurrency']} {name} p95 {change:+.1%}")
+        throughput = level["throughput_rps"] / old["throughput_rps"] - 1 \
+            if old["throughput_rps"] else 0.0
+        print(f"  c={level['concurrency']:<3} {'throughput':>12}: {old['throughput_rps']:8.1f} -> "
+              f"{level['throughput_rps']:8.1f} req/s ({throughput:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16",
+                        help="Comma separated concurrency levels")
+    parser.add_argument("--questions", type=int, default=60,
+                        help="Questions asked at each concurrency level")
+    parser.add_argument("--latency-scale", type=float, default=0.1,
+                        help="Multiplier on the stub model latencies")
+    parser.add_argument("--graph", choices=["stub", "embedded"], default="stub",
+                        help="Stub graph with canned rows or the embedded graph backend")
+    parser.add_argument("--graph-latency-ms", type=float, default=2.0,
+                        help="Simulated round trip per Neo4j query, stub graph only")
+    parser.add_argument("--slow-rate", type=float, default=0.0,
+                        help="Share of model calls that are 10x slower than usual")
+    parser.add_argument("--parallel-stages", action="store_true")
+    parser.add_argument("--micro-batching", action="store_true")
+    parser.add_argument("--caches", action="store_true",
+                        help="Keep the answer, template and result caches on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON results file, default benchmarks/results/ (git ignored)")
+    parser.add_argument("--compare", help="Earlier results file to compare p95 against")
+    parser.add_argument("--fail-over", type=float, default=None,
+                        help="Exit 1 if any p95 is this much slower than --compare, e.g. 0.2")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {
+        "meta": {
+            "benchmark": "pipeline",
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "args": {key: value for key, value in vars(args).items()
+                     if key not in ("output", "compare", "fail_over")},
+        },
+        "levels": [],
+    }
+    for concurrency in [int(level) for level in args.concurrency.split(",")]:
+        # A fresh pipeline per level so caches and stats do not carry over
+        pool = question_pool(StubGraph(latency_ms=0), args.questions, args.seed)
+        qa = build_qa(args, pool)
+        level = asyncio.run(run_level(qa, list(pool), concurrency))
+        results["levels"].append(level)
+        print_level(level)
+
+    output = Path(args.output) if args.output else \
+        RESULTS_DIR / f"pipeline-{commit or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file),
+                                  args.fail_over if args.fail_over is not None else float("inf"))
+        if args.fail_over is not None and regressions:
+            print("Regressions: " + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
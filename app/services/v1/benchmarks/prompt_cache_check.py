@@ -0,0 +1,148 @@
+"""Check that every LLM call sends a stable, cache-marked prompt prefix.
+
+Runs the QA chain offline against real ChatAnthropic models wired to a stub
+client, then asserts on the recorded request payloads and exits 1 if any
+assertion fails, so it can guard CI against prompt changes that break caching:
+
+- every request has one cache_control marker, on the system prompt
+- no question text appears in the marked prefix
+- entities and response calls share one prefix, Cypher calls one per schema slice
+- repeat prefixes are reported as cache reads in the per-stage usage
+
+Run from app/services/v1:
+
+    $ python -m benchmarks.prompt_cache_check
+    $ python -m benchmarks.prompt_cache_check --min-cache-tokens 1024
+"""
+import argparse
+import asyncio
+import json
+import sys
+from collections import defaultdict
+
+from utils.chatbots import PaysokoQAV1
+from utils.extractors import LocalEntityExtractorV1
+from utils.models import StageModelsV1
+from benchmarks.stubs import StubAnthropicClient, StubGraph, cache_prefix, stub_anthropic_factory
+
+
+QUESTIONS = [
+    "When does Paysoko CBD open on Monday?",
+    "What time does Paysoko Karen close on Saturday?",
+    "How much does Money Transfer cost?",
+    "How long does a Bill Payment take?",
+    "What is the status of appointment APT001?",
+    "Can you tell me something about your company?",
+    "Which of your offices would you recommend for a first visit?",
+    "I need help, who should I talk to?",
+]
+
+TONE = """
+Response Style:
+- Professional yet friendly
+- Clear and concise
+"""
+
+# Smallest prefix Anthropic caches, in tokens
+MIN_CACHE_TOKENS = {"claude-3-haiku-20240307": 2048, "claude-3-5-haiku-20241022": 2048}
+
+
+def stage_of(payload) -> str:
+    if payload.get("tools"):
+        return "entities"
+    return "cypher" if "Cypher query" in json.dumps(payload["messages"]) and \
+        "Generate a Cypher" in json.dumps(payload["system"]) else "response"
+
+
+def run(prompt_caching: bool, min_cache_tokens: int):
+    client = StubAnthropicClient(min_cache_tokens=min_cache_tokens)
+    qa = PaysokoQAV1(
+        graph=StubGraph(latency_ms=0), use_async_graph=False,
+        entity_extractor=LocalEntityExtractorV1.from_csv(),
+        stage_models=StageModelsV1(factory=stub_anthropic_factory(client)),
+        prompt_caching=prompt_caching)
+    for question in QUESTIONS[:len(QUESTIONS) // 2]:
+        qa.ask(question, TONE)
+
+    async def ask_async():
+        await asyncio.gather(*(qa.a_ask(question, TONE)
+                               for question in QUESTIONS[len(QUESTIONS) // 2:]))
+    asyncio.run(ask_async())
+    return qa, client
+
+
+def check_markers(qa, client) -> None:
+    """One marker per request, on the system prompt, with no question text before it"""
+    for payload in client.requests:
+        stage = stage_of(payload)
+        system = payload.get("system") or []
+        markers = [block for block in system if "cache_control" in block]
+        assert len(markers) == 1 and "cache_control" in system[-1], \
+            f"{stage}: expected one cache marker on the system prompt"
+        prefix = json.dumps(cache_prefix(payload))
+        leaked = [q for q in QUESTIONS if q in prefix]
+        assert not leaked, f"{stage}: question text in the cached prefix: {leaked[0]}"
+
+
+def check_stable_prefixes(qa, client) -> None:
+    """Entities and response share one prefix, Cypher has at most one per schema slice"""
+    prefixes = defaultdict(set)
+    for payload in client.requests:
+        prefixes[stage_of(payload)].add(json.dumps(cache_prefix(payload)))
+    slices = qa.prompt_assembler.stats()["schema_slices"] + 1
+    for stage, allowed in (("entities", 1), ("response", 1), ("cypher", slices)):
+        assert len(prefixes[stage]) <= allowed, \
+            f"{stage}: {len(prefixes[stage])} distinct prefixes, expected at most {allowed}"
+    if client.min_cache_tokens:
+        return
+    for stage, info in qa.stage_models.info().items():
+        usage = info["usage"]
+        assert usage["calls"] <= len(prefixes[stage]) or usage["cache_read_tokens"], \
+            f"{stage}: repeated prefixes but no cache reads recorded"
+
+
+def check_disabled(min_cache_tokens: int) -> None:
+    """With caching off nothing may be marked"""
+    _, plain = run(prompt_caching=False, min_cache_tokens=min_cache_tokens)
+    assert not any(cache_prefix(payload) for payload in plain.requests), \
+        "cache markers sent with prompt caching disabled"
+
+
+def report(qa, client) -> None:
+    """Usage per stage and whether its prefix would be cached by Anthropic"""
+    print(f"{'stage':>9} {'calls':>6} {'input':>7} {'cache write':>12} {'cache read':>11}  prefix tokens")
+    for stage, info in qa.stage_models.info().items():
+        usage = info["usage"]
+        sizes = sorted({len(json.dumps(cache_prefix(p))) // 4 for p in client.requests
+                        if stage_of(p) == stage and cache_prefix(p)})
+        minimum = MIN_CACHE_TOKENS.get(info["model"], 1024)
+        note = "" if sizes and min(sizes) >= minimum else \
+            f"  (below the {minimum} token minimum for {info['model']}, not cached live)"
+        print(f"{stage:>9} {usage['calls']:>6} {usage['input_tokens']:>7} "
+              f"{usage['cache_write_tokens']:>12} {usage['cache_read_tokens']:>11}  {sizes}{note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-cache-tokens", type=int, default=0,
+                        help="Simulate Anthropic's minimum cacheable prefix length")
+    args = parser.parse_args()
+
+    qa, client = run(prompt_caching=True, min_cache_tokens=args.min_cache_tokens)
+    report(qa, client)
+    checks = [lambda: check_markers(qa, client),
+              lambda: check_stable_prefixes(qa, client),
+              lambda: check_disabled(args.min_cache_tokens)]
+    failures = 0
+    for check in checks:
+        try:
+            check()
+        except AssertionError as e:
+            failures += 1
+            print(f"FAIL {e}")
+    print("OK" if not failures else f"{failures} check(s) failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
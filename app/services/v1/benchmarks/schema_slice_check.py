@@ -0,0 +1,97 @@
+"""Check that the pruned Cypher schema still answers each benchmark question.
+
+For every question type the benchmarks ask, plus questions that name a type
+("which services") rather than an entity, the schema slice the Cypher prompt
+would get is built from local extraction and type words. The labels and
+relationship types of a reference query for the question must all be in the
+slice. Exits 1 if any is missing, and reports how much of the schema each
+slice keeps.
+
+Run from app/services/v1:
+
+    $ python -m benchmarks.schema_slice_check
+"""
+import argparse
+import re
+import sys
+from types import SimpleNamespace
+
+from utils.caches.query_result_cache_v1 import ANY_LABEL, query_labels
+from utils.extractors import LocalEntityExtractorV1
+from utils.graphs import EmbeddedGraphV1, SchemaSnapshotV1
+from utils.prompts import PromptAssemblerV1
+from utils.prompts.prompt_assembler_v1 import estimate_tokens
+
+
+# Question types from pipeline_benchmark and prompt_cache_check, and a query that answers each
+CASES = [
+    ("When does Paysoko CBD open on Monday?",
+     "MATCH (o:OfficeLocation)-[:WORKING_HOURS]->(h:OfficeHour) RETURN h"),
+    ("What time does Paysoko Karen close on Saturday?",
+     "MATCH (o:OfficeLocation)-[:WORKING_HOURS]->(h:OfficeHour) RETURN h"),
+    ("How much does Money Transfer cost and how long does it take?",
+     "MATCH (s:Services) RETURN s.cost_ksh, s.duration_minutes"),
+    ("How long does a Bill Payment take?",
+     "MATCH (s:Services) RETURN s.duration_minutes"),
+    ("What is the status of appointment APT001?",
+     "MATCH (a:Appointment) RETURN a.status"),
+    ("Where is my appointment APT001?",
+     "MATCH (a:Appointment)-[:SCHEDULED_AT]->(o:OfficeLocation) RETURN o.address"),
+    ("Which services can I get at Paysoko CBD?",
+     "MATCH (a:Appointment)-[:SCHEDULED_AT]->(o:OfficeLocation), "
+     "(a)-[:FOR_SERVICE]->(s:Services) RETURN DISTINCT s.service_name"),
+    ("Which offices offer Money Transfer?",
+     "MATCH (a:Appointment)-[:FOR_SERVICE]->(s:Services), "
+     "(a)-[:SCHEDULED_AT]->(o:OfficeLocation) RETURN DISTINCT o.location_name"),
+    ("What are the opening hours at Paysoko Karen?",
+     "MATCH (o:OfficeLocation)-[:WORKING_HOURS]->(h:OfficeHour) RETURN h"),
+    ("Which appointments are booked for Bill Payment?",
+     "MATCH (a:Appointment)-[:FOR_SERVICE]->(s:Services) RETURN a"),
+    ("Which branches are open on Sunday?",
+     "MATCH (o:OfficeLocation)-[:WORKING_HOURS]->(h:OfficeHour) RETURN o"),
+    ("Can you tell me something about your company?", None),
+    ("I need help, who should I talk to?", None),
+]
+
+
+def needed(query: str, relationships) -> set:
+    """Labels and relationship types the query reads, unlabeled nodes from their relationships"""
+    endpoints = {}
+    for rel in relationships:
+        endpoints.setdefault(rel["type"], set()).update((rel["start"], rel["end"]))
+    return {label for label in query_labels(query, None, endpoints) if label != ANY_LABEL}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hops", type=int, default=1)
+    args = parser.parse_args()
+
+    graph = EmbeddedGraphV1()
+    snapshot = SchemaSnapshotV1(graph)
+    assembler = PromptAssemblerV1(snapshot, hops=args.hops)
+    extractor = LocalEntityExtractorV1.from_csv()
+    full = estimate_tokens(snapshot.schema_text)
+
+    failures = 0
+    sliced = 0
+    for question, query in CASES:
+        entities = SimpleNamespace(**extractor.extract(question).entities)
+        labels = assembler.labels(entities, None, question)
+        text = assembler.schema_for(labels)
+        missing = sorted(label for label in needed(query or "", snapshot.state.structured_schema["relationships"])
+                         if not re.search(rf"\b{label}\b", text))
+        sliced += text != snapshot.schema_text
+        status = "FAIL" if missing else "ok  "
+        failures += bool(missing)
+        print(f"{status} {estimate_tokens(text):>4}/{full} tokens  {sorted(labels)}  {question}"
+              + (f"  missing {missing}" if missing else ""))
+    if not sliced:
+        failures += 1
+        print("FAIL every question fell back to the full schema")
+    print("OK" if not failures else f"{failures} check(s) failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare end-to-end latency across per-stage model configurations.
+
+Runs the full chain against stub models and the stub graph, so no
+Anthropic or Neo4j credentials are needed. Run from app/services/v1:
+
+    $ python -m benchmarks.stage_models_benchmark --questions 40 --slow-rate 0.1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from utils.caches import AnswerCacheV1, CypherTemplateCacheV1
+from utils.chatbots import PaysokoQAV1
+from utils.models import StageModelConfigV1, StageModelsV1
+from utils.models.stage_models_v1 import DEFAULT_STAGE_MODELS, STAGES
+from benchmarks.stubs import AsyncStubGraph, MODEL_LATENCY_MS, StubGraph, stub_model_factory
+
+OPUS = "claude-3-opus-20240229"
+
+
+def configurations(scale: float):
+    """Opus everywhere (the old setup), per-stage models, per-stage with budgets"""
+    per_stage = {stage: StageModelConfigV1(config.model, config.max_tokens)
+                 for stage, config in DEFAULT_STAGE_MODELS.items()}
+    # Budget each primary at twice its usual latency
+    budgeted = {stage: StageModelConfigV1(
+        config.model, config.max_tokens,
+        timeout=2 * MODEL_LATENCY_MS[config.model] * scale / 1000,
+        fallbacks=list(config.fallbacks))
+        for stage, config in DEFAULT_STAGE_MODELS.items()}
+    return {
+        "opus-everywhere": {stage: StageModelConfigV1(OPUS) for stage in STAGES},
+        "per-stage": per_stage,
+        "per-stage+budget": budgeted,
+    }
+
+
+def percentile(values, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+async def run(configs, questions: int, scale: float, slow_rate: float, seed: int):
+    latency_ms = {model: latency * scale for model, latency in MODEL_LATENCY_MS.items()}
+    stage_models = StageModelsV1(configs, factory=stub_model_factory(
+        latency_ms, slow_rate=slow_rate, seed=seed))
+    graph = StubGraph(latency_ms=1)
+    qa = PaysokoQAV1(
+        graph=graph, async_graph=AsyncStubGraph(graph), stage_models=stage_models,
+        # Every question pays for all three stages
+        answer_cache=AnswerCacheV1(max_size=0),
+        template_cache=CypherTemplateCacheV1(max_size=0),
+        use_local_extractor=False, use_router=False)
+    timings = []
+    for number in range(questions):
+        start = time.perf_counter()
+        await qa.a_ask(f"Question {number} about Paysoko CBD", tone_of_voice="friendly")
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, stage_models.info()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--slow-rate", type=float, default=0.1,
+                        help="Share of model calls that are 10x slower than usual")
+    parser.add_argument("--latency-scale", type=float, default=0.25,
+                        help="Multiplier on the stub model latencies")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name, configs in configurations(args.latency_scale).items():
+        timings, info = asyncio.run(run(configs, args.questions, args.latency_scale,
+                                        args.slow_rate, args.seed))
+        fallbacks = sum(stage["fallbacks_used"] for stage in info.values())
+        print(f"{name:>17}: mean {statistics.mean(timings):7.1f} ms  "
+              f"p50 {percentile(timings, 0.5):7.1f} ms  "
+              f"p95 {percentile(timings, 0.95):7.1f} ms  "
+              f"max {max(timings):7.1f} ms  fallbacks {fallbacks}")
+        print(" " * 19 + ", ".join(f"{stage}={info[stage]['model']}" for stage in STAGES))
+
+
+if __name__ == "__main__":
+    main()
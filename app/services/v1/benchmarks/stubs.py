@@ -0,0 +1,284 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda, RunnableParallel
+from pydantic import PrivateAttr
+
+from utils.graphs import AsyncGraphBackendV1, EmbeddedGraphV1
+
+
+class StubGraph(EmbeddedGraphV1):
+    """EmbeddedGraph over data/*.csv with a simulated network round trip.
+
+    Queries are answered by the same graph, mirror and Cypher subset as
+    GRAPH_BACKEND=embedded, so the benchmarks cannot drift from it. Every
+    call to query sleeps for `latency_ms` and counts a round trip.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_ms: float = 2.0, data_dir: Optional[str] = None):
+        self.latency_ms = latency_ms
+        self.round_trips = 0
+        super().__init__(data_dir)
+
+    @property
+    def rows(self) -> Dict[str, List[Dict]]:
+        """Node properties by label"""
+        return {label: [node.props for node in nodes]
+                for label, nodes in self.store.by_label.items()}
+
+    def _round_trip(self) -> None:
+        with self._lock:
+            self.round_trips += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def query(self, query: str, params: Optional[Dict] = None) -> List[Dict]:
+        self._round_trip()
+        return super().query(query, params)
+
+    def fulltext(self, index_name: str, value: str) -> List[Dict]:
+        self._round_trip()
+        return super().fulltext(index_name, value)
+
+    def match_hours(self, value: str) -> List[Dict]:
+        self._round_trip()
+        return super().match_hours(value)
+
+    def batched_lookups(self, lookups: List[Dict]) -> List[Dict]:
+        """Every lookup in one round trip, like Neo4j's UNWIND query"""
+        self._round_trip()
+        rows = []
+        for lookup in lookups:
+            if lookup["indexName"] is None:
+                found = EmbeddedGraphV1.match_hours(self, lookup["value"])
+            else:
+                found = EmbeddedGraphV1.fulltext(self, lookup["indexName"], lookup["value"])
+            rows += [{"position": lookup["position"], **row} for row in found]
+        return rows
+
+
+class AsyncStubGraph(AsyncGraphBackendV1):
+    """Awaitable StubGraph, latency is an asyncio sleep"""
+
+    async def _run(self, method: Callable[..., List[Dict]], *args) -> List[Dict]:
+        async with self.limit:
+            graph = self.backend
+            latency_ms, graph.latency_ms = graph.latency_ms, 0
+            try:
+                rows = method(*args)
+            finally:
+                graph.latency_ms = latency_ms
+            if latency_ms:
+                await asyncio.sleep(latency_ms / 1000)
+            return rows
+
+
+# Rough relative latencies of the Anthropic tiers, in milliseconds
+MODEL_LATENCY_MS = {
+    "claude-3-opus-20240229": 400.0,
+    "claude-3-5-sonnet-20241022": 150.0,
+    "claude-3-5-haiku-20241022": 80.0,
+    "claude-3-haiku-20240307": 50.0,
+}
+
+STUB_CYPHER = "MATCH (o:OfficeLocation) RETURN o.location_name AS name"
+
+
+class StubChatModel(BaseChatModel):
+    """Stand-in for ChatAnthropic that sleeps instead of calling the API.
+
+    A share of calls (`slow_rate`) takes `slow_factor` times longer to model
+    tail latency. With a `timeout` set, calls slower than it sleep for the
+    timeout and raise TimeoutError, like a request hitting its deadline.
+    Structured output fields come from `structured(schema, prompt_text)`,
+    or are left at their defaults. Cypher prompts are answered with `cypher`.
+    """
+
+    model: str = "stub"
+    latency_ms: float = 50.0
+    slow_rate: float = 0.0
+    slow_factor: float = 10.0
+    timeout: Optional[float] = None
+    seed: Optional[int] = None
+    structured: Optional[Callable[[type, str], Dict[str, Any]]] = None
+    cypher: str = STUB_CYPHER
+    _random: random.Random = PrivateAttr(default=None)
+    _calls: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def _delay(self) -> float:
+        self._calls += 1
+        delay = self.latency_ms / 1000
+        if self.slow_rate and self._random.random() < self.slow_rate:
+            delay *= self.slow_factor
+        return delay
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = str(messages[-1].content).rstrip()
+        text = self.cypher if prompt.endswith("Cypher query:") else "stub answer"
+        # Rough token counts, about four characters per token
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        usage = {"input_tokens": input_tokens, "output_tokens": len(text) // 4,
+                 "total_tokens": input_tokens + len(text) // 4}
+        return ChatResult(generations=[ChatGeneration(
+            message=AIMessage(content=text, usage_metadata=usage))])
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                  **kwargs) -> ChatResult:
+        delay = self._delay()
+        if self.timeout is not None and delay > self.timeout:
+            time.sleep(self.timeout)
+            raise TimeoutError(f"{self.model} exceeded {self.timeout}s")
+        time.sleep(delay)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                         **kwargs) -> ChatResult:
+        delay = self._delay()
+        if self.timeout is not None and delay > self.timeout:
+            await asyncio.sleep(self.timeout)
+            raise TimeoutError(f"{self.model} exceeded {self.timeout}s")
+        await asyncio.sleep(delay)
+        return self._reply(messages)
+
+    def with_structured_output(self, schema, **kwargs) -> Runnable:
+        def canned(prompt: Any) -> Any:
+            messages = prompt if isinstance(prompt, list) else prompt.to_messages()
+            text = "\n".join(str(message.content) for message in messages)
+            return schema(**(self.structured(schema, text) if self.structured else {}))
+        # The model call supplies the latency, the canned value the output
+        return RunnableParallel(reply=self, parsed=RunnableLambda(canned)) | \
+            RunnableLambda(lambda result: result["parsed"])
+
+
+def stub_model_factory(latency_ms: Optional[Dict[str, float]] = None,
+                       slow_rate: float = 0.0, slow_factor: float = 10.0,
+                       seed: Optional[int] = 0,
+                       structured: Optional[Callable[[type, str], Dict[str, Any]]] = None,
+                       cypher: str = STUB_CYPHER) -> Callable[..., StubChatModel]:
+    """StageModels factory that builds StubChatModels with per-model latency"""
+    latency_ms = {**MODEL_LATENCY_MS, **(latency_ms or {})}
+    # One generator for every model so slow calls are not correlated across stages
+    shared = random.Random(seed)
+
+    def factory(model: str, max_tokens: int, timeout: Optional[float],
+                max_retries: int) -> StubChatModel:
+        stub = StubChatModel(model=model, latency_ms=latency_ms.get(model, 100.0),
+                             slow_rate=slow_rate, slow_factor=slow_factor,
+                             timeout=timeout, structured=structured, cypher=cypher)
+        stub._random = shared
+        return stub
+    return factory
+
+
+def cache_prefix(payload: Dict[str, Any]) -> Optional[List[Any]]:
+    """Request parts up to the last cache_control marker, in Anthropic's order
+
+    Tools come first, then system blocks, then message content. None when
+    nothing is marked.
+    """
+    parts: List[Any] = [payload["model"]]
+    parts.extend(payload.get("tools") or [])
+    system = payload.get("system") or []
+    parts.extend([{"type": "text", "text": system}] if isinstance(system, str) else system)
+    for message in payload.get("messages") or []:
+        content = message["content"]
+        parts.extend([{"type": "text", "text": content}] if isinstance(content, str) else content)
+    marked = [i for i, part in enumerate(parts)
+              if isinstance(part, dict) and "cache_control" in part]
+    return parts[:marked[-1] + 1] if marked else None
+
+
+class StubAnthropicClient:
+    """Offline stand-in for anthropic.Client that simulates prompt caching.
+
+    Every request payload is recorded. The prefix up to the last cache_control
+    marker is a cache entry: the first request with it reports a cache write,
+    later ones a cache read, in the same usage fields the API returns.
+    Prefixes shorter than min_cache_tokens are not cached, like the API.
+    """
+
+    def __init__(self, min_cache_tokens: int = 0):
+        self.min_cache_tokens = min_cache_tokens
+        self.requests: List[Dict[str, Any]] = []
+        self.cached: set = set()
+        self._lock = threading.Lock()
+        self.messages = self
+
+    def create(self, **payload) -> Any:
+        import anthropic.types as types
+
+        total = len(json.dumps(payload, default=str)) // 4
+        prefix = cache_prefix(payload)
+        read = write = 0
+        if prefix is not None:
+            key = json.dumps(prefix, sort_keys=True, default=str)
+            tokens = len(key) // 4
+            if tokens >= self.min_cache_tokens:
+                with self._lock:
+                    if key in self.cached:
+                        read = tokens
+                    else:
+                        self.cached.add(key)
+                        write = tokens
+        with self._lock:
+            self.requests.append(payload)
+
+        if payload.get("tools"):
+            content = [types.ToolUseBlock(type="tool_use", id="toolu_stub", input={},
+                                          name=payload["tools"][0]["name"])]
+        else:
+            last = payload["messages"][-1]["content"]
+            prompt = (last if isinstance(last, str) else last[-1]["text"]).rstrip()
+            text = STUB_CYPHER if prompt.endswith("Cypher query:") else "stub answer"
+            content = [types.TextBlock(type="text", text=text)]
+        return types.Message(
+            id="msg_stub", type="message", role="assistant", model=payload["model"],
+            content=content, stop_reason="end_turn", stop_sequence=None,
+            usage=types.Usage(input_tokens=total - read - write, output_tokens=5,
+                              cache_read_input_tokens=read,
+                              cache_creation_input_tokens=write))
+
+
+class AsyncStubAnthropicClient:
+    """Awaitable front for a StubAnthropicClient, sharing its cache and records"""
+
+    def __init__(self, client: StubAnthropicClient):
+        self.client = client
+        self.messages = self
+
+    async def create(self, **payload) -> Any:
+        return self.client.create(**payload)
+
+
+def stub_anthropic_factory(client: StubAnthropicClient) -> Callable[..., BaseChatModel]:
+    """StageModels factory for real ChatAnthropic models talking to a stub client"""
+    from langchain_anthropic import ChatAnthropic
+
+    def factory(model: str, max_tokens: int, timeout: Optional[float],
+                max_retries: int) -> BaseChatModel:
+        chat = ChatAnthropic(model=model, max_tokens=max_tokens, api_key="stub",
+                             default_request_timeout=timeout, max_retries=max_retries)
+        chat._client = client
+        chat._async_client = AsyncStubAnthropicClient(client)
+        return chat
+    return factory
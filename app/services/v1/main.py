@@ -1,21 +1,97 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict
+from starlette.background import BackgroundTask
+from typing import AsyncIterator, Dict, Optional
 
 # Custom model imports
 from schemas.QA import Question
+from schemas.Cache import CacheInvalidation
 
 # Chatbot impots
 from utils.chatbots import PaysokoQAV1
 
+# Concurrency imports
+from utils.concurrency import AdmissionControllerV1, OverloadedV1
+
+# Graph imports
+from utils.graphs import GraphBackendV1
+
 # Logger impots
-from utils.loggers import QALoggerV1
+from utils.loggers import AsyncQALoggerV1, QAArchiveV1
+
+
+async def refresh_mirror() -> None:
+    try:
+        await qa.arefresh_mirror()
+    except Exception as e:
+        print(f"Error refreshing graph mirror: {e}")
+
 
-app = FastAPI()
-logger = QALoggerV1()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Slow safety net, ingestion should call /schema/refresh explicitly
+    qa.schema_snapshot.start_background_refresh(
+        float(os.getenv("SCHEMA_REFRESH_SECONDS", "3600")))
+    # A mirror loaded from its snapshot may be stale, replace it from Neo4j
+    # without holding up startup, the snapshot serves until then
+    mirror_refresh = None
+    if qa.mirror is not None and qa.mirror.source != "graph":
+        mirror_refresh = asyncio.create_task(refresh_mirror())
+    yield
+    if mirror_refresh is not None:
+        mirror_refresh.cancel()
+        await asyncio.gather(mirror_refresh, return_exceptions=True)
+    await qa.schema_snapshot.stop_background_refresh()
+    # Close the async Neo4j connection pool
+    await qa.aclose()
+    # Flush queued QA logs
+    logger.close()
+
+
+app = FastAPI(lifespan=lifespan)
+# Rotated QA logs are compacted into Parquet segments
+archive = QAArchiveV1(os.getenv("QA_ARCHIVE_DIR", "qa_archive"))
+logger = AsyncQALoggerV1(on_rotate=archive.compact)
 
 # Initialize QA system
-qa = PaysokoQAV1()
+qa = PaysokoQAV1(parallel_stages=os.getenv("PARALLEL_STAGES", "0") == "1",
+                 use_mirror=os.getenv("GRAPH_MIRROR", "0") == "1",
+                 use_router=os.getenv("INTENT_ROUTER", "0") == "1",
+                 micro_batching=os.getenv("MICRO_BATCH", "0") == "1",
+                 batch_max_size=int(os.getenv("MICRO_BATCH_SIZE", "8")),
+                 batch_max_wait_ms=float(os.getenv("MICRO_BATCH_WAIT_MS", "5")),
+                 compact_prompts=os.getenv("COMPACT_PROMPTS", "1") == "1",
+                 prompt_caching=os.getenv("PROMPT_CACHING", "0") == "1",
+                 graph_backend=os.getenv("GRAPH_BACKEND", "neo4j"))
+
+# Chats beyond the limit wait briefly in a bounded queue, the rest are turned away
+admission = AdmissionControllerV1(
+    max_concurrent=int(os.getenv("CHAT_MAX_CONCURRENT", "32")),
+    max_queue=int(os.getenv("CHAT_MAX_QUEUE", "64")),
+    queue_timeout=float(os.getenv("CHAT_QUEUE_TIMEOUT", "5")))
+
+# Request metrics share the QA registry, served at /metrics
+request_seconds = qa.metrics.histogram(
+    "paysoko_request_duration_seconds", "Chat request latency", ["endpoint", "status"])
+qa.metrics.gauge(
+    "paysoko_admission_queue_depth", "Chats waiting for an admission slot",
+    lambda: {(): admission.stats()["queue_depth"]})
+qa.metrics.gauge(
+    "paysoko_admission_active", "Chats being answered",
+    lambda: {(): admission.stats()["active"]})
+qa.metrics.counter_callback(
+    "paysoko_admission_rejected_total", "Chats turned away by admission control",
+    lambda: {(reason,): count for reason, count in admission.stats()["rejected"].items()},
+    ["reason"])
+# Optional per-request stage breakdown in a Server-Timing header
+STAGE_TIMING_HEADER = os.getenv("STAGE_TIMING_HEADER", "0") == "1"
 
 # TODO: Move this else where
 # tone of voice
@@ -48,13 +124,45 @@ Things to Avoid:
 """
 
 
+async def admit():
+    """Admission ticket for a chat, 429 or 503 with Retry-After when overloaded"""
+    try:
+        return await admission.acquire()
+    except OverloadedV1 as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"Service overloaded ({e.reason}), retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+def server_timing(stage_ms: Dict[str, float]) -> str:
+    """Stage breakdown as a Server-Timing header value"""
+    return ", ".join(f"{stage};dur={ms}" for stage, ms in stage_ms.items())
+
+
 @app.post("/chat")
-async def chat_endpoint(question: Question) -> Dict:
+async def chat_endpoint(question: Question, http_response: Response) -> Dict:
+    started = time.perf_counter()
+    status = "error"
+    try:
+        ticket = await admit()
+    except HTTPException as e:
+        request_seconds.observe(time.perf_counter() - started, endpoint="chat",
+                                status=e.status_code)
+        raise
     try:
         # Get response
-        response = await qa.a_ask(question.message, tone_of_voice=TONE_GUIDE)
+        trace = {}
+        response = await qa.a_ask(question.message, tone_of_voice=TONE_GUIDE, trace=trace)
+        latencies = {"total_ms": round((time.perf_counter() - started) * 1000, 2), **trace}
         # Log Q&A responses
-        logger.log_qa(question=question.message, response=response)
+        logger.log_qa(question=question.message, response=response,
+                      stage_latencies=latencies)
+        if STAGE_TIMING_HEADER:
+            http_response.headers["Server-Timing"] = server_timing(
+                {**trace.get("stage_ms", {}), "total": latencies["total_ms"]})
+        status = "ok"
 
         return {
             "status": "success",
@@ -65,3 +173,165 @@ async def chat_endpoint(question: Question) -> Dict:
             status_code=500,
             detail=f"Error processing question: {str(e)}"
         )
+    finally:
+        ticket.release()
+        request_seconds.observe(time.perf_counter() - started, endpoint="chat", status=status)
+
+
+def format_sse(event: str, data) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(question: Question) -> StreamingResponse:
+    # Admitted before the response starts so overload can still be a 429/503
+    ticket = await admit()
+
+    async def event_stream() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        trace = {}
+        status = "error"
+        try:
+            async for event in qa.astream_ask(question.message, tone_of_voice=TONE_GUIDE,
+                                              trace=trace):
+                if event["event"] == "done":
+                    # Log the full answer once streaming has finished
+                    latencies = {"total_ms": round((time.perf_counter() - started) * 1000, 2),
+                                 **trace}
+                    logger.log_qa(question=question.message, response=event["data"],
+                                  stage_latencies=latencies)
+                    status = "ok"
+                yield format_sse(event["event"], event["data"])
+        except Exception as e:
+            yield format_sse("error", {
+                "detail": f"Error processing question: {str(e)}"
+            })
+        finally:
+            ticket.release()
+            request_seconds.observe(time.perf_counter() - started, endpoint="chat_stream",
+                                    status=status)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Releases the slot if the client is gone before the stream starts
+        background=BackgroundTask(ticket.release)
+    )
+
+
+@app.get("/cache/stats")
+async def cache_stats_endpoint() -> Dict:
+    return {
+        "status": "success",
+        "answer_cache": qa.answer_cache.stats(),
+        "template_cache": qa.template_cache.stats(),
+        "result_cache": qa.result_cache.stats(),
+        "graph_mirror": qa.mirror.info() if qa.mirror is not None else None
+    }
+
+
+@app.get("/logs/stats")
+async def logs_stats_endpoint() -> Dict:
+    return {
+        "status": "success",
+        "logger": logger.stats()
+    }
+
+
+@app.get("/logs/top-questions")
+async def logs_top_questions_endpoint(days: int = 7, limit: int = 10) -> Dict:
+    return {
+        "status": "success",
+        "questions": archive.top_questions(days=days, limit=limit)
+    }
+
+
+@app.get("/logs/search")
+async def logs_search_endpoint(text: str, start: Optional[datetime] = None,
+                               end: Optional[datetime] = None,
+                               limit: int = 100) -> Dict:
+    return {
+        "status": "success",
+        "results": archive.search_answers(text, start=start, end=end, limit=limit)
+    }
+
+
+@app.get("/pipeline/stats")
+async def pipeline_stats_endpoint() -> Dict:
+    return {
+        "status": "success",
+        "parallel_stages": qa.parallel_stages,
+        "overlap": qa.overlap_stats.stats(),
+        "single_flight": qa.single_flight.stats(),
+        "stage_models": qa.stage_models.info(),
+        "prompts": qa.prompt_assembler.stats(),
+        "graph_backend": qa.graph.info() if isinstance(qa.graph, GraphBackendV1) else None,
+        "micro_batching": {
+            "enabled": qa.micro_batching,
+            "entities": qa.entity_batcher.stats(),
+            "cypher": qa.cypher_batcher.stats()
+        },
+        "admission": {
+            "chat": admission.stats(),
+            "llm": qa.stage_models.limit.stats(),
+            "graph": qa.async_graph.limit.stats() if qa.async_graph is not None else None
+        }
+    }
+
+
+@app.get("/metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(qa.metrics.render(),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/router/stats")
+async def router_stats_endpoint(recent: int = 20) -> Dict:
+    return {
+        "status": "success",
+        "enabled": qa.router is not None,
+        "router": qa.router.stats(recent=recent) if qa.router is not None else None
+    }
+
+
+@app.post("/cache/invalidate")
+async def cache_invalidate_endpoint(
+        invalidation: Optional[CacheInvalidation] = None) -> Dict:
+    # Call after reloading graph data so stale answers are not served,
+    # pass the reloaded labels to keep unrelated query results
+    labels = invalidation.labels if invalidation else None
+    try:
+        # Reload the mirror first so new answers are not built from old data
+        mirror_refreshed = await qa.arefresh_mirror(labels)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error refreshing graph mirror: {str(e)}"
+        )
+    qa.invalidate_caches(labels=labels)
+    return {
+        "status": "success",
+        "mirror_refreshed": mirror_refreshed,
+        "answer_cache": qa.answer_cache.stats(),
+        "template_cache": qa.template_cache.stats(),
+        "result_cache": qa.result_cache.stats()
+    }
+
+
+@app.post("/schema/refresh")
+async def schema_refresh_endpoint() -> Dict:
+    try:
+        changed = await qa.schema_snapshot.arefresh()
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error refreshing schema: {str(e)}"
+        )
+    return {
+        "status": "success",
+        "changed": changed,
+        "schema": qa.schema_snapshot.info()
+    }
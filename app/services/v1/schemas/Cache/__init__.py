@@ -0,0 +1 @@
+from .cache_invalidation_schema import CacheInvalidation  # noqa
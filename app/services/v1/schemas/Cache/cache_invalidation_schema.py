@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class CacheInvalidation(BaseModel):
+    labels: Optional[List[str]] = None
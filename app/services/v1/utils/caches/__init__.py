@@ -0,0 +1,3 @@
+from .answer_cache_v1 import AnswerCache as AnswerCacheV1  # noqa
+from .cypher_template_cache_v1 import CypherTemplateCache as CypherTemplateCacheV1  # noqa
+from .query_result_cache_v1 import QueryResultCache as QueryResultCacheV1  # noqa
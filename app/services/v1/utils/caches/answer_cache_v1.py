@@ -0,0 +1,97 @@
+import hashlib
+import re
+import string
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase a question and drop punctuation and repeated whitespace"""
+    question = question.lower().translate(_PUNCTUATION)
+    return _WHITESPACE.sub(" ", question).strip()
+
+
+def tone_fingerprint(tone_of_voice: str) -> str:
+    """Short stable hash of a tone guide"""
+    return hashlib.sha256(tone_of_voice.encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    """In-process LRU cache of final answers with a per-entry TTL.
+
+    Keys are the normalized question plus a hash of the tone guide, so
+    "What time does Paysoko CBD open?" and "what time does paysoko cbd open"
+    share an entry while different tones never do.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(question: str, tone_of_voice: str) -> str:
+        """Build the cache key for a question and tone guide"""
+        return f"{tone_fingerprint(tone_of_voice)}:{normalize_question(question)}"
+
+    def get(self, question: str, tone_of_voice: str) -> Optional[str]:
+        """Return the cached answer or None if missing or expired"""
+        key = self.make_key(question, tone_of_voice)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, answer = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def set(self, question: str, tone_of_voice: str, answer: str,
+            ttl_seconds: Optional[float] = None) -> None:
+        """Store an answer, evicting the least recently used entries if full"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        key = self.make_key(question, tone_of_voice)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> int:
+        """Drop every entry, e.g. after the graph data has been reloaded"""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self.invalidations += 1
+            return dropped
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
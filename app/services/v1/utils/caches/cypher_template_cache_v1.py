@@ -0,0 +1,121 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .answer_cache_v1 import normalize_question
+
+
+class CypherTemplateCache:
+    """Parameterized Cypher queries cached per question shape.
+
+    A question's shape is its normalized text with every resolved entity
+    mention swapped for its type, e.g. "when does <OfficeLocation> open on
+    <OfficeHour>". Once the LLM has produced a working query for a shape, the
+    literal entity values in it are replaced by $p0, $p1, ... and later
+    questions with the same shape reuse the template with their own values.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._templates: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.rejected = 0
+
+    @staticmethod
+    def parameter_value(mapping: Dict) -> str:
+        """Database value a mapping contributes to a query"""
+        # Office hours map on the raw day/time, the result is only a summary
+        if mapping["type"] == "OfficeHour":
+            return mapping["entity"]
+        return mapping["result"]
+
+    def question_shape(self, question: str,
+                       mappings: List[Dict]) -> Optional[Tuple[str, Dict[str, str]]]:
+        """Return the shape of a question and the parameters it binds"""
+        if not mappings:
+            return None
+        shape = normalize_question(question)
+        found = []
+        for mapping in mappings:
+            if mapping.get("result") is None:
+                # An unresolved mention means the LLM has to improvise
+                return None
+            mention = normalize_question(mapping["entity"])
+            match = re.search(rf"\b{re.escape(mention)}\b", shape) if mention else None
+            if match is None:
+                return None
+            found.append((match.start(), mention, mapping))
+
+        found.sort(key=lambda item: item[0])
+        params = {}
+        for index, (_, mention, mapping) in enumerate(found):
+            shape = re.sub(rf"\b{re.escape(mention)}\b",
+                           f"<{mapping['type']}>", shape, count=1)
+            params[f"p{index}"] = self.parameter_value(mapping)
+        return shape, params
+
+    @staticmethod
+    def parameterize(query: str, params: Dict[str, str]) -> Optional[str]:
+        """Swap quoted literal values in a query for $parameters"""
+        values = list(params.values())
+        if len(set(values)) != len(values):
+            return None
+        for name, value in params.items():
+            literal = re.compile(rf"""(['"]){re.escape(value)}\1""")
+            if not literal.search(query):
+                return None
+            query = literal.sub(f"${name}", query)
+        return query
+
+    def lookup(self, question: str,
+               mappings: List[Dict]) -> Optional[Tuple[str, Dict[str, str]]]:
+        """Return (template, params) when a template exists for the shape"""
+        shaped = self.question_shape(question, mappings)
+        with self._lock:
+            template = self._templates.get(shaped[0]) if shaped else None
+            if template is None:
+                self.misses += 1
+                return None
+            self._templates.move_to_end(shaped[0])
+            self.hits += 1
+        return template, shaped[1]
+
+    def store(self, question: str, mappings: List[Dict], query: str) -> bool:
+        """Cache a validated query for the question's shape if possible"""
+        shaped = self.question_shape(question, mappings) if query else None
+        template = self.parameterize(query, shaped[1]) if shaped else None
+        with self._lock:
+            if template is None:
+                self.rejected += 1
+                return False
+            self._templates[shaped[0]] = template
+            self._templates.move_to_end(shaped[0])
+            self.stores += 1
+            while len(self._templates) > self.max_size:
+                self._templates.popitem(last=False)
+        return True
+
+    def invalidate(self) -> int:
+        """Drop every template, e.g. after the graph schema changed"""
+        with self._lock:
+            dropped = len(self._templates)
+            self._templates.clear()
+            return dropped
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._templates),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import pickle
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+# Fulltext indexes and the label each one covers
+INDEX_LABELS = {
+    "locationIndex": "OfficeLocation",
+    "serviceIndex": "Services",
+    "appointmentIndex": "Appointment",
+    "officeHours": "OfficeHour",
+}
+
+ANY_LABEL = "*"
+
+_WHITESPACE = re.compile(r"\s+")
+_LABEL = re.compile(r"\(\s*\w*\s*((?::\s*`?\w+`?\s*)+)")
+_REL_TYPE = re.compile(r"\[\s*\w*\s*:\s*`?(\w+)`?")
+# Node patterns without a label, e.g. (h) or (h {day_of_week: $day}) next to an arrow
+_NODE = r"\(\s*\w*\s*(?:\{[^}]*\})?\s*\)"
+_UNLABELED = re.compile(rf"(?:\bMATCH\s*|[->,]\s*){_NODE}|{_NODE}\s*<?-", re.IGNORECASE)
+# Relationships without a type, e.g. (a)--(b) or (a)-[r]->(b)
+_UNTYPED_REL = re.compile(r"\)\s*<?-\s*(?:\[\s*\w*\s*(?:\{[^}]*\})?\s*\]\s*)?-?>?\s*\(")
+_WRITE = re.compile(r"\b(CREATE|MERGE|SET|DELETE|REMOVE|DETACH|DROP|LOAD\s+CSV)\b",
+                    re.IGNORECASE)
+
+
+def normalize_cypher(query: str) -> str:
+    """Collapse whitespace and trailing semicolons so equivalent text shares a key"""
+    return _WHITESPACE.sub(" ", query).strip().rstrip(";").strip()
+
+
+def query_labels(query: str, params: Optional[Dict] = None,
+                 endpoints: Optional[Dict[str, Set[str]]] = None) -> Set[str]:
+    """Labels and relationship types a read query can touch.
+
+    Unlabeled nodes get the end labels of the query's relationship types from
+    endpoints, or "*" when a relationship is untyped or its type is unknown.
+    """
+    labels = set()
+    for chain in _LABEL.findall(query):
+        labels.update(label.strip(" `") for label in chain.split(":") if label.strip(" `"))
+    rel_types = set(_REL_TYPE.findall(query))
+    labels.update(rel_types)
+    if _UNLABELED.search(query):
+        endpoints = endpoints or {}
+        if not rel_types or _UNTYPED_REL.search(query) or not rel_types <= endpoints.keys():
+            return {ANY_LABEL}
+        for rel_type in rel_types:
+            labels.update(endpoints[rel_type])
+    # Fulltext lookups name their index rather than a label
+    searched = query + json.dumps(params or {}, default=str)
+    labels.update(label for index, label in INDEX_LABELS.items() if index in searched)
+    return labels or {ANY_LABEL}
+
+
+class QueryResultCache:
+    """Read-through cache of Cypher results with invalidation by label.
+
+    Results are pickled and zlib compressed when large, the cache is bounded
+    by the total stored bytes. Each entry remembers the labels its query
+    matched, so reloading OfficeHour rows only evicts queries that touched
+    OfficeHour. Unlabeled nodes take the end labels of their relationship
+    types from the schema, see set_relationships. Queries whose labels cannot
+    be determined are tagged "*" and dropped on any invalidation.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl_seconds: float = 86400.0,
+                 compress_min_bytes: int = 1024):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.compress_min_bytes = compress_min_bytes
+        self._entries: "OrderedDict[str, Tuple[float, bool, bytes, Set[str]]]" = OrderedDict()
+        self._by_label: Dict[str, Set[str]] = {}
+        self._endpoints: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidated = 0
+
+    def set_relationships(self, relationships: Optional[List[Dict[str, str]]]) -> None:
+        """Start and end labels by relationship type, from the structured schema"""
+        endpoints: Dict[str, Set[str]] = {}
+        for rel in relationships or []:
+            endpoints.setdefault(rel["type"], set()).update((rel["start"], rel["end"]))
+        self._endpoints = endpoints
+
+    @staticmethod
+    def is_cacheable(query: str) -> bool:
+        return bool(query) and not _WRITE.search(query)
+
+    @staticmethod
+    def make_key(query: str, params: Optional[Dict] = None) -> str:
+        payload = normalize_cypher(query) + "\x00" + json.dumps(
+            params or {}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, query: str, params: Optional[Dict] = None) -> Optional[List[Dict]]:
+        """Return cached rows or None"""
+        key = self.make_key(query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        _, compressed, blob, _ = entry
+        return pickle.loads(zlib.decompress(blob) if compressed else blob)
+
+    def put(self, query: str, params: Optional[Dict], rows: List[Dict]) -> bool:
+        """Store rows for a read query, returns False if not cached"""
+        if not self.is_cacheable(query):
+            return False
+        try:
+            blob = pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False
+        compressed = len(blob) >= self.compress_min_bytes
+        if compressed:
+            blob = zlib.compress(blob)
+        if len(blob) > self.max_bytes:
+            return False
+
+        key = self.make_key(query, params)
+        labels = query_labels(query, params, self._endpoints)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, compressed, blob, labels)
+            self.bytes += len(blob)
+            for label in labels:
+                self._by_label.setdefault(label, set()).add(key)
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def _drop(self, key: str) -> None:
+        _, _, blob, labels = self._entries.pop(key)
+        self.bytes -= len(blob)
+        for label in labels:
+            keys = self._by_label.get(label)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_label[label]
+
+    def invalidate_labels(self, labels: Iterable[str]) -> int:
+        """Drop every entry that touched one of the labels"""
+        with self._lock:
+            keys = set(self._by_label.get(ANY_LABEL, ()))
+            for label in labels:
+                keys.update(self._by_label.get(label, ()))
+            for key in keys:
+                self._drop(key)
+            self.invalidated += len(keys)
+            return len(keys)
+
+    def invalidate(self) -> int:
+        """Drop every entry"""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._by_label.clear()
+            self.bytes = 0
+            self.invalidated += dropped
+            return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory use"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidated": self.invalidated,
+                "labels": {label: len(keys) for label, keys in self._by_label.items()},
+            }
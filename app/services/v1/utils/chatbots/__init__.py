@@ -1 +1,2 @@
 from .qa_chatbot_v1 import PaysokoQA as PaysokoQAV1  # noqa
+from .stage_graph_v1 import StageGraph as StageGraphV1  # noqa
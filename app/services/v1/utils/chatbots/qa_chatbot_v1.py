@@ -1,13 +1,26 @@
+import asyncio
 from dotenv import load_dotenv
 import os
-from langchain_anthropic import ChatAnthropic
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Union, Optional
+from typing import Any, AsyncIterator, Dict, List, Tuple, Union, Optional
 from langchain.prompts import ChatPromptTemplate
-from langchain_community.graphs import Neo4jGraph
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from langchain.chains.graph_qa.cypher_utils import CypherQueryCorrector, Schema
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain.chains.graph_qa.cypher_utils import CypherQueryCorrector
+
+from utils.caches import AnswerCacheV1, CypherTemplateCacheV1, QueryResultCacheV1
+from utils.concurrency import MicroBatcherV1, SingleFlightV1
+from utils.extractors import ExtractionResultV1, LocalEntityExtractorV1
+from utils.graphs import (AsyncNeo4jGraphV1, EntityMapperV1, GraphBackendV1, GraphMirrorV1,
+                          SchemaSnapshotV1, UnsupportedCypherV1)
+from utils.graphs.schema_snapshot_v1 import SchemaState
+from utils.metrics import MetricsRegistryV1, StageTimerV1
+from utils.models import StageModelsV1
+from utils.prompts import PromptAssemblerV1
+from utils.routers import IntentRouterV1
+from utils.routers.intent_router_v1 import RouteDecision
+
+from .stage_graph_v1 import OverlapStats, StageGraph
 
 
 class PaysokoEntities(BaseModel):
@@ -45,13 +58,147 @@ class PaysokoEntities(BaseModel):
         arbitrary_types_allowed = True
 
 
+# Row counts of Neo4j results
+ROW_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
 class PaysokoQA:
-    def __init__(self):
+    def __init__(self, answer_cache: Optional[AnswerCacheV1] = None,
+                 template_cache: Optional[CypherTemplateCacheV1] = None,
+                 result_cache: Optional[QueryResultCacheV1] = None,
+                 entity_extractor: Optional[LocalEntityExtractorV1] = None,
+                 use_local_extractor: bool = True,
+                 batched_mapping: bool = True,
+                 async_graph: Optional[AsyncNeo4jGraphV1] = None,
+                 use_async_graph: bool = True,
+                 parallel_stages: bool = False,
+                 mirror: Optional[GraphMirrorV1] = None,
+                 use_mirror: bool = False,
+                 router: Optional[IntentRouterV1] = None,
+                 use_router: bool = False,
+                 stage_models: Optional[StageModelsV1] = None,
+                 micro_batching: bool = False,
+                 batch_max_size: int = 8,
+                 batch_max_wait_ms: float = 5.0,
+                 metrics: Optional[MetricsRegistryV1] = None,
+                 compact_prompts: bool = True,
+                 prompt_caching: bool = False,
+                 graph_backend: Optional[str] = None,
+                 graph: Optional[GraphBackendV1] = None):
         load_dotenv()
-        self.model = ChatAnthropic(model='claude-3-opus-20240229')
-        self.graph = Neo4jGraph()
+        # Stage timings, token counts, cache hit rates and row counts for /metrics
+        self.metrics = metrics or MetricsRegistryV1()
+        self.timer = StageTimerV1(self.metrics.histogram(
+            "paysoko_stage_duration_seconds", "Time spent in each pipeline stage", ["stage"]))
+        self.graph_rows = self.metrics.histogram(
+            "paysoko_neo4j_rows_returned", "Rows returned by Neo4j queries",
+            buckets=ROW_BUCKETS)
+        # Each stage has its own model, max_tokens, latency budget and fallbacks
+        self.stage_models = stage_models or StageModelsV1.from_env()
+        # Neo4j, or the embedded graph over data/*.csv for offline runs
+        self.graph = graph or GraphBackendV1.create(
+            graph_backend or os.getenv("GRAPH_BACKEND", "neo4j"))
+        # a_ask talks to Neo4j through the async driver, ask keeps Neo4jGraph
+        self.async_graph = async_graph
+        if self.async_graph is None and use_async_graph:
+            self.async_graph = self.graph.async_graph() \
+                if isinstance(self.graph, GraphBackendV1) else AsyncNeo4jGraphV1()
+        # Small read-only copy of the graph, entity lookups skip Neo4j entirely
+        self.mirror = mirror
+        if self.mirror is None and use_mirror:
+            self.mirror = GraphMirrorV1(
+                self.graph, async_graph=self.async_graph,
+                snapshot_path=os.getenv("GRAPH_MIRROR_SNAPSHOT", "graph_mirror.json"))
+            self.mirror.load()
+        # All entity lookups of a question go to Neo4j in one round trip
+        self.entity_mapper = EntityMapperV1(
+            self.graph, batched=batched_mapping, async_graph=self.async_graph,
+            mirror=self.mirror)
+        # Schema is loaded once, prompt and corrector are refreshed together
+        self.schema_snapshot = SchemaSnapshotV1(self.graph, async_graph=self.async_graph)
+        self.schema_snapshot.add_listener(self.on_schema_change)
+        # Prompts get the schema slice for the mentioned entities and compacted static text
+        self.prompt_assembler = PromptAssemblerV1(
+            self.schema_snapshot, enabled=compact_prompts, caching=prompt_caching)
+        # Run independent stages concurrently and draft Cypher speculatively
+        self.parallel_stages = parallel_stages
+        self.overlap_stats = OverlapStats()
+        # Confident local extractions skip the entity LLM call
+        self.entity_extractor = entity_extractor
+        if self.entity_extractor is None and use_local_extractor:
+            self.entity_extractor = self.build_entity_extractor()
+        # Simple FAQ intents are answered from a template without any LLM call
+        self.router = router
+        if self.router is None and use_router and self.entity_extractor is not None:
+            self.router = IntentRouterV1(self.entity_extractor)
+        # Answers for repeat questions are served from memory
+        self.answer_cache = answer_cache or AnswerCacheV1()
+        # Identical questions asked at the same time share one pipeline run
+        self.single_flight = SingleFlightV1()
+        # Concurrent entity and Cypher LLM calls are grouped into one abatch
+        self.micro_batching = micro_batching
+        self.entity_batcher = MicroBatcherV1(
+            lambda items: self.entity_chain.abatch(items, return_exceptions=True),
+            max_batch_size=batch_max_size, max_wait_ms=batch_max_wait_ms)
+        self.cypher_batcher = MicroBatcherV1(
+            lambda items: self.cypher_generation.abatch(items, return_exceptions=True),
+            max_batch_size=batch_max_size, max_wait_ms=batch_max_wait_ms)
+        # Cypher for known question shapes skips the generation LLM call
+        self.template_cache = template_cache or CypherTemplateCacheV1()
+        # Final query results are reused until ingestion invalidates their labels
+        self.result_cache = result_cache or QueryResultCacheV1()
+        self.result_cache.set_relationships(
+            self.schema_snapshot.state.structured_schema.get("relationships"))
+        if isinstance(self.graph, GraphBackendV1):
+            self.graph.add_listener(self.on_graph_reload)
+        self.register_metrics()
         self.setup_chains()
 
+    def register_metrics(self) -> None:
+        """Export cache and LLM usage counters, read from their stats at scrape time"""
+        caches = {"answer": self.answer_cache, "template": self.template_cache,
+                  "result": self.result_cache}
+
+        def cache_stat(field: str):
+            return lambda: {(name,): cache.stats()[field] for name, cache in caches.items()}
+
+        def stage_stat(read):
+            return lambda: {(stage,): read(info)
+                            for stage, info in self.stage_models.info().items()}
+
+        self.metrics.counter_callback(
+            "paysoko_cache_hits_total", "Cache hits", cache_stat("hits"), ["cache"])
+        self.metrics.counter_callback(
+            "paysoko_cache_misses_total", "Cache misses", cache_stat("misses"), ["cache"])
+        self.metrics.gauge(
+            "paysoko_cache_hit_ratio", "Cache hit rate since start", cache_stat("hit_rate"),
+            ["cache"])
+        self.metrics.counter_callback(
+            "paysoko_llm_input_tokens_total", "Input tokens used per LLM stage",
+            stage_stat(lambda info: info["usage"]["input_tokens"]), ["stage"])
+        self.metrics.counter_callback(
+            "paysoko_llm_output_tokens_total", "Output tokens used per LLM stage",
+            stage_stat(lambda info: info["usage"]["output_tokens"]), ["stage"])
+        self.metrics.counter_callback(
+            "paysoko_llm_cache_read_tokens_total", "Input tokens read from the Anthropic prompt cache",
+            stage_stat(lambda info: info["usage"]["cache_read_tokens"]), ["stage"])
+        self.metrics.counter_callback(
+            "paysoko_llm_cache_write_tokens_total", "Input tokens written to the Anthropic prompt cache",
+            stage_stat(lambda info: info["usage"]["cache_write_tokens"]), ["stage"])
+        self.metrics.counter_callback(
+            "paysoko_llm_calls_total", "LLM calls per stage",
+            stage_stat(lambda info: info["usage"]["calls"]), ["stage"])
+        self.metrics.counter_callback(
+            "paysoko_llm_fallbacks_total", "LLM stage calls answered by a fallback model",
+            stage_stat(lambda info: info["fallbacks_used"]), ["stage"])
+        self.metrics.counter_callback(
+            "paysoko_prompt_tokens_estimated_total",
+            "Estimated prompt tokens, full is before pruning and compaction",
+            lambda: {(prompt, version): totals[f"tokens_{key}"]
+                     for prompt, totals in self.prompt_assembler.stats()["prompts"].items()
+                     for version, key in (("full", "before"), ("assembled", "after"))},
+            ["prompt", "version"])
+
     def setup_chains(self):
         # Entity extraction chain
         prompt = ChatPromptTemplate.from_messages([
@@ -64,154 +211,544 @@ class PaysokoQA:
                 "Use the given format to extract information from the following input: {question}"
             ),
         ])
-        self.entity_chain = prompt | self.model.with_structured_output(
-            PaysokoEntities)
+        self.entity_chain = (
+            prompt |
+            RunnableLambda(self.prompt_assembler.cache_prefix) |
+            self.stage_models.runnable(
+                "entities", lambda model: model.with_structured_output(PaysokoEntities))
+        )
+
+        # Cypher generation chain. Everything that does not change between
+        # questions is in the system message, a cacheable prefix per schema slice
+        cypher_system = """Generate a Cypher query to get information from the Paysoko database. Return only the query without explanation.
 
-        # Cypher generation chain
-        cypher_template = """Based on the Paysoko Neo4j graph schema below, write a Cypher query that would answer the user's question:
+       Based on the Paysoko Neo4j graph schema below, write a Cypher query that would answer the user's question:
 
        {schema}
 
-       The entities mentioned in the question map to these database values:
+       Note: Focus only on Appointments, Services, OfficeLocations and Office Hours relationships."""
+        if getattr(self.graph, "cypher_rules", ""):
+            cypher_system += "\n\n       " + self.graph.cypher_rules
+
+        cypher_template = """The entities mentioned in the question map to these database values:
        {entities_list}
 
        User Question: {question}
 
        Write a Cypher query to answer this question.
-       Note: Focus only on Appointments, Services, OfficeLocations and Office Hours relationships.
 
        Cypher query:"""
 
-        cypher_prompt = ChatPromptTemplate.from_messages([
-            (
-                "system",
-                "Generate a Cypher query to get information from the Paysoko database. Return only the query without explanation."
-            ),
+        self.cypher_prompt = ChatPromptTemplate.from_messages([
+            ("system", self.prompt_assembler.template(cypher_system)),
+            ("human", self.prompt_assembler.template(cypher_template)),
+        ])
+        # Unpruned prompt, only formatted to measure the savings
+        self.cypher_prompt_full = ChatPromptTemplate.from_messages([
+            ("system", cypher_system),
             ("human", cypher_template),
         ])
 
-        self.cypher_response = (
-            RunnablePassthrough.assign(entities=self.entity_chain) |
+        self.cypher_generation = (
+            RunnableLambda(self.measure_cypher_prompt) |
+            self.cypher_prompt |
+            RunnableLambda(self.prompt_assembler.cache_prefix) |
+            self.stage_models.runnable(
+                "cypher", lambda model: model.bind(stop=["\nResult:"])) |
+            StrOutputParser()
+        )
+
+        # Pipeline stages, kept separate so they can be run one at a time
+        # Each step runs inside a timing span named after its stage
+        self.entity_step = self.timer.wrap("entities", RunnablePassthrough.assign(
+            entities=RunnableLambda(self.extract_entities, afunc=self.aextract_entities)))
+        self.mapping_step = self.timer.wrap("mapping", RunnablePassthrough.assign(
+            mappings=RunnableLambda(
+                lambda x: self.resolve_entities(x["entities"]),
+                afunc=self.aresolve_entities_step)
+        ))
+        self.cypher_step = (
             RunnablePassthrough.assign(
-                entities_list=lambda x: self.map_to_database(x["entities"]),
-                schema=lambda _: self.graph.get_schema,
+                entities_list=lambda x: self.format_mappings(x["mappings"]),
+                schema=self.prompt_schema,
+                template=lambda x: self.template_cache.lookup(
+                    x["question"], x["mappings"]),
             ) |
-            cypher_prompt |
-            self.model.bind(stop=["\nResult:"]) |
-            StrOutputParser()
+            RunnablePassthrough.assign(query=self.timer.wrap("cypher", RunnableLambda(
+                self.generate_cypher, afunc=self.agenerate_cypher)))
+        )
+        self.query_step = RunnablePassthrough.assign(response=RunnableLambda(
+            self.run_cypher, afunc=self.arun_cypher))
+
+        self.cypher_response = (
+            self.entity_step |
+            self.mapping_step |
+            self.cypher_step
         )
 
         # Schema validation
-        corrector_schema = [
-            Schema(el["start"], el["type"], el["end"])
-            for el in self.graph.structured_schema.get("relationships")
-        ]
-        self.cypher_validation = CypherQueryCorrector(corrector_schema)
+        self.cypher_validation = CypherQueryCorrector(
+            self.schema_snapshot.corrector_schema)
 
         # Response generation chain
-        response_template = """
-       Based on the question, Cypher query, and database response, provide a natural language answer in markdown format:
+        # The tone guide is the same for every question, it belongs to the cached prefix
+        response_system = """You are a customer service assistant for Paysoko. Provide clear, direct answers based on the query results.
 
-       Question: {question}
-       Cypher query: {query} 
-       Database Response: {response}
+       Based on the question, Cypher query, and database response, provide a natural language answer in markdown format.
+       If the database response is empty, say that you could not find that information.
 
        Response should focus on:
        - Office locations and working hours
        - Available services and costs
        - Appointment details and scheduling
-       
+
        The tone of voice you should use in your final response:
        {tone_of_voice}
        """
 
-        response_prompt = ChatPromptTemplate.from_messages([
-            (
-                "system",
-                "You are a customer service assistant for Paysoko. Provide clear, direct answers based on the query results."
-            ),
+        response_template = """
+       Question: {question}
+       Cypher query: {query}
+       Database Response: {response}
+       """
+
+        self.response_prompt = ChatPromptTemplate.from_messages([
+            ("system", self.prompt_assembler.template(response_system)),
+            ("human", self.prompt_assembler.template(response_template)),
+        ])
+        self.response_prompt_full = ChatPromptTemplate.from_messages([
+            ("system", response_system),
             ("human", response_template),
         ])
 
-        self.chain = (
-            RunnablePassthrough.assign(query=self.cypher_response) |
-            RunnablePassthrough.assign(
-                response=lambda x: self.graph.query(
-                    self.cypher_validation(x["query"]))
-            ) |
-            response_prompt |
-            self.model |
+        self.response_chain = self.timer.wrap("response", (
+            RunnableLambda(self.assemble_response_inputs) |
+            self.response_prompt |
+            RunnableLambda(self.prompt_assembler.cache_prefix) |
+            self.stage_models.runnable("response") |
             StrOutputParser()
+        ))
+
+        self.chain = (
+            self.cypher_response |
+            self.query_step |
+            self.response_chain
         )
 
-    def map_to_database(self, entities: PaysokoEntities) -> Optional[str]:
-        fulltext_query = """
-       CALL db.index.fulltext.queryNodes($indexName, $value) 
-       YIELD node, score
-       WITH node, score, labels(node)[0] AS type
-       RETURN 
-           CASE type
-               WHEN 'OfficeLocation' THEN node.location_name
-               WHEN 'Services' THEN node.service_name
-               WHEN 'Appointment' THEN node.appointment_id
-           END AS result,
-           type,
-           score
-       ORDER BY score DESC
-       LIMIT 1
-       """
+        # Same pipeline as a dependency graph for the parallel mode
+        self.stage_graph = StageGraph()
+        self.stage_graph.add_stage("entities", self._entities_stage)
+        self.stage_graph.add_stage("mappings", self._mappings_stage, ["entities"])
+        self.stage_graph.add_stage("schema", self._schema_stage)
+        self.stage_graph.add_stage("draft", self._draft_stage, ["schema"], optional=True)
+        self.stage_graph.add_stage("cypher", self._cypher_stage, ["mappings", "schema"])
+        self.stage_graph.add_stage("response", self._query_stage, ["cypher"])
+        self.stage_graph.add_stage("answer", self._answer_stage, ["response"])
 
-        hours_query = """
-       MATCH (h:OfficeHour)
-       WHERE h.day_of_week = $time OR h.opening_time = $time OR h.closing_time = $time
-       RETURN 
-           h.day_of_week + ' ' + h.opening_time + '-' + h.closing_time as result,
-           'OfficeHour' as type,
-           1.0 as score
-       LIMIT 1
-       """
+    async def _entities_stage(self, x: Dict, tasks) -> PaysokoEntities:
+        return (await self.entity_step.ainvoke(x))["entities"]
 
-        result = ""
-
-        for entity_type, entity_list in [
-            ("locationIndex", entities.office_locations),
-            ("serviceIndex", entities.services),
-            ("appointmentIndex", entities.appointments)
-        ]:
-            for entity in entity_list:
-                try:
-                    response = self.graph.query(fulltext_query, {
-                        "indexName": entity_type,
-                        "value": entity
-                    })
-                    if response and len(response) > 0:
-                        result += (f"{entity} maps to {response[0]['result']} "
-                                   f"({response[0]['type']}) with score "
-                                   f"{response[0]['score']:.2f}\n")
-                    else:
-                        result += f"No match found for {entity}\n"
-                except Exception as e:
-                    print(f"Error mapping entity {entity}: {e}")
-
-        for time in entities.office_hours:
-            try:
-                response = self.graph.query(hours_query, {"time": time})
-                if response and len(response) > 0:
-                    result += (f"{time} maps to {response[0]['result']} "
-                               f"({response[0]['type']}) with score "
-                               f"{response[0]['score']:.2f}\n")
-                else:
-                    result += f"No match found for {time}\n"
-            except Exception as e:
-                print(f"Error mapping office hour {time}: {e}")
+    async def _mappings_stage(self, x: Dict, tasks) -> List[Dict]:
+        with self.timer.span("mapping"):
+            return await self.entity_mapper.aresolve(x["entities"])
+
+    async def _schema_stage(self, x: Dict, tasks) -> str:
+        # Entities are not known yet, the draft gets the full schema
+        return self.prompt_schema({})
+
+    async def _draft_stage(self, x: Dict, tasks) -> Optional[str]:
+        """Schema-only Cypher generated while entities are still being extracted"""
+        if self.local_entities(x["question"], x.get("extraction")) is not None:
+            # Extraction is local and instant, nothing to overlap with
+            return None
+        with self.timer.span("draft"):
+            return await self.agenerate_llm_cypher({
+                "question": x["question"], "schema": x["schema"], "entities_list": None})
+
+    def draft_is_usable(self, draft: Optional[str], mappings: List[Dict]) -> bool:
+        """A draft is kept if the mapped entities would not have changed it"""
+        if not draft:
+            return False
+        if not mappings:
+            # The real prompt would have been identical
+            return True
+        params = {f"p{i}": self.template_cache.parameter_value(mapping)
+                  for i, mapping in enumerate(mappings) if mapping["result"] is not None}
+        if len(params) != len(mappings):
+            return False
+        # Every resolved value already appears as a literal in the draft
+        return self.template_cache.parameterize(draft, params) is not None
+
+    async def _cypher_stage(self, x: Dict, tasks) -> Dict:
+        x = dict(x, entities_list=self.format_mappings(x["mappings"]),
+                 schema=self.prompt_schema(x),
+                 template=self.template_cache.lookup(x["question"], x["mappings"]))
+        if x["template"] is not None:
+            tasks["draft"].cancel()
+            self.overlap_stats.count("template_hits")
+            return dict(x, query=x["template"][0], draft_used=False)
+
+        try:
+            # Time spent waiting on the draft is not Cypher work
+            draft = await tasks.wait("draft", "cypher")
+        except Exception:
+            # The draft is speculative and the run logs its error, generate as usual
+            draft = None
+            self.overlap_stats.count("drafts_discarded")
+        if self.draft_is_usable(draft, x["mappings"]):
+            self.overlap_stats.count("drafts_kept")
+            return dict(x, query=draft, draft_used=True)
+        if draft:
+            self.overlap_stats.count("drafts_discarded")
+        with self.timer.span("cypher"):
+            query = await self.agenerate_llm_cypher(x)
+        return dict(x, query=query, draft_used=False)
 
-        return result if result else None
+    async def _query_stage(self, x: Dict, tasks) -> Dict:
+        return dict(x["cypher"], response=await self.arun_cypher(x["cypher"]))
 
-    def ask(self, question: str, tone_of_voice: str) -> str:
-        """Main method to ask questions"""
-        return self.chain.invoke({"question": question, "tone_of_voice": tone_of_voice})
+    async def _answer_stage(self, x: Dict, tasks) -> str:
+        return await self.response_chain.ainvoke(x["response"])
 
-    async def a_ask(self, question: str, tone_of_voice: str) -> str:
-        """Main method to ask questions asynchronously"""
-        response = await self.chain.ainvoke({"question": question, "tone_of_voice": tone_of_voice})
+    async def arun_stage_graph(self, question: str, tone_of_voice: str,
+                               extraction: Optional[ExtractionResultV1] = None) -> str:
+        """Run the pipeline with independent stages overlapping"""
+        run = await self.stage_graph.run(
+            {"question": question, "tone_of_voice": tone_of_voice, "extraction": extraction})
+        if not run.results["cypher"]["draft_used"] and "draft" not in run.discarded:
+            run.discarded.append("draft")
+        self.overlap_stats.record(run)
+        return run.results["answer"]
+
+    def prompt_schema(self, x: Dict) -> str:
+        """Schema slice for the entities in x, the full schema when there are none"""
+        with self.timer.span("schema"):
+            return self.prompt_assembler.schema_for(
+                self.prompt_assembler.labels(x.get("entities"), x.get("mappings"),
+                                             x.get("question")))
+
+    def measure_cypher_prompt(self, x: Dict) -> Dict:
+        """Record the Cypher prompt's tokens against the full schema and template"""
+        full = self.cypher_prompt_full.format(**dict(x, schema=self.schema_snapshot.schema_text))
+        self.prompt_assembler.record("cypher", full, self.cypher_prompt.format(**x))
+        return x
+
+    def assemble_response_inputs(self, x: Dict) -> Dict:
+        """Compact the tone guide and record the answer prompt's tokens"""
+        compact = dict(x, tone_of_voice=self.prompt_assembler.tone(x["tone_of_voice"]))
+        self.prompt_assembler.record("response", self.response_prompt_full.format(**x),
+                                     self.response_prompt.format(**compact))
+        return compact
+
+    def on_schema_change(self, state: SchemaState) -> None:
+        """Rebuild everything derived from the schema after a refresh"""
+        self.cypher_validation = CypherQueryCorrector(state.corrector_schema)
+        self.prompt_assembler.invalidate()
+        self.template_cache.invalidate()
+        self.result_cache.set_relationships(state.structured_schema.get("relationships"))
+
+    def on_graph_reload(self) -> None:
+        """Drop everything derived from the graph's data after the backend reloaded it"""
+        self.answer_cache.invalidate()
+        self.result_cache.invalidate()
+        if self.mirror is not None:
+            self.mirror.refresh()
+        if self.entity_extractor is not None:
+            self.entity_extractor = self.build_entity_extractor() or self.entity_extractor
+            if self.router is not None:
+                self.router.entity_extractor = self.entity_extractor
+
+    def build_entity_extractor(self) -> Optional[LocalEntityExtractorV1]:
+        """Build the local extractor from the graph, falling back to data/*.csv"""
+        try:
+            return LocalEntityExtractorV1.from_graph(self.graph)
+        except Exception as e:
+            print(f"Error building entity extractor from graph: {e}")
+        try:
+            return LocalEntityExtractorV1.from_csv()
+        except Exception as e:
+            print(f"Error building entity extractor from csv: {e}")
+        return None
+
+    def local_extraction(self, question: str) -> Optional[ExtractionResultV1]:
+        """Local extractor result for a question, computed once and passed along"""
+        if self.entity_extractor is None:
+            return None
+        return self.entity_extractor.extract(question)
+
+    def local_entities(self, question: str,
+                       extraction: Optional[ExtractionResultV1] = None) -> Optional[PaysokoEntities]:
+        """Entities from the local extractor, None when it is not confident"""
+        if self.entity_extractor is not None:
+            extraction = extraction or self.entity_extractor.extract(question)
+            if self.entity_extractor.is_confident(extraction):
+                return PaysokoEntities(**extraction.entities)
+        return None
+
+    def extract_entities(self, x: Dict):
+        """Use the local extractor when it is confident, else the LLM entity_chain"""
+        entities = self.local_entities(x["question"], x.get("extraction"))
+        return entities if entities is not None else self.entity_chain
+
+    async def aextract_entities(self, x: Dict) -> PaysokoEntities:
+        """Awaitable version of extract_entities, LLM calls go through the micro-batcher"""
+        entities = self.local_entities(x["question"], x.get("extraction"))
+        if entities is not None:
+            return entities
+        if self.micro_batching:
+            return await self.entity_batcher.submit({"question": x["question"]})
+        return await self.entity_chain.ainvoke(x)
+
+    def route(self, question: str,
+              extraction: Optional[ExtractionResultV1] = None) -> Optional[RouteDecision]:
+        """Routing decision for a question, None when there is no router"""
+        if self.router is None:
+            return None
+        with self.timer.span("route"):
+            return self.router.route(question, extraction)
+
+    def fast_answer(self, decision: RouteDecision) -> Optional[str]:
+        """Templated answer for a fast path decision, None to fall back to the chain"""
+        query, params = self.router.query(decision)
+        return self.router.render(decision, self._query(query, params))
+
+    async def afast_answer(self, decision: RouteDecision) -> Optional[str]:
+        """Awaitable version of fast_answer"""
+        query, params = self.router.query(decision)
+        return self.router.render(decision, await self._aquery(query, params))
+
+    @staticmethod
+    def trace_route(trace: Optional[Dict], decision: Optional[RouteDecision]) -> None:
+        if trace is not None and decision is not None:
+            trace.update(decision.to_dict())
+
+    def generate_cypher(self, x: Dict):
+        """Use the cached template for this question shape, else ask the LLM"""
+        if x["template"] is not None:
+            return x["template"][0]
+        return self.cypher_generation
+
+    async def agenerate_cypher(self, x: Dict) -> str:
+        """Awaitable version of generate_cypher"""
+        if x["template"] is not None:
+            return x["template"][0]
+        return await self.agenerate_llm_cypher(x)
+
+    async def agenerate_llm_cypher(self, x: Dict) -> str:
+        """Cypher from the LLM, through the micro-batcher when it is enabled"""
+        if self.micro_batching:
+            return await self.cypher_batcher.submit({
+                "question": x["question"], "schema": x["schema"],
+                "entities_list": x["entities_list"]})
+        return await self.cypher_generation.ainvoke(x)
+
+    def run_cypher(self, x: Dict) -> List[Dict]:
+        """Execute the query, caching newly generated Cypher as a template"""
+        if x["template"] is not None:
+            template, params = x["template"]
+            return self._query(template, params)
+
+        with self.timer.span("correction"):
+            query = self.cypher_validation(x["query"])
+        try:
+            response = self._query(query)
+        except UnsupportedCypherV1 as e:
+            # The answer says nothing was found instead of failing the request
+            print(f"Error running generated Cypher: {e}")
+            return []
+        self.template_cache.store(x["question"], x["mappings"], query)
+        return response
+
+    async def arun_cypher(self, x: Dict) -> List[Dict]:
+        """Awaitable version of run_cypher"""
+        if x["template"] is not None:
+            template, params = x["template"]
+            return await self._aquery(template, params)
+
+        with self.timer.span("correction"):
+            query = self.cypher_validation(x["query"])
+        try:
+            response = await self._aquery(query)
+        except UnsupportedCypherV1 as e:
+            print(f"Error running generated Cypher: {e}")
+            return []
+        self.template_cache.store(x["question"], x["mappings"], query)
         return response
+
+    def _query(self, query: str, params: Optional[Dict] = None) -> List[Dict]:
+        """Run a query through the result cache"""
+        rows = self.result_cache.get(query, params)
+        if rows is None:
+            with self.timer.span("graph_query"):
+                rows = self.graph.query(query, params or {})
+            self.graph_rows.observe(len(rows))
+            self.result_cache.put(query, params, rows)
+        return rows
+
+    async def _aquery(self, query: str, params: Optional[Dict] = None) -> List[Dict]:
+        rows = self.result_cache.get(query, params)
+        if rows is not None:
+            return rows
+        with self.timer.span("graph_query"):
+            if self.async_graph is not None:
+                rows = await self.async_graph.query(query, params)
+            else:
+                rows = await asyncio.to_thread(self.graph.query, query, params or {})
+        self.graph_rows.observe(len(rows))
+        self.result_cache.put(query, params, rows)
+        return rows
+
+    async def aresolve_entities_step(self, x: Dict) -> List[Dict]:
+        return await self.entity_mapper.aresolve(x["entities"])
+
+    def resolve_entities(self, entities: PaysokoEntities,
+                         batched: Optional[bool] = None) -> List[Dict]:
+        """Look up each extracted entity in the graph"""
+        return self.entity_mapper.resolve(entities, batched=batched)
+
+    @staticmethod
+    def format_mappings(mappings: List[Dict]) -> Optional[str]:
+        """Render mappings as the "X maps to Y" text used in the Cypher prompt"""
+        return EntityMapperV1.format(mappings)
+
+    def map_to_database(self, entities: PaysokoEntities,
+                        batched: Optional[bool] = None) -> Optional[str]:
+        return self.format_mappings(self.resolve_entities(entities, batched=batched))
+
+    def invalidate_caches(self, labels: Optional[List[str]] = None) -> None:
+        """Drop cached data, call this after the graph data is reloaded.
+
+        With labels only query results that touched those labels are evicted.
+        Answers do not record their labels, so they are always dropped.
+        The graph mirror is reloaded separately, see arefresh_mirror.
+        """
+        self.answer_cache.invalidate()
+        if labels:
+            self.result_cache.invalidate_labels(labels)
+        else:
+            self.template_cache.invalidate()
+            self.result_cache.invalidate()
+
+    async def arefresh_mirror(self, labels: Optional[List[str]] = None) -> bool:
+        """Reload the graph mirror if the changed labels are mirrored"""
+        if self.mirror is None or not self.mirror.covers(labels):
+            return False
+        await self.mirror.arefresh()
+        return True
+
+    async def aclose(self) -> None:
+        """Release the async Neo4j connection pool"""
+        if self.async_graph is not None:
+            await self.async_graph.close()
+
+    def ask(self, question: str, tone_of_voice: str,
+            trace: Optional[Dict] = None) -> str:
+        """Main method to ask questions, trace receives the routing decision and stage timings"""
+        cached = self.answer_cache.get(question, tone_of_voice)
+        if cached is not None:
+            return cached
+        with self.timer.collect() as spans:
+            extraction = self.local_extraction(question)
+            decision = self.route(question, extraction)
+            response = self.fast_answer(decision) if decision and decision.fast else None
+            self.trace_route(trace, decision)
+            if response is None:
+                response = self.chain.invoke({"question": question, "tone_of_voice": tone_of_voice,
+                                              "extraction": extraction})
+        if trace is not None:
+            trace["stage_ms"] = spans
+        self.answer_cache.set(question, tone_of_voice, response)
+        return response
+
+    async def a_ask(self, question: str, tone_of_voice: str,
+                    trace: Optional[Dict] = None) -> str:
+        """Main method to ask questions asynchronously.
+
+        Concurrent calls for the same normalized question and tone share one
+        pipeline run, and its errors are raised in every caller.
+        """
+        cached = self.answer_cache.get(question, tone_of_voice)
+        if cached is not None:
+            return cached
+        key = self.answer_cache.make_key(question, tone_of_voice)
+        (response, details), shared = await self.single_flight.do(
+            key, lambda: self._a_ask_uncached(question, tone_of_voice))
+        if trace is not None:
+            trace.update(details, coalesced=shared)
+        return response
+
+    async def _a_ask_uncached(self, question: str, tone_of_voice: str) -> Tuple[str, Dict]:
+        """Answer with the fast path or the chain, returns the answer and its trace"""
+        details = {}
+        with self.timer.collect() as spans:
+            extraction = self.local_extraction(question)
+            decision = self.route(question, extraction)
+            response = await self.afast_answer(decision) if decision and decision.fast else None
+            self.trace_route(details, decision)
+            if response is None:
+                if self.parallel_stages:
+                    response = await self.arun_stage_graph(question, tone_of_voice, extraction)
+                else:
+                    response = await self.chain.ainvoke({"question": question, "tone_of_voice": tone_of_voice,
+                                                         "extraction": extraction})
+        details["stage_ms"] = spans
+        self.answer_cache.set(question, tone_of_voice, response)
+        return response, details
+
+    async def astream_ask(self, question: str, tone_of_voice: str,
+                          trace: Optional[Dict] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Run the chain stage by stage, yielding progress events and answer tokens"""
+        cached = self.answer_cache.get(question, tone_of_voice)
+        if cached is not None:
+            yield {"event": "token", "data": cached}
+            yield {"event": "done", "data": cached}
+            return
+
+        # Spans of a stream run between yields, in the consumer's context
+        with self.timer.collect() as spans:
+            if trace is not None:
+                trace["stage_ms"] = spans
+            extraction = self.local_extraction(question)
+            decision = self.route(question, extraction)
+            if decision is not None and decision.fast:
+                query, params = self.router.query(decision)
+                rows = await self._aquery(query, params)
+                answer = self.router.render(decision, rows)
+                if answer is not None:
+                    self.trace_route(trace, decision)
+                    yield {"event": "query", "data": {
+                        "query": query,
+                        "from_template": True,
+                        "intent": decision.intent,
+                    }}
+                    yield {"event": "rows", "data": {"count": len(rows)}}
+                    yield {"event": "token", "data": answer}
+                    self.answer_cache.set(question, tone_of_voice, answer)
+                    yield {"event": "done", "data": answer}
+                    return
+            self.trace_route(trace, decision)
+
+            x = {"question": question, "tone_of_voice": tone_of_voice, "extraction": extraction}
+            x = await self.entity_step.ainvoke(x)
+            x = await self.mapping_step.ainvoke(x)
+            yield {"event": "entities", "data": {
+                "entities": x["entities"].model_dump(),
+                "mappings": x["mappings"],
+            }}
+
+            x = await self.cypher_step.ainvoke(x)
+            yield {"event": "query", "data": {
+                "query": x["query"],
+                "from_template": x["template"] is not None,
+            }}
+
+            x = await self.query_step.ainvoke(x)
+            yield {"event": "rows", "data": {"count": len(x["response"])}}
+
+            answer = ""
+            async for token in self.response_chain.astream(x):
+                answer += token
+                yield {"event": "token", "data": token}
+
+            self.answer_cache.set(question, tone_of_voice, answer)
+            yield {"event": "done", "data": answer}
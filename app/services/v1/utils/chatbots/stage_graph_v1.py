@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+
+StageFn = Callable[[Dict[str, Any], Dict[str, asyncio.Task]], Awaitable[Any]]
+
+
+@dataclass
+class StageRun:
+    results: Dict[str, Any]
+    timings: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    cancelled: List[str] = field(default_factory=list)
+    # Stages that finished but whose result was thrown away
+    discarded: List[str] = field(default_factory=list)
+    # Optional stages that raised, the run went on without them
+    failed: List[str] = field(default_factory=list)
+    # Seconds a stage sat waiting on a stage it does not declare as a dependency
+    idle: Dict[str, float] = field(default_factory=dict)
+    wall_ms: float = 0.0
+
+    @property
+    def sequential_ms(self) -> float:
+        """What the stages that fed the result would cost one after another"""
+        return sum((end - start - self.idle.get(name, 0.0)) * 1000
+                   for name, (start, end) in self.timings.items()
+                   if name not in self.discarded)
+
+    @property
+    def saved_ms(self) -> float:
+        """Critical-path time saved by overlapping, negative if speculation cost time"""
+        return self.sequential_ms - self.wall_ms
+
+
+class StageTasks(dict):
+    """Tasks of a run by stage name, wait() keeps the idle time out of a stage's cost"""
+
+    def __init__(self, run: StageRun):
+        super().__init__()
+        self.run = run
+
+    async def wait(self, name: str, waiter: str) -> Any:
+        """Await stage name from stage waiter, charging the wait to nobody"""
+        start = time.perf_counter()
+        try:
+            return await self[name]
+        finally:
+            self.run.idle[waiter] = self.run.idle.get(waiter, 0.0) + time.perf_counter() - start
+
+
+class StageGraph:
+    """Runs pipeline stages as soon as the stages they depend on are done.
+
+    Independent branches run concurrently. A stage function gets the results
+    of its dependencies plus the task of every stage, so it can also peek at,
+    await or cancel a speculative stage it does not strictly depend on.
+    An optional stage that raises is recorded as failed instead of failing
+    the run, so no stage may depend on it.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Tuple[StageFn, Tuple[str, ...]]] = {}
+        self.optional: set = set()
+
+    def add_stage(self, name: str, fn: StageFn, depends_on: Iterable[str] = (),
+                  optional: bool = False) -> None:
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dependency}")
+            if dependency in self.optional:
+                raise ValueError(f"Stage {name} depends on optional stage {dependency}")
+        self.stages[name] = (fn, tuple(depends_on))
+        if optional:
+            self.optional.add(name)
+
+    async def run(self, inputs: Dict[str, Any]) -> StageRun:
+        run = StageRun(results={})
+        tasks = StageTasks(run)
+
+        async def run_stage(name: str) -> Any:
+            fn, depends_on = self.stages[name]
+            values = dict(inputs)
+            for dependency in depends_on:
+                values[dependency] = await tasks[dependency]
+            start = time.perf_counter()
+            result = await fn(values, tasks)
+            run.timings[name] = (start, time.perf_counter())
+            return result
+
+        started = time.perf_counter()
+        # Stages are added in dependency order, so every task exists before it is awaited
+        for name in self.stages:
+            tasks[name] = asyncio.ensure_future(run_stage(name))
+        try:
+            for name, task in tasks.items():
+                # wait() does not cancel the stage if this run is cancelled
+                await asyncio.wait([task])
+                if task.cancelled():
+                    run.cancelled.append(name)
+                elif name in self.optional and task.exception() is not None:
+                    print(f"Error in optional stage {name}: {task.exception()}")
+                    run.failed.append(name)
+                    run.discarded.append(name)
+                else:
+                    run.results[name] = task.result()
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        run.wall_ms = (time.perf_counter() - started) * 1000
+        return run
+
+
+class OverlapStats:
+    """Accumulates how much wall time concurrent stages saved"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.saved_ms = 0.0
+        self.sequential_ms = 0.0
+        self.wall_ms = 0.0
+        self.counters: Dict[str, int] = {}
+
+    def record(self, run: StageRun) -> None:
+        with self._lock:
+            self.runs += 1
+            self.saved_ms += run.saved_ms
+            self.sequential_ms += run.sequential_ms
+            self.wall_ms += run.wall_ms
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "saved_ms_total": round(self.saved_ms, 2),
+                "saved_ms_mean": round(self.saved_ms / self.runs, 2) if self.runs else 0.0,
+                "saved_fraction": (self.saved_ms / self.sequential_ms
+                                   if self.sequential_ms else 0.0),
+                **self.counters,
+            }
@@ -0,0 +1,6 @@
+from .single_flight_v1 import SingleFlight as SingleFlightV1  # noqa
+from .micro_batcher_v1 import MicroBatcher as MicroBatcherV1  # noqa
+from .admission_v1 import AdmissionController as AdmissionControllerV1  # noqa
+from .admission_v1 import ConcurrencyLimit as ConcurrencyLimitV1  # noqa
+from .admission_v1 import LimitedRunnable as LimitedRunnableV1  # noqa
+from .admission_v1 import Overloaded as OverloadedV1  # noqa
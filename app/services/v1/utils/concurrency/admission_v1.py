@@ -0,0 +1,263 @@
+import asyncio
+import math
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing a request the service cannot take in time"""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class ConcurrencyLimit:
+    """Named semaphore that counts how often and how long callers wait.
+
+    A limit of 0 or less means unlimited, the limit then only counts calls.
+    """
+
+    def __init__(self, name: str, limit: int = 0):
+        self.name = name
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquired = 0
+        self.waited = 0
+        self.wait_ms: deque = deque(maxlen=1000)
+
+    async def __aenter__(self) -> "ConcurrencyLimit":
+        if self._semaphore is not None and self._semaphore.locked():
+            started = time.perf_counter()
+            with self._lock:
+                self.waiting += 1
+                self.waited += 1
+                self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                await self._semaphore.acquire()
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            with self._lock:
+                self.wait_ms.append((time.perf_counter() - started) * 1000)
+        elif self._semaphore is not None:
+            await self._semaphore.acquire()
+        with self._lock:
+            self.in_use += 1
+            self.acquired += 1
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        with self._lock:
+            self.in_use -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self.wait_ms)
+            return {
+                "limit": self.limit,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "acquired": self.acquired,
+                "waited": self.waited,
+                "wait_ms_p99": waits[int(0.99 * (len(waits) - 1))] if waits else 0.0,
+            }
+
+
+class LimitedRunnable(Runnable):
+    """Runs a runnable's async calls under a ConcurrencyLimit.
+
+    A stream holds its slot until the last chunk. Sync calls are passed
+    through unchanged, the limit protects the async service path.
+    """
+
+    def __init__(self, bound: Runnable, limit: ConcurrencyLimit):
+        self.bound = bound
+        self.limit = limit
+
+    @property
+    def InputType(self) -> Any:
+        return self.bound.InputType
+
+    @property
+    def OutputType(self) -> Any:
+        return self.bound.OutputType
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        return self.bound.invoke(input, config, **kwargs)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None,
+               **kwargs) -> Iterator[Any]:
+        yield from self.bound.stream(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None,
+                      **kwargs) -> Any:
+        async with self.limit:
+            return await self.bound.ainvoke(input, config, **kwargs)
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None,
+                      **kwargs) -> AsyncIterator[Any]:
+        async with self.limit:
+            async for chunk in self.bound.astream(input, config, **kwargs):
+                yield chunk
+
+
+class Ticket:
+    """One admitted request, release is safe to call more than once"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self.controller = controller
+        self.admitted_at = time.perf_counter()
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, deadline-limited wait queue.
+
+    Up to max_concurrent requests run at once and up to max_queue more wait
+    for a slot. A request arriving to a full queue is rejected at once (429)
+    and one that waits longer than queue_timeout seconds gives up (503), both
+    with a Retry-After estimated from recent service times. Excess load is
+    turned away cheaply instead of timing out everyone already admitted.
+    Waiters are served in arrival order, a new request never takes a slot
+    while others are queued for it.
+    """
+
+    def __init__(self, max_concurrent: int = 32, max_queue: int = 64,
+                 queue_timeout: float = 5.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        # Futures of waiting requests, oldest first, a released slot goes to the head
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.rejected: Counter = Counter()
+        self.service_ms: deque = deque(maxlen=200)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained"""
+        with self._lock:
+            recent = list(self.service_ms)
+            backlog = self.queued + 1
+        mean_s = sum(recent) / len(recent) / 1000 if recent else 1.0
+        return max(1, math.ceil(mean_s * backlog / self.max_concurrent))
+
+    def _reject(self, status_code: int, reason: str) -> Overloaded:
+        with self._lock:
+            self.rejected[reason] += 1
+        return Overloaded(status_code, self.retry_after(), reason)
+
+    async def acquire(self) -> Ticket:
+        """Wait for a slot, raises Overloaded when the queue is full or too slow"""
+        with self._lock:
+            if self.active < self.max_concurrent and not self._waiters:
+                self.active += 1
+                self.admitted += 1
+                return Ticket(self)
+            if self.queued >= self.max_queue:
+                full = True
+            else:
+                full = False
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                self.queued += 1
+                self.max_queued = max(self.max_queued, self.queued)
+        if full:
+            raise self._reject(429, "queue_full")
+        try:
+            # The slot is handed over by _release, active already counts it
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject(503, "queue_timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Cancelled right after being handed a slot, pass it on
+                self._release(None)
+            raise
+        finally:
+            with self._lock:
+                if not waiter.done() or waiter.cancelled():
+                    try:
+                        self._waiters.remove(waiter)
+                    except ValueError:
+                        pass
+                self.queued -= 1
+        with self._lock:
+            self.admitted += 1
+        return Ticket(self)
+
+    def _release(self, ticket: Optional[Ticket]) -> None:
+        """Hand the slot to the oldest waiter, or free it"""
+        with self._lock:
+            if ticket is not None:
+                self.service_ms.append((time.perf_counter() - ticket.admitted_at) * 1000)
+            while self._waiters and self._waiters[0].done():
+                self._waiters.popleft()
+            if not self._waiters:
+                self.active -= 1
+                return
+            waiter = self._waiters.popleft()
+        # Tickets may be released from a worker thread, e.g. a response background task
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is waiter.get_loop():
+            self._grant(waiter)
+        else:
+            waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+
+    def _grant(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # The waiter gave up before the slot reached it, pass it on
+            self._release(None)
+        else:
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[Ticket]:
+        ticket = await self.acquire()
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and rejections, for sizing the limits"""
+        with self._lock:
+            rejected = sum(self.rejected.values())
+            offered = self.admitted + rejected
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+                "active": self.active,
+                "queue_depth": self.queued,
+                "max_queue_depth": self.max_queued,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "rejection_rate": rejected / offered if offered else 0.0,
+            }
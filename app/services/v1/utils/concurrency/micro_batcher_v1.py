@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+def percentile(values: List[float], share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+class MicroBatcher:
+    """Groups items submitted within a few milliseconds into one batch call.
+
+    A batch is sent when it reaches max_batch_size or when the oldest item has
+    waited max_wait_ms, whichever comes first. batch_fn gets the items in
+    submission order and returns one result per item; exceptions in that
+    list, or raised by batch_fn itself, are raised in the matching callers.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0,
+                 history: int = 1000):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self.batch_sizes: Counter = Counter()
+        self.flushes: Counter = Counter()
+        self.waits_ms: deque = deque(maxlen=history)
+        self.batch_ms: deque = deque(maxlen=history)
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result from the next batch"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush("full")
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_wait_ms / 1000, self._flush, "timeout")
+        return await future
+
+    def _flush(self, reason: str) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # Callers that gave up while queued are not sent
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            self.batch_sizes[len(batch)] += 1
+            self.flushes[reason] += 1
+            self.waits_ms.extend((now - queued) * 1000 for _, _, queued in batch)
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        started = time.perf_counter()
+        try:
+            results = await self.batch_fn([item for item, _, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        with self._lock:
+            self.batch_ms.append((time.perf_counter() - started) * 1000)
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch size histogram and queueing delay, for tuning size and wait"""
+        with self._lock:
+            batches = sum(self.batch_sizes.values())
+            items = sum(size * count for size, count in self.batch_sizes.items())
+            waits = list(self.waits_ms)
+            batch_ms = list(self.batch_ms)
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "batches": batches,
+                "items": items,
+                "mean_batch_size": items / batches if batches else 0.0,
+                "batch_size_histogram": {str(size): count for size, count
+                                         in sorted(self.batch_sizes.items())},
+                "flushes": dict(self.flushes),
+                "wait_ms_p50": percentile(waits, 0.5),
+                "wait_ms_p99": percentile(waits, 0.99),
+                "batch_ms_p50": percentile(batch_ms, 0.5),
+                "batch_ms_p99": percentile(batch_ms, 0.99),
+            }
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key starts the work, every caller that arrives
+    while it is in flight awaits the same task and gets the same result or
+    exception. Waiters are shielded, so one caller disconnecting does not
+    cancel the work the others are waiting on.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.max_waiters = 0
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable,
+                 fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run fn once per in-flight key, returns (result, shared)"""
+        with self._lock:
+            self.calls += 1
+            task = self._in_flight.get(key)
+            shared = task is not None
+            if shared:
+                self.coalesced += 1
+                self._waiters[key] += 1
+                self.max_waiters = max(self.max_waiters, self._waiters[key])
+            else:
+                self.executions += 1
+                task = asyncio.ensure_future(fn())
+                self._in_flight[key] = task
+                self._waiters[key] = 1
+                task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        with self._lock:
+            if self._in_flight.get(key) is task:
+                del self._in_flight[key]
+                del self._waiters[key]
+            if not task.cancelled() and task.exception() is not None:
+                self.errors += 1
+
+    def stats(self) -> Dict[str, float]:
+        """How many calls shared another caller's execution"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "coalesced_rate": self.coalesced / self.calls if self.calls else 0.0,
+                "errors": self.errors,
+                "in_flight": len(self._in_flight),
+                "max_waiters": self.max_waiters,
+            }
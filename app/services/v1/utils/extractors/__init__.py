@@ -0,0 +1,2 @@
+from .entity_extractor_v1 import LocalEntityExtractor as LocalEntityExtractorV1  # noqa
+from .entity_extractor_v1 import ExtractionResult as ExtractionResultV1  # noqa
@@ -0,0 +1,286 @@
+import csv
+import difflib
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parents[5] / "data"
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday",
+            "Saturday", "Sunday"]
+
+# Words that carry no entity information, never fuzzy matched
+STOPWORDS = {
+    "what", "when", "where", "which", "does", "the", "your", "you", "have",
+    "open", "opens", "close", "closes", "closed", "time", "much", "long",
+    "cost", "costs", "how", "for", "and", "can", "there", "this", "that",
+    "with", "about", "office", "offices", "branch", "paysoko", "service",
+    "services", "payment", "payments", "hours", "appointment", "status",
+    "please", "tell", "need", "want", "book", "from", "into", "take", "takes",
+    "are", "any", "who", "why", "our", "its", "get", "day", "days", "today",
+    "tomorrow", "opening", "closing", "working", "located", "location", "address",
+    "phone", "number", "contact", "price", "charge", "charges", "fee", "fees",
+    "minutes", "duration", "long", "many", "would", "like", "know", "could",
+    "should", "will", "does", "help", "they", "them", "their", "here", "some",
+    "time", "times", "week", "check", "details", "booking", "confirmed", "pending",
+    "cancelled", "schedule", "scheduled", "still", "been", "has", "was", "did",
+}
+
+# Capped confidence when the question mentions words no pattern covered
+UNCOVERED_CONFIDENCE = 0.5
+
+ID_PATTERNS = [
+    ("appointments", re.compile(r"\bAPT\d{3,}\b", re.IGNORECASE)),
+    ("services", re.compile(r"\bPS\d{3,}\b", re.IGNORECASE)),
+    ("office_locations", re.compile(r"\bLOC\d{3,}\b", re.IGNORECASE)),
+]
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower().replace("-", ""))
+
+
+@dataclass
+class EntityMatch:
+    field: str
+    value: str
+    mention: str
+    confidence: float
+
+
+@dataclass
+class ExtractionResult:
+    entities: Dict[str, List[str]] = field(default_factory=lambda: {
+        "office_locations": [], "services": [], "appointments": [],
+        "office_hours": [],
+    })
+    matches: List[EntityMatch] = field(default_factory=list)
+    confidence: float = 0.0
+
+
+class _TokenTrie:
+    """Multi-pattern matcher over word tokens, longest match wins"""
+
+    def __init__(self):
+        self.root: Dict = {}
+        self.longest = 0
+
+    def add(self, tokens: List[str], payload: Tuple[str, str, float]) -> None:
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        # Keep the most confident payload for a pattern
+        current = node.get(None)
+        if current is None or payload[2] > current[2]:
+            node[None] = payload
+        self.longest = max(self.longest, len(tokens))
+
+    def scan(self, tokens: List[str]) -> List[Tuple[int, int, Tuple[str, str, float]]]:
+        """Return non-overlapping (start, end, payload) matches"""
+        found = []
+        position = 0
+        while position < len(tokens):
+            node, best = self.root, None
+            for offset in range(position, min(len(tokens), position + self.longest)):
+                node = node.get(tokens[offset])
+                if node is None:
+                    break
+                if None in node:
+                    best = (position, offset + 1, node[None])
+            if best:
+                found.append(best)
+                position = best[1]
+            else:
+                position += 1
+        return found
+
+
+class LocalEntityExtractor:
+    """Dictionary-based replacement for the LLM entity_chain.
+
+    The vocabulary (office names and regions, service names, PS/LOC/APT ids
+    and weekday names) is small and known up front, so most questions can be
+    resolved with a token trie plus a difflib fuzzy fallback for typos. The
+    returned confidence tells the caller whether to trust the result or fall
+    back to the LLM.
+    """
+
+    def __init__(self, offices: Iterable[Dict], services: Iterable[Dict],
+                 appointment_ids: Iterable[str] = (),
+                 confidence_threshold: float = 0.8,
+                 fuzzy_cutoff: float = 0.85):
+        self.confidence_threshold = confidence_threshold
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.trie = _TokenTrie()
+        self.ids: Dict[str, Tuple[str, str]] = {}
+        self._patterns: List[List[str]] = []
+        self._lock = threading.Lock()
+        self.extractions = 0
+        self.confident = 0
+
+        for office in offices:
+            name = office["location_name"]
+            self._add("office_locations", name, name, 1.0)
+            short = re.sub(r"^paysoko\s+", "", name, flags=re.IGNORECASE)
+            self._add("office_locations", short, name, 0.95)
+            if office.get("region"):
+                # Regions are indexed by locationIndex, pass them through as is
+                self._add("office_locations", office["region"],
+                          office["region"], 0.9)
+            self.ids[office["office_id"].upper()] = ("office_locations", name)
+
+        service_words: Dict[str, List[str]] = {}
+        for service in services:
+            name = service["service_name"]
+            self._add("services", name, name, 1.0)
+            self.ids[service["service_id"].upper()] = ("services", name)
+            for word in tokenize(name):
+                service_words.setdefault(word, []).append(name)
+        # A word that only appears in one service name identifies it
+        for word, names in service_words.items():
+            if len(names) == 1 and word not in STOPWORDS and len(word) > 3:
+                self._add("services", word, names[0], 0.85)
+
+        for appointment_id in appointment_ids:
+            self.ids[appointment_id.upper()] = ("appointments", appointment_id.upper())
+
+        for day in WEEKDAYS:
+            self._add("office_hours", day, day, 1.0)
+            self._add("office_hours", day[:3], day, 0.9)
+
+        self.vocabulary = sorted({
+            " ".join(tokens) for tokens in self._patterns
+            if len(" ".join(tokens)) > 3
+        })
+
+    def _add(self, entity_field: str, pattern: str, value: str,
+             confidence: float) -> None:
+        tokens = tokenize(pattern)
+        if not tokens:
+            return
+        self._patterns.append(tokens)
+        self.trie.add(tokens, (entity_field, value, confidence))
+
+    @classmethod
+    def from_csv(cls, data_dir: Optional[str] = None, **kwargs) -> "LocalEntityExtractor":
+        """Build the vocabulary from data/*.csv"""
+        data_dir = Path(data_dir or os.getenv("PAYSOKO_DATA_DIR") or DEFAULT_DATA_DIR)
+
+        def read(name: str) -> List[Dict]:
+            with open(data_dir / name, newline="") as file:
+                return list(csv.DictReader(file))
+
+        return cls(
+            offices=read("office_locations.csv"),
+            services=read("services.csv"),
+            appointment_ids=[row["appointment_id"] for row in read("appointments.csv")],
+            **kwargs
+        )
+
+    @classmethod
+    def from_graph(cls, graph, **kwargs) -> "LocalEntityExtractor":
+        """Build the vocabulary from the nodes currently in the graph"""
+        offices = graph.query("""
+        MATCH (o:OfficeLocation)
+        RETURN o.office_id AS office_id, o.location_name AS location_name,
+               o.region AS region
+        """)
+        services = graph.query("""
+        MATCH (s:Services)
+        RETURN s.service_id AS service_id, s.service_name AS service_name
+        """)
+        appointments = graph.query("""
+        MATCH (a:Appointment) RETURN a.appointment_id AS appointment_id
+        """)
+        return cls(
+            offices=offices,
+            services=services,
+            appointment_ids=[row["appointment_id"] for row in appointments],
+            **kwargs
+        )
+
+    def extract(self, text: str) -> ExtractionResult:
+        """Extract entities from a question along with a confidence score"""
+        result = ExtractionResult()
+
+        # Ids first, they are unambiguous
+        for entity_field, pattern in ID_PATTERNS:
+            for match in pattern.finditer(text):
+                known = self.ids.get(match.group(0).upper())
+                if known:
+                    result.matches.append(EntityMatch(
+                        known[0], known[1], match.group(0), 1.0))
+                else:
+                    # Well-formed id the dictionary has not seen yet
+                    result.matches.append(EntityMatch(
+                        entity_field, match.group(0).upper(), match.group(0), 0.9))
+        for _, pattern in ID_PATTERNS:
+            text = pattern.sub(" ", text)
+
+        tokens = tokenize(text)
+        covered = set()
+        for start, end, (entity_field, value, confidence) in self.trie.scan(tokens):
+            result.matches.append(EntityMatch(
+                entity_field, value, " ".join(tokens[start:end]), confidence))
+            covered.update(range(start, end))
+
+        # Fuzzy fallback for leftover words and word pairs (typos)
+        leftovers = [i for i in range(len(tokens)) if i not in covered
+                     and tokens[i] not in STOPWORDS and len(tokens[i]) > 3]
+        candidates = [(i, i + 2) for i in leftovers if i + 1 in leftovers]
+        candidates += [(i, i + 1) for i in leftovers]
+        for start, end in candidates:
+            if covered.intersection(range(start, end)):
+                continue
+            phrase = " ".join(tokens[start:end])
+            close = difflib.get_close_matches(
+                phrase, self.vocabulary, n=1, cutoff=self.fuzzy_cutoff)
+            if not close:
+                continue
+            for _, _, (entity_field, value, confidence) in self.trie.scan(close[0].split()):
+                ratio = difflib.SequenceMatcher(None, phrase, close[0]).ratio()
+                result.matches.append(EntityMatch(
+                    entity_field, value, phrase, confidence * ratio))
+                covered.update(range(start, end))
+
+        for match in result.matches:
+            values = result.entities[match.field]
+            if match.value not in values:
+                values.append(match.value)
+
+        if result.matches:
+            result.confidence = min(match.confidence for match in result.matches)
+        if self.uncovered_terms(tokens, covered):
+            # Probably an office, service or request we have never heard of
+            result.confidence = min(result.confidence, UNCOVERED_CONFIDENCE)
+        with self._lock:
+            self.extractions += 1
+            if self.is_confident(result):
+                self.confident += 1
+        return result
+
+    @staticmethod
+    def uncovered_terms(tokens: List[str], covered: set) -> List[str]:
+        """Content words no match accounted for, whatever their case"""
+        return [token for i, token in enumerate(tokens)
+                if i not in covered and len(token) > 2 and not token.isdigit()
+                and token not in STOPWORDS]
+
+    def is_confident(self, result: ExtractionResult) -> bool:
+        return result.confidence >= self.confidence_threshold
+
+    def stats(self) -> Dict[str, float]:
+        """How often the local extractor was trusted over the LLM"""
+        with self._lock:
+            return {
+                "extractions": self.extractions,
+                "confident": self.confident,
+                "confident_rate": (self.confident / self.extractions
+                                   if self.extractions else 0.0),
+            }
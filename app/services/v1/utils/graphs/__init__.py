@@ -0,0 +1,9 @@
+from .entity_mapper_v1 import EntityMapper as EntityMapperV1  # noqa
+from .async_graph_v1 import AsyncNeo4jGraph as AsyncNeo4jGraphV1  # noqa
+from .schema_snapshot_v1 import SchemaSnapshot as SchemaSnapshotV1  # noqa
+from .graph_mirror_v1 import GraphMirror as GraphMirrorV1  # noqa
+from .graph_backend_v1 import GraphBackend as GraphBackendV1  # noqa
+from .graph_backend_v1 import Neo4jBackend as Neo4jBackendV1  # noqa
+from .graph_backend_v1 import AsyncGraphBackend as AsyncGraphBackendV1  # noqa
+from .embedded_graph_v1 import EmbeddedGraph as EmbeddedGraphV1  # noqa
+from .cypher_engine_v1 import UnsupportedCypher as UnsupportedCypherV1  # noqa
@@ -0,0 +1,114 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from neo4j import AsyncGraphDatabase
+from neo4j.exceptions import ClientError
+from langchain_community.graphs.neo4j_graph import (
+    BASE_ENTITY_LABEL,
+    EXCLUDED_LABELS,
+    EXCLUDED_RELS,
+    _format_schema,
+    node_properties_query,
+    rel_properties_query,
+    rel_query,
+)
+
+from utils.concurrency import ConcurrencyLimitV1
+
+from .entity_mapper_v1 import BATCHED_QUERY, FULLTEXT_QUERY, HOURS_QUERY
+
+
+class AsyncNeo4jGraph:
+    """Awaitable counterpart of Neo4jGraph built on AsyncGraphDatabase.
+
+    Queries run on the event loop instead of blocking it, so a single uvicorn
+    worker can keep many chats in flight while Neo4j does the work. Connection
+    settings come from the same NEO4J_* variables Neo4jGraph uses. Queries
+    in flight are capped by max_concurrent_queries (0 for no cap), so a burst
+    waits here instead of on connection acquisition timeouts.
+    """
+
+    def __init__(self, url: Optional[str] = None, username: Optional[str] = None,
+                 password: Optional[str] = None, database: Optional[str] = None,
+                 max_connection_pool_size: Optional[int] = None,
+                 connection_acquisition_timeout: float = 10.0,
+                 max_connection_lifetime: float = 3600.0,
+                 liveness_check_timeout: Optional[float] = 30.0,
+                 max_concurrent_queries: Optional[int] = None):
+        url = url or os.getenv("NEO4J_URI") or os.getenv("NEO4J_URL")
+        username = username or os.getenv("NEO4J_USERNAME")
+        password = password or os.getenv("NEO4J_PASSWORD")
+        self.database = database or os.getenv("NEO4J_DATABASE", "neo4j")
+        if max_connection_pool_size is None:
+            max_connection_pool_size = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+        if max_concurrent_queries is None:
+            max_concurrent_queries = int(os.getenv("NEO4J_MAX_CONCURRENT_QUERIES", "32"))
+        self.limit = ConcurrencyLimitV1("graph", max_concurrent_queries)
+
+        self.driver = AsyncGraphDatabase.driver(
+            url,
+            auth=(username, password),
+            max_connection_pool_size=max_connection_pool_size,
+            connection_acquisition_timeout=connection_acquisition_timeout,
+            max_connection_lifetime=max_connection_lifetime,
+            liveness_check_timeout=liveness_check_timeout,
+            keep_alive=True,
+        )
+        self.schema: Optional[str] = None
+        self.structured_schema: Dict[str, Any] = {}
+
+    async def query(self, query: str, params: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """Run a Cypher query and return its records as dictionaries"""
+        async with self.limit:
+            async with self.driver.session(database=self.database) as session:
+                result = await session.run(query, params or {})
+                return await result.data()
+
+    async def fulltext(self, index_name: str, value: str) -> List[Dict[str, Any]]:
+        return await self.query(FULLTEXT_QUERY, {"indexName": index_name, "value": value})
+
+    async def match_hours(self, value: str) -> List[Dict[str, Any]]:
+        return await self.query(HOURS_QUERY, {"time": value})
+
+    async def batched_lookups(self, lookups: List[Dict]) -> List[Dict[str, Any]]:
+        return await self.query(BATCHED_QUERY, {"lookups": lookups})
+
+    async def refresh_schema(self) -> None:
+        """Load the schema the same way Neo4jGraph does"""
+        node_properties = [
+            el["output"] for el in await self.query(
+                node_properties_query,
+                {"EXCLUDED_LABELS": EXCLUDED_LABELS + [BASE_ENTITY_LABEL]})
+        ]
+        rel_properties = [
+            el["output"] for el in await self.query(
+                rel_properties_query, {"EXCLUDED_LABELS": EXCLUDED_RELS})
+        ]
+        relationships = [
+            el["output"] for el in await self.query(
+                rel_query,
+                {"EXCLUDED_LABELS": EXCLUDED_LABELS + [BASE_ENTITY_LABEL]})
+        ]
+        try:
+            constraint = await self.query("SHOW CONSTRAINTS")
+        except ClientError:
+            # Read-only users might not see schema information
+            constraint = []
+
+        self.structured_schema = {
+            "node_props": {el["labels"]: el["properties"] for el in node_properties},
+            "rel_props": {el["type"]: el["properties"] for el in rel_properties},
+            "relationships": relationships,
+            "metadata": {"constraint": constraint, "index": []},
+        }
+        # Same formatting as Neo4jGraph so prompts do not change
+        self.schema = _format_schema(self.structured_schema, False)
+
+    async def get_schema(self) -> str:
+        """Schema text for prompts, loaded on first use"""
+        if self.schema is None:
+            await self.refresh_schema()
+        return self.schema
+
+    async def close(self) -> None:
+        await self.driver.close()
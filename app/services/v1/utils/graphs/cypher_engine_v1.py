@@ -0,0 +1,873 @@
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class UnsupportedCypher(ValueError):
+    """The query uses Cypher the embedded graph does not run"""
+
+
+@dataclass(eq=False)
+class Node:
+    id: int
+    labels: Tuple[str, ...]
+    props: Dict[str, Any]
+    out: List["Relationship"] = field(default_factory=list, repr=False)
+    inc: List["Relationship"] = field(default_factory=list, repr=False)
+
+
+@dataclass(eq=False)
+class Relationship:
+    type: str
+    start: Node
+    end: Node
+    props: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class GraphStore:
+    """Nodes and relationships of the embedded graph, indexed by label"""
+    nodes: List[Node] = field(default_factory=list)
+    by_label: Dict[str, List[Node]] = field(default_factory=dict)
+    relationships: List[Relationship] = field(default_factory=list)
+
+    def add_node(self, label: str, props: Dict[str, Any]) -> Node:
+        node = Node(len(self.nodes), (label,), props)
+        self.nodes.append(node)
+        self.by_label.setdefault(label, []).append(node)
+        return node
+
+    def add_relationship(self, rel_type: str, start: Node, end: Node,
+                         props: Optional[Dict[str, Any]] = None) -> Relationship:
+        rel = Relationship(rel_type, start, end, props or {})
+        start.out.append(rel)
+        end.inc.append(rel)
+        self.relationships.append(rel)
+        return rel
+
+
+# Expressions are compiled to fn(row, params)
+Expr = Callable[[Dict[str, Any], Dict[str, Any]], Any]
+
+TOKEN = re.compile(r"""
+    (?P<space>\s+|//[^\n]*)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<number>\d+\.\d+|\d+)
+  | (?P<param>\$\w+)
+  | (?P<name>[A-Za-z_]\w*|`[^`]+`)
+  | (?P<op><>|<=|>=|=~|->|<-|[-=<>+*/%(){}\[\]:,.|;])
+""", re.VERBOSE)
+
+# Clauses that write or need procedures, the embedded graph is read-only
+NOT_SUPPORTED = {"CREATE", "MERGE", "SET", "DELETE", "DETACH", "REMOVE", "CALL", "UNWIND",
+                 "FOREACH", "LOAD", "UNION", "USE", "SHOW"}
+
+KEYWORDS = {"MATCH", "OPTIONAL", "WHERE", "RETURN", "WITH", "ORDER", "BY", "SKIP", "LIMIT",
+            "ASC", "ASCENDING", "DESC", "DESCENDING", "AND", "OR", "XOR", "NOT", "IN", "IS",
+            "NULL", "TRUE", "FALSE", "CONTAINS", "STARTS", "ENDS", "DISTINCT", "AS", "CASE",
+            "WHEN", "THEN", "ELSE", "END"} | NOT_SUPPORTED
+
+AGGREGATES = {"count", "sum", "avg", "min", "max", "collect"}
+
+
+def _to_string(value: Any) -> Optional[str]:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _to_number(kind: type) -> Callable[[Any], Any]:
+    def convert(value: Any) -> Any:
+        try:
+            return kind(float(value)) if kind is int else kind(value)
+        except (TypeError, ValueError):
+            return None
+    return convert
+
+
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "tolower": lambda value: value.lower(),
+    "toupper": lambda value: value.upper(),
+    "tostring": _to_string,
+    "tointeger": _to_number(int),
+    "tofloat": _to_number(float),
+    "trim": lambda value: value.strip(),
+    "ltrim": lambda value: value.lstrip(),
+    "rtrim": lambda value: value.rstrip(),
+    "size": len,
+    "abs": abs,
+    "round": lambda value, digits=0: round(value, int(digits)),
+    "replace": lambda value, old, new: value.replace(old, new),
+    "split": lambda value, separator: value.split(separator),
+    "substring": lambda value, start, length=None: (
+        value[int(start):] if length is None else value[int(start):int(start) + int(length)]),
+    "left": lambda value, length: value[:int(length)],
+    "right": lambda value, length: value[len(value) - int(length):],
+    "head": lambda values: values[0] if values else None,
+    "last": lambda values: values[-1] if values else None,
+    "labels": lambda node: list(node.labels),
+    "type": lambda rel: rel.type,
+    "keys": lambda item: list(item.props if isinstance(item, (Node, Relationship)) else item),
+    "id": lambda item: item.id,
+}
+
+
+def truth(value: Any) -> Optional[bool]:
+    return None if value is None else bool(value)
+
+
+def freeze(value: Any) -> Any:
+    """Hashable form of a value for grouping and DISTINCT"""
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    return value
+
+
+def sort_key(value: Any) -> Tuple:
+    """Numbers, then strings, then anything else, nulls last"""
+    if value is None:
+        return (3, 0)
+    if isinstance(value, (int, float)):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value)
+    return (2, str(value))
+
+
+def output(value: Any) -> Any:
+    """Same shapes as neo4j's Result.data()"""
+    if isinstance(value, Node):
+        return dict(value.props)
+    if isinstance(value, Relationship):
+        return (dict(value.start.props), value.type, dict(value.end.props))
+    if isinstance(value, list):
+        return [output(item) for item in value]
+    if isinstance(value, dict):
+        return {key: output(item) for key, item in value.items()}
+    return value
+
+
+def compare(op: str) -> Callable[[Any, Any], Optional[bool]]:
+    def fn(left: Any, right: Any) -> Optional[bool]:
+        if left is None or right is None:
+            return None
+        if op == "=":
+            return left == right
+        if op == "<>":
+            return left != right
+        try:
+            if op == "<":
+                return left < right
+            if op == "<=":
+                return left <= right
+            if op == ">":
+                return left > right
+            return left >= right
+        except TypeError:
+            return None
+    return fn
+
+
+def string_predicate(op: str) -> Callable[[Any, Any], Optional[bool]]:
+    def fn(left: Any, right: Any) -> Optional[bool]:
+        if not isinstance(left, str) or not isinstance(right, str):
+            return None
+        if op == "CONTAINS":
+            return right in left
+        if op == "STARTS":
+            return left.startswith(right)
+        if op == "ENDS":
+            return left.endswith(right)
+        return re.fullmatch(right, left) is not None
+    return fn
+
+
+def arithmetic(op: str) -> Callable[[Any, Any], Any]:
+    def fn(left: Any, right: Any) -> Any:
+        if left is None or right is None:
+            return None
+        try:
+            if op == "+":
+                if isinstance(left, str) or isinstance(right, str):
+                    return _to_string(left) + _to_string(right)
+                return left + right
+            if op == "-":
+                return left - right
+            if op == "*":
+                return left * right
+            if op == "%":
+                return left % right
+            if isinstance(left, int) and isinstance(right, int):
+                return int(left / right)
+            return left / right
+        except (TypeError, ZeroDivisionError) as e:
+            raise UnsupportedCypher(f"Cannot evaluate {left!r} {op} {right!r}: {e}")
+    return fn
+
+
+def in_list(left: Any, right: Any) -> Optional[bool]:
+    if left is None or right is None:
+        return None
+    if not isinstance(right, list):
+        raise UnsupportedCypher("IN expects a list")
+    return left in right
+
+
+@dataclass
+class Aggregate:
+    name: str
+    arg: Optional[Expr]
+    distinct: bool
+
+    def compute(self, rows: List[Dict], params: Dict) -> Any:
+        if self.arg is None:
+            return len(rows)
+        values = [value for value in (self.arg(row, params) for row in rows)
+                  if value is not None]
+        if self.distinct:
+            seen, unique = set(), []
+            for value in values:
+                if freeze(value) not in seen:
+                    seen.add(freeze(value))
+                    unique.append(value)
+            values = unique
+        if self.name == "count":
+            return len(values)
+        if self.name == "collect":
+            return values
+        if self.name == "sum":
+            return sum(values)
+        if not values:
+            return None
+        if self.name == "avg":
+            return sum(values) / len(values)
+        try:
+            return min(values) if self.name == "min" else max(values)
+        except TypeError:
+            return min(values, key=sort_key) if self.name == "min" else max(values, key=sort_key)
+
+
+@dataclass
+class NodePattern:
+    var: Optional[str]
+    labels: List[str]
+    props: List[Tuple[str, Expr]]
+
+
+@dataclass
+class RelPattern:
+    var: Optional[str]
+    types: List[str]
+    props: List[Tuple[str, Expr]]
+    direction: str
+
+
+@dataclass
+class Pattern:
+    nodes: List[NodePattern]
+    rels: List[RelPattern]
+
+    def variables(self) -> List[str]:
+        return [part.var for part in [*self.nodes, *self.rels] if part.var]
+
+
+@dataclass
+class Match:
+    patterns: List[Pattern]
+    where: Optional[Expr]
+    optional: bool
+
+    def run(self, rows: List[Dict], store: GraphStore, params: Dict) -> List[Dict]:
+        matched = []
+        variables = [var for pattern in self.patterns for var in pattern.variables()]
+        for row in rows:
+            found = [binding for binding in self.bind(0, row, store, params)
+                     if self.where is None or truth(self.where(binding, params)) is True]
+            if found:
+                matched.extend(found)
+            elif self.optional:
+                matched.append({**{var: None for var in variables}, **row})
+        return matched
+
+    def bind(self, index: int, row: Dict, store: GraphStore, params: Dict) -> Iterator[Dict]:
+        if index == len(self.patterns):
+            yield row
+            return
+        for binding in bind_pattern(self.patterns[index], row, store, params):
+            yield from self.bind(index + 1, binding, store, params)
+
+
+def props_match(expected: List[Tuple[str, Expr]], props: Dict, row: Dict, params: Dict) -> bool:
+    return all(props.get(key) == value(row, params) for key, value in expected)
+
+
+def node_matches(pattern: NodePattern, node: Node, row: Dict, params: Dict) -> bool:
+    if pattern.var and pattern.var in row and row[pattern.var] is not node:
+        return False
+    return all(label in node.labels for label in pattern.labels) and \
+        props_match(pattern.props, node.props, row, params)
+
+
+def bind(row: Dict, var: Optional[str], value: Any) -> Dict:
+    if var is None or var in row:
+        return row
+    return {**row, var: value}
+
+
+def bind_pattern(pattern: Pattern, row: Dict, store: GraphStore, params: Dict) -> Iterator[Dict]:
+    first = pattern.nodes[0]
+    if first.var and first.var in row:
+        bound = row[first.var]
+        candidates = [bound] if isinstance(bound, Node) else []
+    elif first.labels:
+        candidates = store.by_label.get(first.labels[0], [])
+    else:
+        candidates = store.nodes
+    for node in candidates:
+        if node_matches(first, node, row, params):
+            yield from extend_pattern(pattern, 0, node, bind(row, first.var, node), params)
+
+
+def extend_pattern(pattern: Pattern, index: int, node: Node, row: Dict,
+                   params: Dict) -> Iterator[Dict]:
+    if index == len(pattern.rels):
+        yield row
+        return
+    rel_pattern, next_pattern = pattern.rels[index], pattern.nodes[index + 1]
+    steps = []
+    if rel_pattern.direction in ("out", "both"):
+        steps += [(rel, rel.end) for rel in node.out]
+    if rel_pattern.direction in ("in", "both"):
+        steps += [(rel, rel.start) for rel in node.inc]
+    for rel, other in steps:
+        if rel_pattern.types and rel.type not in rel_pattern.types:
+            continue
+        if rel_pattern.var and rel_pattern.var in row and row[rel_pattern.var] is not rel:
+            continue
+        if not props_match(rel_pattern.props, rel.props, row, params):
+            continue
+        if not node_matches(next_pattern, other, row, params):
+            continue
+        binding = bind(bind(row, rel_pattern.var, rel), next_pattern.var, other)
+        yield from extend_pattern(pattern, index + 1, other, binding, params)
+
+
+@dataclass
+class Item:
+    expr: Expr
+    name: str
+    aggregate: bool
+
+
+@dataclass
+class Projection:
+    """RETURN, or WITH when it is not the last clause"""
+    items: List[Item]
+    distinct: bool
+    aggregates: List[Aggregate]
+    order: List[Tuple[Expr, bool]]
+    skip: Optional[Expr]
+    limit: Optional[Expr]
+    where: Optional[Expr]
+
+    def run(self, rows: List[Dict], store: GraphStore, params: Dict) -> List[Dict]:
+        if self.aggregates:
+            groups: Dict[Any, Tuple[Dict, List[Dict]]] = {}
+            for row in rows:
+                key = freeze([item.expr(row, params) for item in self.items
+                              if not item.aggregate])
+                groups.setdefault(key, (row, []))[1].append(row)
+            if not groups and all(item.aggregate for item in self.items):
+                groups[()] = ({}, [])
+            contexts = []
+            for first, members in groups.values():
+                context = dict(first)
+                for index, aggregate in enumerate(self.aggregates):
+                    context[f"\0agg{index}"] = aggregate.compute(members, params)
+                contexts.append(context)
+        else:
+            contexts = rows
+        projected = [(context, {item.name: item.expr(context, params) for item in self.items})
+                     for context in contexts]
+        if self.distinct:
+            seen, unique = set(), []
+            for context, values in projected:
+                key = freeze(list(values.values()))
+                if key not in seen:
+                    seen.add(key)
+                    unique.append((context, values))
+            projected = unique
+        for expr, descending in reversed(self.order):
+            projected.sort(key=lambda pair: sort_key(expr({**pair[0], **pair[1]}, params)),
+                           reverse=descending)
+        start = self.skip({}, params) if self.skip else 0
+        end = start + self.limit({}, params) if self.limit else None
+        result = [values for _, values in projected[start:end]]
+        if self.where is not None:
+            result = [row for row in result if truth(self.where(row, params)) is True]
+        return result
+
+
+@dataclass
+class Plan:
+    """A parsed query, cached by text and run against any GraphStore"""
+    clauses: List[Any]
+
+    def run(self, store: GraphStore, params: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        rows: List[Dict] = [{}]
+        for clause in self.clauses:
+            rows = clause.run(rows, store, params or {})
+        return [{key: output(value) for key, value in row.items()} for row in rows]
+
+
+class Parser:
+    """Recursive descent parser for the read-only Cypher the chatbot generates.
+
+    Supports MATCH and OPTIONAL MATCH over node and relationship patterns,
+    WHERE, WITH, RETURN with DISTINCT, aggregates, ORDER BY, SKIP and LIMIT,
+    and the usual operators, CASE and scalar functions. Anything else raises
+    UnsupportedCypher.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens: List[Tuple[str, str, int, int]] = []
+        position = 0
+        while position < len(text):
+            found = TOKEN.match(text, position)
+            if found is None:
+                raise UnsupportedCypher(f"Unexpected character {text[position]!r}")
+            if found.lastgroup != "space":
+                self.tokens.append((found.lastgroup, found.group(), found.start(), found.end()))
+            position = found.end()
+        self.tokens.append(("eof", "", len(text), len(text)))
+        self.position = 0
+        self.aggregates: Optional[List[Aggregate]] = None
+
+    # Token helpers
+
+    def peek(self, offset: int = 0) -> Tuple[str, str, int, int]:
+        return self.tokens[min(self.position + offset, len(self.tokens) - 1)]
+
+    def advance(self) -> Tuple[str, str, int, int]:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def is_keyword(self, word: str, offset: int = 0) -> bool:
+        kind, value, _, _ = self.peek(offset)
+        return kind == "name" and value.upper() == word
+
+    def accept_keyword(self, *words: str) -> bool:
+        if all(self.is_keyword(word, offset) for offset, word in enumerate(words)):
+            self.position += len(words)
+            return True
+        return False
+
+    def expect_keyword(self, word: str) -> None:
+        if not self.accept_keyword(word):
+            self.fail(f"expected {word}")
+
+    def accept(self, op: str) -> bool:
+        kind, value, _, _ = self.peek()
+        if kind == "op" and value == op:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, op: str) -> None:
+        if not self.accept(op):
+            self.fail(f"expected '{op}'")
+
+    def fail(self, message: str) -> None:
+        _, value, start, _ = self.peek()
+        near = value or "end of query"
+        raise UnsupportedCypher(f"{message} near '{near}' at offset {start}")
+
+    def name(self) -> str:
+        kind, value, _, _ = self.peek()
+        if kind != "name":
+            self.fail("expected a name")
+        self.position += 1
+        return value[1:-1] if value.startswith("`") else value
+
+    def variable(self) -> Optional[str]:
+        kind, value, _, _ = self.peek()
+        if kind == "name" and (value.startswith("`") or value.upper() not in KEYWORDS):
+            return self.name()
+        return None
+
+    # Clauses
+
+    def query(self) -> Plan:
+        clauses: List[Any] = []
+        while True:
+            if self.accept_keyword("OPTIONAL", "MATCH"):
+                clauses.append(self.match(optional=True))
+            elif self.accept_keyword("MATCH"):
+                clauses.append(self.match(optional=False))
+            elif self.accept_keyword("WITH"):
+                clauses.append(self.projection(final=False))
+            elif self.accept_keyword("RETURN"):
+                clauses.append(self.projection(final=True))
+                self.accept(";")
+                if self.peek()[0] != "eof":
+                    self.fail("expected the end of the query")
+                return Plan(clauses)
+            else:
+                kind, value, _, _ = self.peek()
+                if kind == "name" and value.upper() in NOT_SUPPORTED:
+                    raise UnsupportedCypher(
+                        f"{value.upper()} is not supported, the embedded graph is read-only")
+                self.fail("expected MATCH, WITH or RETURN")
+
+    def match(self, optional: bool) -> Match:
+        patterns = [self.pattern()]
+        while self.accept(","):
+            patterns.append(self.pattern())
+        where = self.expression() if self.accept_keyword("WHERE") else None
+        return Match(patterns, where, optional)
+
+    def pattern(self) -> Pattern:
+        if self.peek()[0] == "name" and self.peek(1)[1] == "=":
+            self.fail("named paths are not supported")
+        nodes, rels = [self.node()], []
+        while self.peek()[1] in ("-", "<-"):
+            rels.append(self.relationship())
+            nodes.append(self.node())
+        return Pattern(nodes, rels)
+
+    def node(self) -> NodePattern:
+        self.expect("(")
+        var = self.variable()
+        labels = []
+        while self.accept(":"):
+            labels.append(self.name())
+        props = self.properties() if self.peek()[1] == "{" else []
+        self.expect(")")
+        return NodePattern(var, labels, props)
+
+    def relationship(self) -> RelPattern:
+        incoming = self.accept("<-")
+        if not incoming:
+            self.expect("-")
+        var, types, props = None, [], []
+        if self.accept("["):
+            var = self.variable()
+            if self.accept(":"):
+                types.append(self.name())
+                while self.accept("|"):
+                    self.accept(":")
+                    types.append(self.name())
+            if self.peek()[1] == "*":
+                self.fail("variable length relationships are not supported")
+            if self.peek()[1] == "{":
+                props = self.properties()
+            self.expect("]")
+        outgoing = self.accept("->")
+        if not outgoing:
+            self.expect("-")
+        if incoming and outgoing:
+            self.fail("a relationship cannot point both ways")
+        return RelPattern(var, types, props, "in" if incoming else "out" if outgoing else "both")
+
+    def properties(self) -> List[Tuple[str, Expr]]:
+        self.expect("{")
+        props = []
+        if not self.accept("}"):
+            while True:
+                key = self.name()
+                self.expect(":")
+                props.append((key, self.expression()))
+                if self.accept("}"):
+                    break
+                self.expect(",")
+        return props
+
+    def projection(self, final: bool) -> Projection:
+        distinct = self.accept_keyword("DISTINCT")
+        if self.peek()[1] == "*":
+            self.fail("* projections are not supported")
+        self.aggregates = []
+        items = [self.item()]
+        while self.accept(","):
+            items.append(self.item())
+        order = []
+        if self.accept_keyword("ORDER"):
+            self.expect_keyword("BY")
+            while True:
+                expr = self.expression()
+                descending = False
+                if self.accept_keyword("DESC") or self.accept_keyword("DESCENDING"):
+                    descending = True
+                elif not self.accept_keyword("ASC"):
+                    self.accept_keyword("ASCENDING")
+                order.append((expr, descending))
+                if not self.accept(","):
+                    break
+        aggregates, self.aggregates = self.aggregates, None
+        skip = self.expression() if self.accept_keyword("SKIP") else None
+        limit = self.expression() if self.accept_keyword("LIMIT") else None
+        where = self.expression() if not final and self.accept_keyword("WHERE") else None
+        return Projection(items, distinct, aggregates, order, skip, limit, where)
+
+    def item(self) -> Item:
+        start = self.peek()[2]
+        before = len(self.aggregates)
+        expr = self.expression()
+        end = self.tokens[self.position - 1][3]
+        name = self.name() if self.accept_keyword("AS") else self.text[start:end]
+        return Item(expr, name, len(self.aggregates) > before)
+
+    # Expressions, lowest precedence first
+
+    def expression(self) -> Expr:
+        left = self.and_expression()
+        while self.accept_keyword("OR"):
+            left = self.or_(left, self.and_expression())
+        return left
+
+    @staticmethod
+    def or_(left: Expr, right: Expr) -> Expr:
+        def fn(row, params):
+            a = truth(left(row, params))
+            if a is True:
+                return True
+            b = truth(right(row, params))
+            if b is True:
+                return True
+            return None if a is None or b is None else False
+        return fn
+
+    def and_expression(self) -> Expr:
+        left = self.not_expression()
+        while self.accept_keyword("AND"):
+            left = self.and_(left, self.not_expression())
+        return left
+
+    @staticmethod
+    def and_(left: Expr, right: Expr) -> Expr:
+        def fn(row, params):
+            a = truth(left(row, params))
+            if a is False:
+                return False
+            b = truth(right(row, params))
+            if b is False:
+                return False
+            return None if a is None or b is None else True
+        return fn
+
+    def not_expression(self) -> Expr:
+        if self.accept_keyword("NOT"):
+            inner = self.not_expression()
+
+            def fn(row, params):
+                value = truth(inner(row, params))
+                return None if value is None else not value
+            return fn
+        return self.comparison()
+
+    def comparison(self) -> Expr:
+        left = self.additive()
+        while True:
+            kind, value, _, _ = self.peek()
+            if kind == "op" and value in ("=", "<>", "<", "<=", ">", ">="):
+                self.advance()
+                left = self.binary(left, self.additive(), compare(value))
+            elif kind == "op" and value == "=~":
+                self.advance()
+                left = self.binary(left, self.additive(), string_predicate("=~"))
+            elif self.accept_keyword("CONTAINS"):
+                left = self.binary(left, self.additive(), string_predicate("CONTAINS"))
+            elif self.accept_keyword("STARTS", "WITH"):
+                left = self.binary(left, self.additive(), string_predicate("STARTS"))
+            elif self.accept_keyword("ENDS", "WITH"):
+                left = self.binary(left, self.additive(), string_predicate("ENDS"))
+            elif self.accept_keyword("IN"):
+                left = self.binary(left, self.additive(), in_list)
+            elif self.accept_keyword("IS", "NOT", "NULL"):
+                left = (lambda inner: lambda row, params: inner(row, params) is not None)(left)
+            elif self.accept_keyword("IS", "NULL"):
+                left = (lambda inner: lambda row, params: inner(row, params) is None)(left)
+            else:
+                return left
+
+    @staticmethod
+    def binary(left: Expr, right: Expr, op: Callable[[Any, Any], Any]) -> Expr:
+        return lambda row, params: op(left(row, params), right(row, params))
+
+    def additive(self) -> Expr:
+        left = self.multiplicative()
+        while self.peek()[0] == "op" and self.peek()[1] in ("+", "-"):
+            op = arithmetic(self.advance()[1])
+            left = self.binary(left, self.multiplicative(), op)
+        return left
+
+    def multiplicative(self) -> Expr:
+        left = self.unary()
+        while self.peek()[0] == "op" and self.peek()[1] in ("*", "/", "%"):
+            op = arithmetic(self.advance()[1])
+            left = self.binary(left, self.unary(), op)
+        return left
+
+    def unary(self) -> Expr:
+        if self.accept("-"):
+            return self.binary(lambda row, params: 0, self.unary(), arithmetic("-"))
+        return self.postfix(self.atom())
+
+    def postfix(self, expr: Expr) -> Expr:
+        while True:
+            if self.accept("."):
+                key = self.name()
+                expr = (lambda inner, key: lambda row, params: get_property(
+                    inner(row, params), key))(expr, key)
+            elif self.peek()[1] == "[" and self.peek()[0] == "op":
+                self.advance()
+                index = self.expression()
+                self.expect("]")
+                expr = (lambda inner, index: lambda row, params: get_index(
+                    inner(row, params), index(row, params)))(expr, index)
+            else:
+                return expr
+
+    def atom(self) -> Expr:
+        kind, value, _, _ = self.peek()
+        if kind == "string":
+            self.advance()
+            text = re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t"}.get(m.group(1), m.group(1)),
+                          value[1:-1])
+            return lambda row, params: text
+        if kind == "number":
+            self.advance()
+            number = float(value) if "." in value else int(value)
+            return lambda row, params: number
+        if kind == "param":
+            self.advance()
+            key = value[1:]
+            return lambda row, params: params.get(key)
+        if self.accept("("):
+            inner = self.expression()
+            self.expect(")")
+            return inner
+        if self.accept("["):
+            items = []
+            if not self.accept("]"):
+                items.append(self.expression())
+                while self.accept(","):
+                    items.append(self.expression())
+                self.expect("]")
+            return lambda row, params: [item(row, params) for item in items]
+        if self.peek()[1] == "{":
+            entries = self.properties()
+            return lambda row, params: {key: item(row, params) for key, item in entries}
+        if self.accept_keyword("NULL"):
+            return lambda row, params: None
+        if self.accept_keyword("TRUE"):
+            return lambda row, params: True
+        if self.accept_keyword("FALSE"):
+            return lambda row, params: False
+        if self.accept_keyword("CASE"):
+            return self.case()
+        if kind == "name" and self.peek(1)[1] == "(":
+            return self.function()
+        var = self.variable()
+        if var is None:
+            self.fail("expected an expression")
+
+        def lookup(row, params):
+            try:
+                return row[var]
+            except KeyError:
+                raise UnsupportedCypher(f"Variable `{var}` not defined")
+        return lookup
+
+    def case(self) -> Expr:
+        subject = None if self.is_keyword("WHEN") else self.expression()
+        branches = []
+        while self.accept_keyword("WHEN"):
+            condition = self.expression()
+            self.expect_keyword("THEN")
+            branches.append((condition, self.expression()))
+        default = self.expression() if self.accept_keyword("ELSE") else None
+        self.expect_keyword("END")
+
+        def fn(row, params):
+            value = subject(row, params) if subject is not None else None
+            for condition, result in branches:
+                matched = condition(row, params)
+                if (subject is None and truth(matched) is True) or \
+                        (subject is not None and value is not None and value == matched):
+                    return result(row, params)
+            return default(row, params) if default is not None else None
+        return fn
+
+    def function(self) -> Expr:
+        name = self.name().lower()
+        self.expect("(")
+        if name in AGGREGATES:
+            if self.aggregates is None:
+                self.fail(f"{name}() is only supported in WITH and RETURN")
+            distinct = self.accept_keyword("DISTINCT")
+            arg = None
+            if not (name == "count" and self.accept("*")):
+                arg = self.expression()
+            self.expect(")")
+            key = f"\0agg{len(self.aggregates)}"
+            self.aggregates.append(Aggregate(name, arg, distinct))
+            return lambda row, params: row[key]
+        args = []
+        if not self.accept(")"):
+            args.append(self.expression())
+            while self.accept(","):
+                args.append(self.expression())
+            self.expect(")")
+        if name == "coalesce":
+            return lambda row, params: next(
+                (value for value in (arg(row, params) for arg in args) if value is not None), None)
+        fn = FUNCTIONS.get(name)
+        if fn is None:
+            raise UnsupportedCypher(f"Function {name}() is not supported")
+
+        def call(row, params):
+            values = [arg(row, params) for arg in args]
+            if any(value is None for value in values):
+                return None
+            try:
+                return fn(*values)
+            except (AttributeError, TypeError, ValueError, IndexError) as e:
+                raise UnsupportedCypher(f"Cannot evaluate {name}(): {e}")
+        return call
+
+
+def get_property(value: Any, key: str) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, (Node, Relationship)):
+        return value.props.get(key)
+    if isinstance(value, dict):
+        return value.get(key)
+    raise UnsupportedCypher(f"Cannot read property {key} of {value!r}")
+
+
+def get_index(value: Any, index: Any) -> Any:
+    if value is None or index is None:
+        return None
+    if isinstance(value, dict):
+        return value.get(index)
+    if isinstance(value, (Node, Relationship)):
+        return value.props.get(index)
+    try:
+        return value[int(index)]
+    except IndexError:
+        return None
+    except (TypeError, ValueError) as e:
+        raise UnsupportedCypher(f"Cannot index {value!r}: {e}")
+
+
+@lru_cache(maxsize=512)
+def parse_cypher(query: str) -> Plan:
+    """Parse once per query text, generated queries repeat through the template cache"""
+    return Parser(query).query()
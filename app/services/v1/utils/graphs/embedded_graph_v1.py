@@ -0,0 +1,203 @@
+import csv
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_community.graphs.neo4j_graph import _format_schema
+
+from .cypher_engine_v1 import GraphStore, UnsupportedCypher, parse_cypher
+from .graph_backend_v1 import GraphBackend
+from .graph_mirror_v1 import GraphMirror
+
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parents[5] / "data"
+
+# Label, file in data/ and the GraphMirror table it fills, as loaded by dataprocessing
+NODE_FILES = [
+    ("OfficeLocation", "office_locations.csv", "offices"),
+    ("OfficeHour", "office_hours.csv", "office_hours"),
+    ("Services", "services.csv", "services"),
+    ("Appointment", "appointments.csv", "appointments"),
+]
+
+# Type, start label and key, end label and key, start properties copied onto it
+RELATIONSHIPS = [
+    ("WORKING_HOURS", "OfficeLocation", "office_id", "OfficeHour", "office_id", ()),
+    ("SCHEDULED_AT", "Appointment", "office_id", "OfficeLocation", "office_id", ("status",)),
+    ("FOR_SERVICE", "Appointment", "service_id", "Services", "service_id", ("status",)),
+]
+
+
+def column_types(rows: List[Dict[str, str]]) -> Dict[str, Callable[[str], Any]]:
+    """int or float for columns where every value parses, like pandas does on ingestion"""
+    types = {}
+    for column in (rows[0] if rows else {}):
+        for kind in (int, float):
+            try:
+                for row in rows:
+                    kind(row[column])
+            except (TypeError, ValueError):
+                continue
+            types[column] = kind
+            break
+    return types
+
+
+def property_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "BOOLEAN"
+    if isinstance(value, int):
+        return "INTEGER"
+    if isinstance(value, float):
+        return "FLOAT"
+    return "STRING"
+
+
+class EmbeddedGraph(GraphBackend):
+    """In-process graph loaded from data/*.csv, no Neo4j needed.
+
+    Nodes and relationships are built the way dataprocessing ingests them.
+    Entity mapping lookups are answered by a GraphMirror of the same data,
+    queries run on a read-only Cypher subset engine with plans cached per
+    query text. Queries outside the subset raise UnsupportedCypher.
+    refresh_schema reloads the files, and notifies the reload listeners,
+    only when one of them changed.
+    """
+
+    name = "embedded"
+    cypher_rules = (
+        "The database runs a read-only subset of Cypher. Use only MATCH, OPTIONAL MATCH, "
+        "WHERE, WITH, RETURN with DISTINCT, ORDER BY, SKIP, LIMIT, CASE, count, sum, avg, "
+        "min, max, collect and the common string and number functions. Do not use CALL, "
+        "UNWIND, UNION, EXISTS, map projections, named paths, variable-length "
+        "relationships, list comprehensions, RETURN * or relationship patterns inside "
+        "WHERE, use OPTIONAL MATCH and count instead.")
+
+    def __init__(self, data_dir: Optional[str] = None):
+        super().__init__()
+        self.data_dir = Path(data_dir or os.getenv("PAYSOKO_DATA_DIR") or DEFAULT_DATA_DIR)
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.unsupported = 0
+        self.reloads = 0
+        self.mirror = GraphMirror()
+        self.fingerprint: Optional[Tuple] = None
+        self.load()
+
+    def data_fingerprint(self) -> Tuple:
+        """Size and modification time of every CSV file, changes when one is rewritten"""
+        stats = [os.stat(self.data_dir / file_name) for _, file_name, _ in NODE_FILES]
+        return tuple((stat.st_size, stat.st_mtime_ns) for stat in stats)
+
+    def load(self) -> None:
+        """Read data/*.csv and swap in the new graph, mirror and schema"""
+        fingerprint = self.data_fingerprint()
+        store = GraphStore()
+        tables: Dict[str, List[Dict]] = {}
+        for label, file_name, table in NODE_FILES:
+            with open(self.data_dir / file_name, newline="", encoding="utf-8") as file:
+                rows = list(csv.DictReader(file))
+            types = column_types(rows)
+            tables[table] = [{key: types[key](value) if key in types else value
+                              for key, value in row.items()} for row in rows]
+            for row in tables[table]:
+                store.add_node(label, dict(row))
+        for rel_type, start_label, start_key, end_label, end_key, copied in RELATIONSHIPS:
+            ends: Dict[Any, List] = {}
+            for node in store.by_label.get(end_label, []):
+                ends.setdefault(node.props.get(end_key), []).append(node)
+            for start in store.by_label.get(start_label, []):
+                for end in ends.get(start.props.get(start_key), []):
+                    store.add_relationship(rel_type, start, end,
+                                           {key: start.props.get(key) for key in copied})
+        structured_schema = self.build_schema(store)
+        with self._lock:
+            self.store = store
+            self._structured_schema = structured_schema
+            self._schema = _format_schema(structured_schema, False)
+            self.mirror.install(tables, "embedded")
+            self.fingerprint = fingerprint
+
+    @staticmethod
+    def build_schema(store: GraphStore) -> Dict[str, Any]:
+        """Structured schema in the shape Neo4jGraph.refresh_schema produces"""
+        node_props = {}
+        for label, nodes in store.by_label.items():
+            props: Dict[str, str] = {}
+            for node in nodes:
+                for key, value in node.props.items():
+                    props.setdefault(key, property_type(value))
+            node_props[label] = [{"property": key, "type": kind} for key, kind in props.items()]
+        rel_props: Dict[str, Dict[str, str]] = {}
+        relationships = []
+        for rel_type, start_label, _, end_label, _, _ in RELATIONSHIPS:
+            relationships.append({"start": start_label, "type": rel_type, "end": end_label})
+        for rel in store.relationships:
+            for key, value in rel.props.items():
+                rel_props.setdefault(rel.type, {}).setdefault(key, property_type(value))
+        return {
+            "node_props": node_props,
+            "rel_props": {rel_type: [{"property": key, "type": kind}
+                                     for key, kind in props.items()]
+                          for rel_type, props in rel_props.items()},
+            "relationships": relationships,
+            "metadata": {"constraint": [], "index": []},
+        }
+
+    @property
+    def get_schema(self) -> str:
+        return self._schema
+
+    @property
+    def structured_schema(self) -> Dict[str, Any]:
+        return self._structured_schema
+
+    def reload(self, force: bool = False) -> bool:
+        """Reload the CSV files if any changed since the last load, True if reloaded"""
+        if not force and self.data_fingerprint() == self.fingerprint:
+            return False
+        self.load()
+        with self._lock:
+            self.reloads += 1
+        # Data may have changed even when the schema fingerprint did not
+        self.notify_reload()
+        return True
+
+    def refresh_schema(self) -> None:
+        """The schema follows the data, it only changes when the files did.
+
+        Periodic schema refreshes cost a stat call per file and leave the
+        graph, the mirror and everything listening for reloads untouched.
+        """
+        self.reload()
+
+    def query(self, query: str, params: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        params = params or {}
+        with self._lock:
+            self.queries += 1
+        try:
+            return parse_cypher(query).run(self.store, params)
+        except UnsupportedCypher:
+            with self._lock:
+                self.unsupported += 1
+            raise
+
+    def fulltext(self, index_name: str, value: str) -> List[Dict[str, Any]]:
+        return self.mirror.search(index_name, value)
+
+    def match_hours(self, value: str) -> List[Dict[str, Any]]:
+        return self.mirror.match_hours(value)
+
+    def info(self) -> Dict[str, Any]:
+        store = self.store
+        return {
+            "backend": self.name,
+            "data_dir": str(self.data_dir),
+            "nodes": {label: len(nodes) for label, nodes in store.by_label.items()},
+            "relationships": len(store.relationships),
+            "queries": self.queries,
+            "unsupported": self.unsupported,
+            "reloads": self.reloads,
+            "cached_plans": parse_cypher.cache_info().currsize,
+        }
@@ -0,0 +1,224 @@
+import asyncio
+from typing import Dict, List, Optional
+
+
+FULLTEXT_INDEXES = [
+    ("locationIndex", "office_locations"),
+    ("serviceIndex", "services"),
+    ("appointmentIndex", "appointments"),
+]
+
+FULLTEXT_QUERY = """
+       CALL db.index.fulltext.queryNodes($indexName, $value) 
+       YIELD node, score
+       WITH node, score, labels(node)[0] AS type
+       RETURN 
+           CASE type
+               WHEN 'OfficeLocation' THEN node.location_name
+               WHEN 'Services' THEN node.service_name
+               WHEN 'Appointment' THEN node.appointment_id
+           END AS result,
+           type,
+           score
+       ORDER BY score DESC
+       LIMIT 1
+       """
+
+HOURS_QUERY = """
+       MATCH (h:OfficeHour)
+       WHERE h.day_of_week = $time OR h.opening_time = $time OR h.closing_time = $time
+       RETURN 
+           h.day_of_week + ' ' + h.opening_time + '-' + h.closing_time as result,
+           'OfficeHour' as type,
+           1.0 as score
+       LIMIT 1
+       """
+
+# Every lookup of a question in one Neo4j round trip, rows come back keyed by position
+BATCHED_QUERY = """
+       UNWIND $lookups AS lookup
+       CALL {
+           WITH lookup
+           WITH lookup WHERE lookup.indexName IS NOT NULL
+           CALL db.index.fulltext.queryNodes(lookup.indexName, lookup.value)
+           YIELD node, score
+           WITH node, score, labels(node)[0] AS type
+           RETURN
+               CASE type
+                   WHEN 'OfficeLocation' THEN node.location_name
+                   WHEN 'Services' THEN node.service_name
+                   WHEN 'Appointment' THEN node.appointment_id
+               END AS result,
+               type,
+               score
+           ORDER BY score DESC
+           LIMIT 1
+         UNION ALL
+           WITH lookup
+           WITH lookup WHERE lookup.indexName IS NULL
+           MATCH (h:OfficeHour)
+           WHERE h.day_of_week = lookup.value OR h.opening_time = lookup.value
+              OR h.closing_time = lookup.value
+           RETURN
+               h.day_of_week + ' ' + h.opening_time + '-' + h.closing_time AS result,
+               'OfficeHour' AS type,
+               1.0 AS score
+           LIMIT 1
+       }
+       RETURN lookup.position AS position, result, type, score
+       """
+
+
+class EntityMapper:
+    """Maps extracted entities to database values via the fulltext indexes.
+
+    Lookups go through the backend's fulltext, match_hours and
+    batched_lookups, Neo4j runs the queries above, other backends answer
+    them their own way.
+    """
+
+    def __init__(self, graph, batched: bool = True, async_graph=None, mirror=None):
+        self.graph = graph
+        self.batched = batched
+        # Used by the awaitable methods, they fall back to graph in a thread
+        self.async_graph = async_graph
+        # A loaded GraphMirror answers every lookup without a round trip
+        self.mirror = mirror
+
+    @staticmethod
+    def lookups(entities) -> List[Dict]:
+        """Flatten entities into (index, value) lookups in prompt order"""
+        lookups = []
+        for index_name, field in FULLTEXT_INDEXES:
+            for entity in getattr(entities, field):
+                lookups.append({"indexName": index_name, "value": entity})
+        for time in entities.office_hours:
+            lookups.append({"indexName": None, "value": time})
+        for position, lookup in enumerate(lookups):
+            lookup["position"] = position
+        return lookups
+
+    @staticmethod
+    def to_mapping(entity: str, response: List[Dict]) -> Dict:
+        if response and len(response) > 0:
+            return {"entity": entity, "result": response[0]["result"],
+                    "type": response[0]["type"], "score": response[0]["score"]}
+        return {"entity": entity, "result": None, "type": None, "score": None}
+
+    def resolve(self, entities, batched: Optional[bool] = None) -> List[Dict]:
+        """Look up each extracted entity in the graph"""
+        if self.mirror is not None and self.mirror.loaded:
+            return self.resolve_mirror(entities)
+        batched = self.batched if batched is None else batched
+        if batched:
+            try:
+                return self.resolve_batched(entities)
+            except Exception as e:
+                # One bad value fails the whole batch, retry one by one
+                print(f"Error in batched entity mapping, falling back: {e}")
+        return self.resolve_sequential(entities)
+
+    def resolve_batched(self, entities) -> List[Dict]:
+        """Resolve every entity with a single UNWIND query"""
+        lookups = self.lookups(entities)
+        if not lookups:
+            return []
+        rows = self.graph.batched_lookups(lookups)
+        by_position = {row["position"]: row for row in rows}
+        return [
+            self.to_mapping(lookup["value"], [by_position[lookup["position"]]]
+                            if lookup["position"] in by_position else [])
+            for lookup in lookups
+        ]
+
+    def resolve_mirror(self, entities) -> List[Dict]:
+        """Resolve every entity from the in-memory graph mirror"""
+        mappings = []
+        for lookup in self.lookups(entities):
+            if lookup["indexName"] is not None:
+                response = self.mirror.search(lookup["indexName"], lookup["value"])
+            else:
+                response = self.mirror.match_hours(lookup["value"])
+            mappings.append(self.to_mapping(lookup["value"], response))
+        return mappings
+
+    def resolve_sequential(self, entities) -> List[Dict]:
+        """Resolve entities with one query per entity"""
+        mappings = []
+        for lookup in self.lookups(entities):
+            entity = lookup["value"]
+            try:
+                if lookup["indexName"] is not None:
+                    response = self.graph.fulltext(lookup["indexName"], entity)
+                else:
+                    response = self.graph.match_hours(entity)
+                mappings.append(self.to_mapping(entity, response))
+            except Exception as e:
+                if lookup["indexName"] is not None:
+                    print(f"Error mapping entity {entity}: {e}")
+                else:
+                    print(f"Error mapping office hour {entity}: {e}")
+        return mappings
+
+    async def _alookup(self, method: str, *args) -> List[Dict]:
+        """Call a lookup method of the async graph, or of graph in a thread"""
+        if self.async_graph is not None:
+            return await getattr(self.async_graph, method)(*args)
+        return await asyncio.to_thread(getattr(self.graph, method), *args)
+
+    async def aresolve(self, entities, batched: Optional[bool] = None) -> List[Dict]:
+        """Awaitable version of resolve"""
+        if self.mirror is not None and self.mirror.loaded:
+            return self.resolve_mirror(entities)
+        batched = self.batched if batched is None else batched
+        if batched:
+            try:
+                return await self.aresolve_batched(entities)
+            except Exception as e:
+                print(f"Error in batched entity mapping, falling back: {e}")
+        return await self.aresolve_sequential(entities)
+
+    async def aresolve_batched(self, entities) -> List[Dict]:
+        """Awaitable version of resolve_batched"""
+        lookups = self.lookups(entities)
+        if not lookups:
+            return []
+        rows = await self._alookup("batched_lookups", lookups)
+        by_position = {row["position"]: row for row in rows}
+        return [
+            self.to_mapping(lookup["value"], [by_position[lookup["position"]]]
+                            if lookup["position"] in by_position else [])
+            for lookup in lookups
+        ]
+
+    async def aresolve_sequential(self, entities) -> List[Dict]:
+        """Resolve entities with one query each, all in flight at once"""
+        async def resolve_one(lookup: Dict) -> Optional[Dict]:
+            entity = lookup["value"]
+            try:
+                if lookup["indexName"] is not None:
+                    response = await self._alookup("fulltext", lookup["indexName"], entity)
+                else:
+                    response = await self._alookup("match_hours", entity)
+                return self.to_mapping(entity, response)
+            except Exception as e:
+                print(f"Error mapping entity {entity}: {e}")
+                return None
+
+        mappings = await asyncio.gather(
+            *(resolve_one(lookup) for lookup in self.lookups(entities)))
+        return [mapping for mapping in mappings if mapping is not None]
+
+    @staticmethod
+    def format(mappings: List[Dict]) -> Optional[str]:
+        """Render mappings as the "X maps to Y" text used in the Cypher prompt"""
+        result = ""
+        for mapping in mappings:
+            if mapping["result"] is not None:
+                result += (f"{mapping['entity']} maps to {mapping['result']} "
+                           f"({mapping['type']}) with score "
+                           f"{mapping['score']:.2f}\n")
+            else:
+                result += f"No match found for {mapping['entity']}\n"
+
+        return result if result else None
@@ -0,0 +1,181 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from langchain_community.graphs import Neo4jGraph
+
+from utils.concurrency import ConcurrencyLimitV1
+
+from .async_graph_v1 import AsyncNeo4jGraph
+from .entity_mapper_v1 import BATCHED_QUERY, FULLTEXT_QUERY, HOURS_QUERY
+
+
+class GraphBackend(ABC):
+    """What the chatbot needs from a graph store.
+
+    query, get_schema, structured_schema and refresh_schema match
+    Neo4jGraph, so a backend can be passed anywhere a Neo4jGraph was.
+    fulltext, match_hours and batched_lookups are the lookups behind
+    map_to_database, Neo4j answers them with Cypher and other backends
+    however suits them. Backends that reload their data on refresh_schema
+    tell the listeners added with add_listener. Subclasses register under
+    their name and are picked with create().
+    """
+
+    name = "base"
+    backends: Dict[str, Type["GraphBackend"]] = {}
+    # Added to the Cypher prompt when a backend only runs part of Cypher
+    cypher_rules = ""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        GraphBackend.backends[cls.name] = cls
+
+    def __init__(self):
+        self._listeners: List[Callable[[], None]] = []
+
+    @classmethod
+    def create(cls, name: str, **kwargs) -> "GraphBackend":
+        """Build the backend registered under name, e.g. GRAPH_BACKEND"""
+        try:
+            backend = cls.backends[name.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown graph backend {name!r}, "
+                             f"expected one of {sorted(cls.backends)}")
+        return backend(**kwargs)
+
+    @abstractmethod
+    def query(self, query: str, params: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @property
+    @abstractmethod
+    def get_schema(self) -> str:
+        ...
+
+    @property
+    @abstractmethod
+    def structured_schema(self) -> Dict[str, Any]:
+        ...
+
+    def refresh_schema(self) -> None:
+        pass
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """Call listener after refresh_schema reloaded the data, not just the schema"""
+        self._listeners.append(listener)
+
+    def notify_reload(self) -> None:
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception as e:
+                print(f"Error handling graph reload: {e}")
+
+    @abstractmethod
+    def fulltext(self, index_name: str, value: str) -> List[Dict[str, Any]]:
+        """Best match for value in a fulltext index as result, type and score"""
+
+    @abstractmethod
+    def match_hours(self, value: str) -> List[Dict[str, Any]]:
+        """First office hour whose day, opening or closing time equals value"""
+
+    def batched_lookups(self, lookups: List[Dict]) -> List[Dict[str, Any]]:
+        """fulltext or match_hours rows for every lookup, keyed by lookup position"""
+        rows = []
+        for lookup in lookups:
+            if lookup["indexName"] is None:
+                found = self.match_hours(lookup["value"])
+            else:
+                found = self.fulltext(lookup["indexName"], lookup["value"])
+            rows += [{"position": lookup["position"], **row} for row in found]
+        return rows
+
+    def async_graph(self, max_concurrent_queries: Optional[int] = None):
+        """Awaitable counterpart used by a_ask"""
+        return AsyncGraphBackend(self, max_concurrent_queries)
+
+    def info(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class Neo4jBackend(GraphBackend):
+    """Neo4j through langchain's Neo4jGraph, async queries use AsyncNeo4jGraph"""
+
+    name = "neo4j"
+
+    def __init__(self, graph: Optional[Neo4jGraph] = None):
+        super().__init__()
+        self.graph = graph or Neo4jGraph()
+
+    def query(self, query: str, params: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        return self.graph.query(query, params or {})
+
+    @property
+    def get_schema(self) -> str:
+        return self.graph.get_schema
+
+    @property
+    def structured_schema(self) -> Dict[str, Any]:
+        return self.graph.structured_schema
+
+    def refresh_schema(self) -> None:
+        self.graph.refresh_schema()
+
+    def fulltext(self, index_name: str, value: str) -> List[Dict[str, Any]]:
+        return self.query(FULLTEXT_QUERY, {"indexName": index_name, "value": value})
+
+    def match_hours(self, value: str) -> List[Dict[str, Any]]:
+        return self.query(HOURS_QUERY, {"time": value})
+
+    def batched_lookups(self, lookups: List[Dict]) -> List[Dict[str, Any]]:
+        """Every lookup in one round trip"""
+        return self.query(BATCHED_QUERY, {"lookups": lookups})
+
+    def async_graph(self, max_concurrent_queries: Optional[int] = None) -> AsyncNeo4jGraph:
+        return AsyncNeo4jGraph(max_concurrent_queries=max_concurrent_queries)
+
+
+class AsyncGraphBackend:
+    """Awaitable wrapper for backends without an async driver.
+
+    In-process backends answer in microseconds, so queries run inline on
+    the event loop. Set run_in_thread for a backend that blocks on I/O.
+    """
+
+    def __init__(self, backend: GraphBackend, max_concurrent_queries: Optional[int] = None,
+                 run_in_thread: bool = False):
+        self.backend = backend
+        self.run_in_thread = run_in_thread
+        self.limit = ConcurrencyLimitV1("graph", max_concurrent_queries or 0)
+        self.schema: Optional[str] = backend.get_schema
+        self.structured_schema: Dict[str, Any] = backend.structured_schema
+
+    async def _run(self, method: Callable[..., List[Dict[str, Any]]], *args) -> List[Dict[str, Any]]:
+        async with self.limit:
+            if self.run_in_thread:
+                return await asyncio.to_thread(method, *args)
+            return method(*args)
+
+    async def query(self, query: str, params: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        return await self._run(self.backend.query, query, params or {})
+
+    async def fulltext(self, index_name: str, value: str) -> List[Dict[str, Any]]:
+        return await self._run(self.backend.fulltext, index_name, value)
+
+    async def match_hours(self, value: str) -> List[Dict[str, Any]]:
+        return await self._run(self.backend.match_hours, value)
+
+    async def batched_lookups(self, lookups: List[Dict]) -> List[Dict[str, Any]]:
+        return await self._run(self.backend.batched_lookups, lookups)
+
+    async def refresh_schema(self) -> None:
+        await asyncio.to_thread(self.backend.refresh_schema)
+        self.schema = self.backend.get_schema
+        self.structured_schema = self.backend.structured_schema
+
+    async def get_schema(self) -> str:
+        return self.schema
+
+    async def close(self) -> None:
+        pass
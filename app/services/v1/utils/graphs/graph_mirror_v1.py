@@ -0,0 +1,305 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+SNAPSHOT_VERSION = 1
+
+MIRROR_QUERIES = {
+    "offices": """
+       MATCH (o:OfficeLocation)
+       RETURN o.office_id AS office_id, o.location_name AS location_name,
+              o.address AS address, o.region AS region,
+              o.phone_number AS phone_number
+       ORDER BY office_id
+       """,
+    "office_hours": """
+       MATCH (h:OfficeHour)
+       RETURN h.office_id AS office_id, h.day_of_week AS day_of_week,
+              h.opening_time AS opening_time, h.closing_time AS closing_time
+       ORDER BY office_id
+       """,
+    "services": """
+       MATCH (s:Services)
+       RETURN s.service_id AS service_id, s.service_name AS service_name,
+              s.description AS description, s.cost_ksh AS cost_ksh,
+              s.duration_minutes AS duration_minutes
+       ORDER BY service_id
+       """,
+    "appointments": """
+       MATCH (a:Appointment)
+       RETURN a.appointment_id AS appointment_id, a.customer_id AS customer_id,
+              a.office_id AS office_id, a.service_id AS service_id,
+              toString(a.appointment_date) AS appointment_date,
+              toString(a.appointment_time) AS appointment_time,
+              a.status AS status
+       ORDER BY appointment_id
+       """,
+}
+
+MIRROR_LABELS = {"OfficeLocation", "OfficeHour", "Services", "Appointment"}
+
+# Same node types and properties as the fulltext indexes in the README
+FULLTEXT_FIELDS = {
+    "locationIndex": ("offices", "OfficeLocation", "location_name",
+                      ("location_name", "address", "region")),
+    "serviceIndex": ("services", "Services", "service_name",
+                     ("service_name", "description")),
+    "appointmentIndex": ("appointments", "Appointment", "appointment_id",
+                         ("appointment_id", "customer_id")),
+}
+
+
+def tokens(value: Any) -> List[str]:
+    """Lowercase word tokens, close to Lucene's standard analyzer"""
+    return re.findall(r"\w+", str(value or "").lower())
+
+
+def match_score(query_tokens: List[str], field_tokens: List[str]) -> float:
+    """Share of query tokens found in the field plus share of the field matched"""
+    if not query_tokens or not field_tokens:
+        return 0.0
+    common = set(query_tokens) & set(field_tokens)
+    if not common:
+        return 0.0
+    return len(common) / len(set(query_tokens)) + len(common) / len(set(field_tokens))
+
+
+@dataclass
+class MirrorIndex:
+    """Immutable lookup tables built from one load, swapped in as a whole"""
+    data: Dict[str, List[Dict]]
+    offices_by_id: Dict[str, Dict] = field(default_factory=dict)
+    offices_by_name: Dict[str, Dict] = field(default_factory=dict)
+    hours_by_office_day: Dict[Tuple[str, str], Dict] = field(default_factory=dict)
+    hours_by_office: Dict[str, List[Dict]] = field(default_factory=dict)
+    services_by_id: Dict[str, Dict] = field(default_factory=dict)
+    services_by_name: Dict[str, Dict] = field(default_factory=dict)
+    appointments_by_id: Dict[str, Dict] = field(default_factory=dict)
+    appointments_by_date: Dict[str, List[Dict]] = field(default_factory=dict)
+    # Pre-tokenized fields per fulltext index, (node, [(tokens, ...)])
+    search_fields: Dict[str, List[Tuple[Dict, List[List[str]]]]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, data: Dict[str, List[Dict]]) -> "MirrorIndex":
+        index = cls(data={name: list(data.get(name) or []) for name in MIRROR_QUERIES})
+        for office in index.data["offices"]:
+            index.offices_by_id[office["office_id"]] = office
+            index.offices_by_name[str(office["location_name"]).lower()] = office
+        for hour in index.data["office_hours"]:
+            key = (hour["office_id"], str(hour["day_of_week"]).lower())
+            index.hours_by_office_day[key] = hour
+            index.hours_by_office.setdefault(hour["office_id"], []).append(hour)
+        for service in index.data["services"]:
+            index.services_by_id[service["service_id"]] = service
+            index.services_by_name[str(service["service_name"]).lower()] = service
+        for appointment in index.data["appointments"]:
+            index.appointments_by_id[appointment["appointment_id"]] = appointment
+            index.appointments_by_date.setdefault(
+                str(appointment["appointment_date"]), []).append(appointment)
+        for index_name, (name, _, _, fields) in FULLTEXT_FIELDS.items():
+            index.search_fields[index_name] = [
+                (node, [tokens(node.get(prop)) for prop in fields])
+                for node in index.data[name]
+            ]
+        return index
+
+    def counts(self) -> Dict[str, int]:
+        return {name: len(rows) for name, rows in self.data.items()}
+
+
+class GraphMirror:
+    """Read-only in-memory copy of the Paysoko graph for hot lookups.
+
+    The whole graph is a few dozen nodes, so entity mapping and simple fact
+    lookups are served from indexed dictionaries instead of crossing the
+    network. Neo4j stays the source of truth: refresh reloads everything
+    and writes a JSON snapshot that the next cold start loads first.
+    """
+
+    def __init__(self, graph=None, async_graph=None,
+                 snapshot_path: Optional[str] = None):
+        self.graph = graph
+        self.async_graph = async_graph
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._index: Optional[MirrorIndex] = None
+        self._lock = threading.Lock()
+        self.source: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        self.refreshes = 0
+        self.lookups = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._index is not None
+
+    def install(self, data: Dict[str, List[Dict]], source: str) -> None:
+        """Build indexes for data and swap them in, readers never see a partial load"""
+        index = MirrorIndex.build(data)
+        with self._lock:
+            self._index = index
+            self.source = source
+            self.loaded_at = time.time()
+
+    def load(self) -> bool:
+        """Load the snapshot if there is one, else read the graph"""
+        if self.load_snapshot():
+            return True
+        try:
+            self.refresh()
+            return True
+        except Exception as e:
+            print(f"Error loading graph mirror: {e}")
+            return False
+
+    def fetch(self) -> Dict[str, List[Dict]]:
+        return {name: self.graph.query(query) for name, query in MIRROR_QUERIES.items()}
+
+    async def afetch(self) -> Dict[str, List[Dict]]:
+        if self.async_graph is None:
+            return await asyncio.to_thread(self.fetch)
+        results = await asyncio.gather(
+            *(self.async_graph.query(query) for query in MIRROR_QUERIES.values()))
+        return dict(zip(MIRROR_QUERIES, results))
+
+    def refresh(self) -> None:
+        """Reload everything from Neo4j, e.g. after ingestion"""
+        self.install(self.fetch(), "graph")
+        self.refreshes += 1
+        self.save_snapshot()
+
+    async def arefresh(self) -> None:
+        """Awaitable version of refresh"""
+        self.install(await self.afetch(), "graph")
+        self.refreshes += 1
+        await asyncio.to_thread(self.save_snapshot)
+
+    def covers(self, labels: Optional[List[str]]) -> bool:
+        """Whether a change to these labels (None means all) affects the mirror"""
+        return not labels or bool(MIRROR_LABELS & set(labels))
+
+    def load_snapshot(self) -> bool:
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return False
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as file:
+                snapshot = json.load(file)
+            if snapshot.get("version") != SNAPSHOT_VERSION:
+                return False
+            self.install(snapshot["data"], "snapshot")
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading graph mirror snapshot: {e}")
+            return False
+
+    def save_snapshot(self) -> None:
+        index = self._index
+        if self.snapshot_path is None or index is None:
+            return
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.snapshot_path.with_suffix(self.snapshot_path.suffix + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as file:
+                json.dump({"version": SNAPSHOT_VERSION, "saved_at": time.time(),
+                           "data": index.data}, file, default=str,
+                          separators=(",", ":"))
+            os.replace(tmp, self.snapshot_path)
+        except OSError as e:
+            print(f"Error writing graph mirror snapshot: {e}")
+
+    # Fact lookups
+
+    def office(self, value: str) -> Optional[Dict]:
+        """Office by ID or location name"""
+        index = self._index
+        if index is None:
+            return None
+        self.lookups += 1
+        return (index.offices_by_id.get(value.upper())
+                or index.offices_by_name.get(value.lower()))
+
+    def office_hours(self, office: str, day: Optional[str] = None) -> List[Dict]:
+        """Opening hours of an office (ID or name), for one weekday or all"""
+        index = self._index
+        found = self.office(office)
+        if index is None or found is None:
+            return []
+        if day is None:
+            return list(index.hours_by_office.get(found["office_id"], []))
+        hour = index.hours_by_office_day.get((found["office_id"], day.lower()))
+        return [hour] if hour else []
+
+    def service(self, value: str) -> Optional[Dict]:
+        """Service by ID or name"""
+        index = self._index
+        if index is None:
+            return None
+        self.lookups += 1
+        return (index.services_by_id.get(value.upper())
+                or index.services_by_name.get(value.lower()))
+
+    def appointment(self, appointment_id: str) -> Optional[Dict]:
+        index = self._index
+        if index is None:
+            return None
+        self.lookups += 1
+        return index.appointments_by_id.get(appointment_id.upper())
+
+    def appointments_on(self, date: str) -> List[Dict]:
+        """Appointments on a YYYY-MM-DD date"""
+        index = self._index
+        if index is None:
+            return []
+        self.lookups += 1
+        return list(index.appointments_by_date.get(date, []))
+
+    # Entity mapping, same row shape as the queries in entity_mapper_v1
+
+    def search(self, index_name: str, value: str) -> List[Dict]:
+        """Best match for value in a fulltext index, like db.index.fulltext.queryNodes"""
+        index = self._index
+        if index is None:
+            return []
+        self.lookups += 1
+        _, label, result_prop, _ = FULLTEXT_FIELDS[index_name]
+        query_tokens = tokens(value)
+        best, best_score = None, 0.0
+        for node, fields in index.search_fields.get(index_name, []):
+            score = max(match_score(query_tokens, field_tokens) for field_tokens in fields)
+            if score > best_score:
+                best, best_score = node, score
+        if best is None:
+            return []
+        return [{"result": best[result_prop], "type": label, "score": best_score}]
+
+    def match_hours(self, value: str) -> List[Dict]:
+        """First office hour whose day, opening or closing time equals value"""
+        index = self._index
+        if index is None:
+            return []
+        self.lookups += 1
+        for hour in index.data["office_hours"]:
+            if value in (hour["day_of_week"], hour["opening_time"], hour["closing_time"]):
+                return [{
+                    "result": f"{hour['day_of_week']} {hour['opening_time']}-{hour['closing_time']}",
+                    "type": "OfficeHour",
+                    "score": 1.0,
+                }]
+        return []
+
+    def info(self) -> Dict[str, Any]:
+        index = self._index
+        return {
+            "loaded": index is not None,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "counts": index.counts() if index is not None else {},
+            "refreshes": self.refreshes,
+            "lookups": self.lookups,
+        }
@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain.chains.graph_qa.cypher_utils import Schema
+
+
+@dataclass(frozen=True)
+class SchemaState:
+    version: int
+    fingerprint: str
+    schema_text: str
+    structured_schema: Dict[str, Any]
+    corrector_schema: List[Schema]
+    loaded_at: float
+
+
+def schema_fingerprint(structured_schema: Dict[str, Any]) -> str:
+    """Hash of labels, properties and relationships, metadata is ignored"""
+    payload = {
+        key: structured_schema.get(key)
+        for key in ("node_props", "rel_props", "relationships")
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class SchemaSnapshot:
+    """Graph schema loaded once and shared by the Cypher prompt and corrector.
+
+    The prompt text and the CypherQueryCorrector schema list are derived from
+    the same structured schema, so after a refresh they can never disagree.
+    The version only moves when the fingerprint changes, and listeners are
+    told about it so they can rebuild what depends on the schema.
+    """
+
+    def __init__(self, graph, async_graph=None):
+        self.graph = graph
+        self.async_graph = async_graph
+        self._listeners: List[Callable[[SchemaState], None]] = []
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.state: Optional[SchemaState] = None
+        self.load(graph.get_schema, graph.structured_schema)
+
+    @property
+    def schema_text(self) -> str:
+        return self.state.schema_text
+
+    @property
+    def corrector_schema(self) -> List[Schema]:
+        return self.state.corrector_schema
+
+    @property
+    def version(self) -> int:
+        return self.state.version
+
+    def add_listener(self, listener: Callable[[SchemaState], None]) -> None:
+        """Call listener with the new state whenever the schema changes"""
+        self._listeners.append(listener)
+
+    def load(self, schema_text: str, structured_schema: Dict[str, Any]) -> bool:
+        """Install a schema, returns True if it differs from the current one"""
+        fingerprint = schema_fingerprint(structured_schema)
+        with self._lock:
+            if self.state is not None and self.state.fingerprint == fingerprint:
+                return False
+            self.state = SchemaState(
+                version=self.state.version + 1 if self.state else 1,
+                fingerprint=fingerprint,
+                schema_text=schema_text,
+                structured_schema=structured_schema,
+                corrector_schema=[
+                    Schema(el["start"], el["type"], el["end"])
+                    for el in structured_schema.get("relationships") or []
+                ],
+                loaded_at=time.time(),
+            )
+            state = self.state
+        for listener in self._listeners:
+            listener(state)
+        return True
+
+    def refresh(self) -> bool:
+        """Reload the schema from Neo4j, e.g. after ingestion"""
+        self.graph.refresh_schema()
+        return self.load(self.graph.get_schema, self.graph.structured_schema)
+
+    async def arefresh(self) -> bool:
+        """Awaitable version of refresh"""
+        if self.async_graph is None:
+            return await asyncio.to_thread(self.refresh)
+        await self.async_graph.refresh_schema()
+        return self.load(self.async_graph.schema, self.async_graph.structured_schema)
+
+    def start_background_refresh(self, interval_seconds: float) -> None:
+        """Refresh on a slow interval from the running event loop"""
+        async def refresh_forever():
+            while True:
+                await asyncio.sleep(interval_seconds)
+                try:
+                    await self.arefresh()
+                except Exception as e:
+                    print(f"Error refreshing graph schema: {e}")
+
+        if self._task is None and interval_seconds > 0:
+            self._task = asyncio.get_running_loop().create_task(refresh_forever())
+
+    async def stop_background_refresh(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def info(self) -> Dict[str, Any]:
+        """Version and fingerprint of the current snapshot"""
+        return {
+            "version": self.state.version,
+            "fingerprint": self.state.fingerprint,
+            "loaded_at": self.state.loaded_at,
+        }
@@ -1 +1,3 @@
 from .qa_logger_v1 import QALogger as QALoggerV1  # noqa
+from .async_qa_logger_v1 import AsyncQALogger as AsyncQALoggerV1  # noqa
+from .qa_archive_v1 import QAArchive as QAArchiveV1  # noqa
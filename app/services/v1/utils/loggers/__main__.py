@@ -0,0 +1,4 @@
+from .qa_archive_v1 import main
+
+
+main()
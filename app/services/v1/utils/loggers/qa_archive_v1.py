@@ -0,0 +1,225 @@
+"""Columnar archive of rotated QA logs.
+
+Rotated qa_logs.*.csv files are compacted into Parquet segments, one per
+rotated file, and a manifest records each segment's time range so queries
+only open the segments that overlap the requested window. Queries also read
+the live log file, so questions asked since the last rotation are included.
+
+Run from app/services/v1:
+
+    $ python -m utils.loggers compact qa_logs.*.csv
+    $ python -m utils.loggers top --days 7
+    $ python -m utils.loggers search "Karen" --start 2024-12-01
+"""
+import argparse
+import csv
+import json
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+
+SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("s")),
+    ("question", pa.string()),
+    ("response", pa.string()),
+    ("stage_latencies", pa.string()),
+])
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+
+
+def _local(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive local time, how the logger writes timestamps, for aware bounds"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def read_log(path: str) -> Optional[pa.Table]:
+    """Rows of a CSV log with a valid timestamp, None if there are none"""
+    columns = {name: [] for name in SCHEMA.names}
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file):
+            timestamp = _parse_timestamp(row.get("timestamp"))
+            if timestamp is None:
+                continue
+            columns["timestamp"].append(timestamp)
+            columns["question"].append(row.get("question") or "")
+            columns["response"].append(row.get("response") or "")
+            columns["stage_latencies"].append(row.get("stage_latencies") or None)
+    if not columns["timestamp"]:
+        return None
+    return pa.table(columns, schema=SCHEMA)
+
+
+class QAArchive:
+    """Parquet segments of QA logs with a time-range manifest, plus the live log"""
+
+    def __init__(self, directory: str = "qa_archive", live_path: Optional[str] = "qa_logs.csv"):
+        self.directory = directory
+        self.live_path = live_path
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def segments(self) -> List[Dict]:
+        """Segment metadata from the manifest, oldest first"""
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path) as file:
+            return json.load(file)["segments"]
+
+    def _write_manifest(self, segments: List[Dict]) -> None:
+        temporary = self.manifest_path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump({"segments": segments}, file, indent=2)
+        os.replace(temporary, self.manifest_path)
+
+    def compact(self, path: str, remove_source: bool = True) -> Optional[Dict]:
+        """Turn one rotated CSV log into a Parquet segment"""
+        table = read_log(path)
+        if table is None:
+            if remove_source:
+                os.remove(path)
+            return None
+
+        timestamps = table["timestamp"].to_pylist()
+        root = os.path.splitext(os.path.basename(path))[0]
+        name, sequence = f"{root}.parquet", 0
+        # Rotated names can repeat once their CSV has been compacted away
+        while os.path.exists(os.path.join(self.directory, name)):
+            sequence += 1
+            name = f"{root}.{sequence}.parquet"
+        segment = {
+            "file": name,
+            "source": os.path.basename(path),
+            "rows": table.num_rows,
+            "min_timestamp": min(timestamps).isoformat(),
+            "max_timestamp": max(timestamps).isoformat(),
+        }
+        pq.write_table(
+            table.replace_schema_metadata({"segment": json.dumps(segment)}),
+            os.path.join(self.directory, name),
+            compression="zstd",
+        )
+        with self._lock:
+            segments = self.segments()
+            segments.append(segment)
+            segments.sort(key=lambda s: s["min_timestamp"])
+            self._write_manifest(segments)
+        if remove_source:
+            os.remove(path)
+        return segment
+
+    def scan(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+             columns: Optional[List[str]] = None) -> Iterator[pa.Table]:
+        """Tables of rows in [start, end), skipping segments outside the range.
+
+        The live log, not yet compacted, comes last. Timezone-aware bounds
+        are converted to local time.
+        """
+        start, end = _local(start), _local(end)
+        tables = (pq.read_table(os.path.join(self.directory, segment["file"]), columns=columns)
+                  for segment in self.segments()
+                  if not (start and datetime.fromisoformat(segment["max_timestamp"]) < start)
+                  and not (end and datetime.fromisoformat(segment["min_timestamp"]) >= end))
+        for table in self._with_live(tables, columns):
+            mask = None
+            if start:
+                mask = pc.greater_equal(table["timestamp"], pa.scalar(start, SCHEMA.field("timestamp").type))
+            if end:
+                before = pc.less(table["timestamp"], pa.scalar(end, SCHEMA.field("timestamp").type))
+                mask = before if mask is None else pc.and_(mask, before)
+            yield table.filter(mask) if mask is not None else table
+
+    def _with_live(self, tables: Iterator[pa.Table],
+                   columns: Optional[List[str]]) -> Iterator[pa.Table]:
+        yield from tables
+        if not self.live_path or not os.path.exists(self.live_path):
+            return
+        try:
+            live = read_log(self.live_path)
+        except (OSError, csv.Error) as e:
+            print(f"Error reading live QA log {self.live_path}: {e}")
+            return
+        if live is not None:
+            yield live.select(columns) if columns else live
+
+    def top_questions(self, days: int = 7, limit: int = 10,
+                      now: Optional[datetime] = None) -> List[Dict]:
+        """Most asked questions over the last days, case and punctuation folded"""
+        start = (now or datetime.now()) - timedelta(days=days)
+        counts: Counter = Counter()
+        examples: Dict[str, str] = {}
+        for table in self.scan(start=start, columns=["timestamp", "question"]):
+            normalized = pc.utf8_trim_whitespace(pc.replace_substring_regex(
+                pc.replace_substring_regex(pc.utf8_lower(table["question"]), r"[^\w\s]", ""),
+                r"\s+", " "))
+            grouped = pa.table({"q": normalized, "question": table["question"]}) \
+                .group_by("q").aggregate([("q", "count"), ("question", "min")])
+            for key, count, example in zip(grouped["q"].to_pylist(),
+                                           grouped["q_count"].to_pylist(),
+                                           grouped["question_min"].to_pylist()):
+                counts[key] += count
+                examples.setdefault(key, example)
+        return [{"question": examples[key], "count": count}
+                for key, count in counts.most_common(limit)]
+
+    def search_answers(self, text: str, start: Optional[datetime] = None,
+                       end: Optional[datetime] = None, limit: int = 100) -> List[Dict]:
+        """Q&A pairs whose answer contains text, within an optional date range"""
+        results = []
+        for table in self.scan(start=start, end=end):
+            matches = table.filter(pc.match_substring(
+                table["response"], text, ignore_case=True))
+            results.extend(matches.to_pylist())
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the QA log archive")
+    parser.add_argument("--archive", default="qa_archive")
+    parser.add_argument("--live", default="qa_logs.csv",
+                        help="Live log file included in queries")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact = commands.add_parser("compact", help="Compact rotated CSV logs")
+    compact.add_argument("paths", nargs="+")
+    compact.add_argument("--keep-source", action="store_true")
+    top = commands.add_parser("top", help="Top questions")
+    top.add_argument("--days", type=int, default=7)
+    top.add_argument("--limit", type=int, default=10)
+    search = commands.add_parser("search", help="Answers containing text")
+    search.add_argument("text")
+    search.add_argument("--start", type=datetime.fromisoformat)
+    search.add_argument("--end", type=datetime.fromisoformat)
+    search.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    archive = QAArchive(args.archive, live_path=args.live)
+    if args.command == "compact":
+        for path in args.paths:
+            print(archive.compact(path, remove_source=not args.keep_source))
+    elif args.command == "top":
+        for row in archive.top_questions(days=args.days, limit=args.limit):
+            print(f"{row['count']:>6}  {row['question']}")
+    else:
+        for row in archive.search_answers(args.text, args.start, args.end, args.limit):
+            print(json.dumps(row, default=str))
+
+
+if __name__ == "__main__":
+    main()
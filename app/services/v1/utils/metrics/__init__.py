@@ -0,0 +1,2 @@
+from .metrics_v1 import MetricsRegistry as MetricsRegistryV1  # noqa
+from .stage_timer_v1 import StageTimer as StageTimerV1  # noqa
@@ -0,0 +1,86 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from .metrics_v1 import Histogram
+
+
+# Breakdown of the request being served, shared with the tasks it starts
+_current_spans: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_spans", default=None)
+
+
+class StageTimer:
+    """Timing spans for pipeline stages.
+
+    Every span is observed in the stage histogram and, inside collect(),
+    added to that request's per-stage breakdown in milliseconds.
+    """
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    @contextmanager
+    def collect(self) -> Iterator[Dict[str, float]]:
+        """Gather the spans of everything run inside this block"""
+        previous = _current_spans.get()
+        spans: Dict[str, float] = {}
+        _current_spans.set(spans)
+        try:
+            yield spans
+        finally:
+            _current_spans.set(previous)
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.histogram.observe(elapsed, stage=stage)
+            spans = _current_spans.get()
+            if spans is not None:
+                spans[stage] = round(spans.get(stage, 0.0) + elapsed * 1000, 2)
+
+    def wrap(self, stage: str, runnable: Runnable) -> "TimedRunnable":
+        return TimedRunnable(runnable, self, stage)
+
+
+class TimedRunnable(Runnable):
+    """Runs a runnable inside a StageTimer span, streams end at the last chunk"""
+
+    def __init__(self, bound: Runnable, timer: StageTimer, stage: str):
+        self.bound = bound
+        self.timer = timer
+        self.stage = stage
+
+    @property
+    def InputType(self) -> Any:
+        return self.bound.InputType
+
+    @property
+    def OutputType(self) -> Any:
+        return self.bound.OutputType
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        with self.timer.span(self.stage):
+            return self.bound.invoke(input, config, **kwargs)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None,
+               **kwargs) -> Iterator[Any]:
+        with self.timer.span(self.stage):
+            yield from self.bound.stream(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None,
+                      **kwargs) -> Any:
+        with self.timer.span(self.stage):
+            return await self.bound.ainvoke(input, config, **kwargs)
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None,
+                      **kwargs) -> AsyncIterator[Any]:
+        with self.timer.span(self.stage):
+            async for chunk in self.bound.astream(input, config, **kwargs):
+                yield chunk
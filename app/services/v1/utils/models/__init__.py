@@ -0,0 +1,2 @@
+from .stage_models_v1 import StageModels as StageModelsV1  # noqa
+from .stage_models_v1 import StageModelConfig as StageModelConfigV1  # noqa
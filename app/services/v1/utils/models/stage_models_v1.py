@@ -0,0 +1,165 @@
+import os
+import threading
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_anthropic import ChatAnthropic
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import Runnable
+
+from utils.concurrency import ConcurrencyLimitV1, LimitedRunnableV1
+
+
+STAGES = ("entities", "cypher", "response")
+
+
+@dataclass
+class StageModelConfig:
+    model: str
+    max_tokens: int = 1024
+    # Latency budget in seconds, past it the request fails over to the fallbacks
+    timeout: Optional[float] = None
+    fallbacks: List[str] = field(default_factory=list)
+
+
+# Extraction is a small structured task, the answer keeps the strongest model
+DEFAULT_STAGE_MODELS = {
+    "entities": StageModelConfig("claude-3-haiku-20240307", max_tokens=512,
+                                 timeout=10.0, fallbacks=["claude-3-5-sonnet-20241022"]),
+    "cypher": StageModelConfig("claude-3-5-sonnet-20241022", max_tokens=1024,
+                               timeout=20.0, fallbacks=["claude-3-5-haiku-20241022"]),
+    "response": StageModelConfig("claude-3-opus-20240229", max_tokens=1024,
+                                 timeout=60.0, fallbacks=["claude-3-5-sonnet-20241022"]),
+}
+
+
+USAGE_FIELDS = ("calls", "input_tokens", "output_tokens", "cache_read_tokens",
+                "cache_write_tokens")
+
+
+class UsageCallback(BaseCallbackHandler):
+    """Adds the token usage reported by each chat model call to a stage's totals"""
+    run_inline = True
+
+    def __init__(self, stage: str, usage: Dict[str, Dict[str, int]], lock: threading.Lock):
+        self.stage = stage
+        self.usage = usage
+        self.lock = lock
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                with self.lock:
+                    totals = self.usage[self.stage]
+                    totals["calls"] += 1
+                    totals["input_tokens"] += usage.get("input_tokens", 0)
+                    totals["output_tokens"] += usage.get("output_tokens", 0)
+                    # Anthropic prompt caching, input_tokens already includes both
+                    details = usage.get("input_token_details") or {}
+                    totals["cache_read_tokens"] += details.get("cache_read") or 0
+                    totals["cache_write_tokens"] += details.get("cache_creation") or 0
+
+
+class FallbackCallback(BaseCallbackHandler):
+    """Counts a fallback model once its call returns, not when it is attempted"""
+    run_inline = True
+
+    def __init__(self, stage: str, model: str, stage_models: "StageModels"):
+        self.stage = stage
+        self.model = model
+        self.stage_models = stage_models
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        with self.stage_models._lock:
+            self.stage_models.fallbacks_used[self.stage] += 1
+            models = self.stage_models.fallback_models[self.stage]
+            models[self.model] = models.get(self.model, 0) + 1
+
+
+def anthropic_factory(model: str, max_tokens: int, timeout: Optional[float],
+                      max_retries: int) -> BaseChatModel:
+    return ChatAnthropic(model=model, max_tokens=max_tokens,
+                         default_request_timeout=timeout, max_retries=max_retries)
+
+
+class StageModels:
+    """Chat model, max_tokens, latency budget and fallbacks for each chain stage.
+
+    A stage's primary model gets its latency budget as the request timeout and
+    no retries, so a slow or failing call moves on to the next fallback
+    model instead of waiting. Fallbacks run without a budget so the stage
+    still produces an answer. Async calls across all stages share one
+    max_concurrent limit (0 for none).
+    """
+
+    def __init__(self, configs: Optional[Dict[str, StageModelConfig]] = None,
+                 factory: Callable[..., BaseChatModel] = anthropic_factory,
+                 max_concurrent: int = 0):
+        self.configs = {stage: replace(config) for stage, config in DEFAULT_STAGE_MODELS.items()}
+        self.configs.update(configs or {})
+        self.factory = factory
+        self._models: Dict[tuple, BaseChatModel] = {}
+        self._lock = threading.Lock()
+        # Calls answered by a fallback model, in total and by model
+        self.fallbacks_used = {stage: 0 for stage in self.configs}
+        self.fallback_models: Dict[str, Dict[str, int]] = {stage: {} for stage in self.configs}
+        self.usage = {stage: dict.fromkeys(USAGE_FIELDS, 0) for stage in self.configs}
+        self.limit = ConcurrencyLimitV1("llm", max_concurrent)
+
+    @classmethod
+    def from_env(cls, factory: Callable[..., BaseChatModel] = anthropic_factory) -> "StageModels":
+        """Override defaults with PAYSOKO_<STAGE>_MODEL, _MAX_TOKENS, _TIMEOUT and _FALLBACKS,
+        and the shared limit with PAYSOKO_LLM_MAX_CONCURRENT"""
+        configs = {}
+        for stage, default in DEFAULT_STAGE_MODELS.items():
+            prefix = f"PAYSOKO_{stage.upper()}_"
+            timeout = os.getenv(prefix + "TIMEOUT")
+            fallbacks = os.getenv(prefix + "FALLBACKS")
+            configs[stage] = StageModelConfig(
+                model=os.getenv(prefix + "MODEL", default.model),
+                max_tokens=int(os.getenv(prefix + "MAX_TOKENS", default.max_tokens)),
+                timeout=(float(timeout) or None) if timeout is not None else default.timeout,
+                fallbacks=([name.strip() for name in fallbacks.split(",") if name.strip()]
+                           if fallbacks is not None else list(default.fallbacks)),
+            )
+        return cls(configs, factory=factory,
+                   max_concurrent=int(os.getenv("PAYSOKO_LLM_MAX_CONCURRENT", "16")))
+
+    def model(self, name: str, max_tokens: int, timeout: Optional[float],
+              max_retries: int) -> BaseChatModel:
+        """Chat model instances are shared between stages with the same settings"""
+        key = (name, max_tokens, timeout, max_retries)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = self.factory(
+                    model=name, max_tokens=max_tokens, timeout=timeout,
+                    max_retries=max_retries)
+            return self._models[key]
+
+    def runnable(self, stage: str,
+                 wrap: Callable[[BaseChatModel], Runnable] = lambda model: model) -> Runnable:
+        """The stage's model with wrap applied, e.g. structured output or stop words"""
+        config = self.configs[stage]
+        primary = wrap(self.model(config.model, config.max_tokens, config.timeout,
+                                  max_retries=0 if config.fallbacks else 2))
+        if config.fallbacks:
+            primary = primary.with_fallbacks([
+                wrap(self.model(name, config.max_tokens, None, max_retries=2)).with_config(
+                    callbacks=[FallbackCallback(stage, name, self)])
+                for name in config.fallbacks
+            ])
+        primary = primary.with_config(
+            callbacks=[UsageCallback(stage, self.usage, self._lock)])
+        return LimitedRunnableV1(primary, self.limit)
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {stage: {**asdict(config), "fallbacks_used": self.fallbacks_used[stage],
+                            "fallback_models": dict(self.fallback_models[stage]),
+                            "usage": dict(self.usage[stage])}
+                    for stage, config in self.configs.items()}
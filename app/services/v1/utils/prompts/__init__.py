@@ -0,0 +1 @@
+from .prompt_assembler_v1 import PromptAssembler as PromptAssemblerV1  # noqa
@@ -0,0 +1,215 @@
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from langchain_community.graphs.neo4j_graph import _format_schema
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.prompt_values import PromptValue
+
+
+# PaysokoEntities fields and the node label their values map to
+ENTITY_LABELS = {
+    "office_locations": "OfficeLocation",
+    "services": "Services",
+    "appointments": "Appointment",
+    "office_hours": "OfficeHour",
+}
+
+# Words that name a node type without naming an entity, e.g. "which services"
+TYPE_KEYWORDS = {
+    "OfficeLocation": {"office", "offices", "branch", "branches", "location", "locations",
+                       "located", "address", "where"},
+    "Services": {"service", "services", "fee", "fees", "cost", "costs", "price", "charge",
+                 "charges", "duration", "offer", "offers"},
+    "Appointment": {"appointment", "appointments", "booking", "bookings", "book", "booked",
+                    "scheduled", "status"},
+    "OfficeHour": {"hours", "open", "opens", "opening", "close", "closes", "closing",
+                   "closed", "working"},
+}
+
+_WORD = re.compile(r"[a-z]+")
+
+BULLET = re.compile(r"^[-*]\s+")
+
+# The only cache type Anthropic supports, entries live for five minutes
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count, about four characters per token for English"""
+    return (len(text) + 3) // 4
+
+
+@lru_cache(maxsize=64)
+def compact_text(text: str) -> str:
+    """Drop indentation and blank lines and fold bullet lists into one line.
+
+    "Header:" followed by "- a" and "- b" becomes "Header: a; b", which keeps
+    every instruction while cutting the whitespace and list markup tokens.
+    """
+    lines: List[str] = []
+    bullets: List[str] = []
+
+    def fold() -> None:
+        if not bullets:
+            return
+        if lines and lines[-1].endswith(":"):
+            lines[-1] = f"{lines[-1]} {'; '.join(bullets)}"
+        else:
+            lines.append("; ".join(bullets))
+        bullets.clear()
+
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if not line:
+            continue
+        if BULLET.match(line):
+            bullets.append(BULLET.sub("", line))
+            continue
+        fold()
+        lines.append(line)
+    fold()
+    return "\n".join(lines)
+
+
+def prune_schema(structured_schema: Dict[str, Any], labels: Iterable[str],
+                 hops: int = 1) -> Dict[str, Any]:
+    """Slice of the schema within hops relationships of the given labels"""
+    relationships = structured_schema.get("relationships") or []
+    keep = set(labels)
+    for _ in range(hops):
+        keep |= {rel["end"] for rel in relationships if rel["start"] in keep}
+        keep |= {rel["start"] for rel in relationships if rel["end"] in keep}
+    kept_relationships = [rel for rel in relationships
+                          if rel["start"] in keep and rel["end"] in keep]
+    kept_types = {rel["type"] for rel in kept_relationships}
+    return {
+        "node_props": {label: props for label, props
+                       in (structured_schema.get("node_props") or {}).items() if label in keep},
+        "rel_props": {rel_type: props for rel_type, props
+                      in (structured_schema.get("rel_props") or {}).items()
+                      if rel_type in kept_types},
+        "relationships": kept_relationships,
+        "metadata": structured_schema.get("metadata") or {},
+    }
+
+
+def covers(pruned: Dict[str, Any], labels: Iterable[str]) -> bool:
+    """Whether a schema slice holds every label and connects them all"""
+    labels = set(labels)
+    if not labels <= set(pruned["node_props"]):
+        return False
+    reached = {next(iter(labels))} if labels else set()
+    grown = True
+    while grown:
+        grown = False
+        for rel in pruned["relationships"]:
+            ends = {rel["start"], rel["end"]}
+            if ends & reached and not ends <= reached:
+                reached |= ends
+                grown = True
+    return labels <= reached
+
+
+class PromptAssembler:
+    """Builds the variable parts of the Cypher and answer prompts.
+
+    The Cypher prompt only gets the schema around the entity types the
+    question mentions, by name or by type words such as "services", and
+    static text such as the tone guide is compacted. Every assembled prompt
+    is measured against its unpruned version so the token savings can be
+    checked in stats(). With caching on, the system
+    message, which holds all static text, is marked for Anthropic prompt
+    caching.
+    """
+
+    def __init__(self, schema_snapshot, hops: int = 1, enabled: bool = True,
+                 caching: bool = True):
+        self.schema_snapshot = schema_snapshot
+        self.hops = hops
+        self.enabled = enabled
+        self.caching = caching
+        self._lock = threading.Lock()
+        self._slices: Dict[Tuple[int, FrozenSet[str]], str] = {}
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def labels(entities: Any = None, mappings: Optional[List[Dict]] = None,
+               question: Optional[str] = None) -> FrozenSet[str]:
+        """Node labels mentioned in the question, from extraction, mapping and type words"""
+        found = {mapping["type"] for mapping in mappings or [] if mapping.get("type")}
+        for field, label in ENTITY_LABELS.items():
+            if getattr(entities, field, None):
+                found.add(label)
+        words = set(_WORD.findall(question.lower())) if question else set()
+        found.update(label for label, keywords in TYPE_KEYWORDS.items() if words & keywords)
+        return frozenset(found)
+
+    def schema_for(self, labels: FrozenSet[str]) -> str:
+        """Schema text for the Cypher prompt, the full schema when nothing was mentioned"""
+        state = self.schema_snapshot.state
+        if not self.enabled or not labels:
+            return state.schema_text
+        key = (state.version, labels)
+        with self._lock:
+            cached = self._slices.get(key)
+        if cached is not None:
+            return cached
+        pruned = prune_schema(state.structured_schema, labels, self.hops)
+        # A slice missing a mentioned label, or leaving them unconnected, cannot
+        # answer the question, the model is better off with the whole schema
+        text = _format_schema(pruned, False) if covers(pruned, labels) else state.schema_text
+        with self._lock:
+            self._slices[key] = text
+        return text
+
+    def template(self, text: str) -> str:
+        return compact_text(text) if self.enabled else text
+
+    def tone(self, tone_of_voice: str) -> str:
+        return compact_text(tone_of_voice) if self.enabled and tone_of_voice else tone_of_voice
+
+    def cache_prefix(self, prompt: PromptValue) -> List[BaseMessage]:
+        """Messages with the system text marked as the cacheable prompt prefix"""
+        messages = prompt.to_messages()
+        if not self.caching:
+            return messages
+        return [
+            SystemMessage(content=[{"type": "text", "text": message.content,
+                                    "cache_control": CACHE_CONTROL}])
+            if isinstance(message, SystemMessage) and isinstance(message.content, str)
+            else message
+            for message in messages
+        ]
+
+    def invalidate(self) -> None:
+        """Forget schema slices after the schema changed"""
+        with self._lock:
+            self._slices.clear()
+
+    def record(self, prompt: str, full: str, assembled: str) -> None:
+        """Add one prompt's token counts before and after assembly"""
+        before, after = estimate_tokens(full), estimate_tokens(assembled)
+        with self._lock:
+            totals = self._totals.setdefault(
+                prompt, {"prompts": 0, "tokens_before": 0, "tokens_after": 0})
+            totals["prompts"] += 1
+            totals["tokens_before"] += before
+            totals["tokens_after"] += after
+
+    def stats(self) -> Dict[str, Any]:
+        """Estimated prompt tokens per prompt, before and after pruning and compaction"""
+        with self._lock:
+            prompts = {}
+            for prompt, totals in self._totals.items():
+                count = totals["prompts"]
+                prompts[prompt] = {
+                    **totals,
+                    "mean_before": totals["tokens_before"] / count,
+                    "mean_after": totals["tokens_after"] / count,
+                    "saved_rate": (1 - totals["tokens_after"] / totals["tokens_before"]
+                                   if totals["tokens_before"] else 0.0),
+                }
+            return {"enabled": self.enabled, "hops": self.hops, "caching": self.caching,
+                    "schema_slices": len(self._slices), "prompts": prompts}
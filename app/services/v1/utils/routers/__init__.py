@@ -0,0 +1 @@
+from .intent_router_v1 import IntentRouter as IntentRouterV1  # noqa
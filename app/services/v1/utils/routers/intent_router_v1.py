@@ -0,0 +1,392 @@
+import math
+import re
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.extractors import ExtractionResultV1
+
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday",
+            "Saturday", "Sunday"]
+
+# Added to the cosine score when a question contains one of an intent's keywords
+KEYWORD_BOOST = 0.3
+
+# Calls the full chain makes: entity extraction, Cypher generation, answer
+LLM_CALLS_PER_CHAIN = 3
+
+_TOKEN = re.compile(r"[a-z]+")
+
+# Function words that appear in every intent, "when", "where" and "how" are kept
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "been", "of", "on", "in", "at",
+    "to", "for", "and", "or", "it", "do", "does", "did", "what", "which",
+    "i", "my", "me", "you", "your", "we", "our", "can", "could", "will",
+    "would", "please", "tell", "there", "this", "that", "s", "paysoko",
+}
+
+
+def terms(text: str) -> List[str]:
+    """Lowercase content words with a plural s stripped, ids and numbers dropped"""
+    return [token[:-1] if len(token) > 3 and token.endswith("s")
+            and not token.endswith(("ss", "us")) else token
+            for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+@dataclass
+class Intent:
+    name: str
+    examples: List[str]
+    # Entity field that must hold exactly one value, e.g. "office_locations"
+    slot: str
+    query: str
+    render: Callable[[Dict[str, Any], List[Dict]], str]
+    # Other entity fields the question may mention without leaving the fast path
+    optional: Tuple[str, ...] = ()
+    # Words that on their own point at this intent, matched after terms()
+    keywords: Tuple[str, ...] = ()
+
+
+@dataclass
+class RouteDecision:
+    question: str
+    intent: Optional[str]
+    confidence: float
+    route: str
+    reason: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def fast(self) -> bool:
+        return self.route == "fast"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"intent": self.intent, "confidence": round(self.confidence, 3),
+                "route": self.route, "reason": self.reason}
+
+
+def render_office_hours(params: Dict[str, Any], rows: List[Dict]) -> str:
+    rows = sorted(rows, key=lambda row: WEEKDAYS.index(row["day"])
+                  if row["day"] in WEEKDAYS else len(WEEKDAYS))
+    lines = [f"Here's what I found for **{rows[0]['office']}**:", "",
+             "| Day | Opens | Closes |", "|---|---|---|"]
+    for row in rows:
+        if row["opening_time"] == "Closed":
+            lines.append(f"| {row['day']} | Closed | Closed |")
+        else:
+            lines.append(f"| {row['day']} | {row['opening_time']} | {row['closing_time']} |")
+    lines += ["", "Is there anything else you need help with?"]
+    return "\n".join(lines)
+
+
+def render_service_cost(params: Dict[str, Any], rows: List[Dict]) -> str:
+    row = rows[0]
+    return (f"Here's what I found: **{row['service']}** costs "
+            f"**KSh {row['cost_ksh']}** and takes about {row['duration_minutes']} minutes.\n\n"
+            "Is there anything else you need help with?")
+
+
+def render_service_duration(params: Dict[str, Any], rows: List[Dict]) -> str:
+    row = rows[0]
+    return (f"Here's what I found: **{row['service']}** takes about "
+            f"**{row['duration_minutes']} minutes** and costs KSh {row['cost_ksh']}.\n\n"
+            "Is there anything else you need help with?")
+
+
+def render_office_contact(params: Dict[str, Any], rows: List[Dict]) -> str:
+    row = rows[0]
+    return (f"Here's what I found for **{row['office']}**:\n\n"
+            f"- **Address:** {row['address']}\n"
+            f"- **Region:** {row['region']}\n"
+            f"- **Phone:** {row['phone_number']}\n\n"
+            "Is there anything else you need help with?")
+
+
+def render_appointment_status(params: Dict[str, Any], rows: List[Dict]) -> str:
+    row = rows[0]
+    lines = [f"Here's what I found for appointment **{row['appointment_id']}**:", "",
+             f"- **Status:** {row['status']}",
+             f"- **Date:** {row['appointment_date']} at {row['appointment_time']}"]
+    if row.get("office"):
+        lines.append(f"- **Office:** {row['office']}")
+    if row.get("service"):
+        lines.append(f"- **Service:** {row['service']}")
+    lines += ["", "Is there anything else you need help with?"]
+    return "\n".join(lines)
+
+
+INTENTS = [
+    Intent(
+        name="office_hours",
+        examples=[
+            "what time does the office open",
+            "when does the office close",
+            "opening hours of the branch",
+            "what are your working hours",
+            "is the office open on saturday",
+            "what time do you close on friday",
+            "office hours opening time closing time",
+            "until what time are you open today",
+        ],
+        slot="office_locations",
+        optional=("office_hours",),
+        query="""
+       MATCH (o:OfficeLocation {location_name: $office})-[:WORKING_HOURS]->(h:OfficeHour)
+       WHERE $day IS NULL OR h.day_of_week = $day
+       RETURN o.location_name AS office, h.day_of_week AS day,
+              h.opening_time AS opening_time, h.closing_time AS closing_time
+       """,
+        render=render_office_hours,
+        keywords=("open", "opening", "close", "closing", "closed", "hours"),
+    ),
+    Intent(
+        name="service_cost",
+        examples=[
+            "how much does it cost",
+            "what is the price of the service",
+            "what are the fees charged",
+            "how much do you charge",
+            "cost of the service in shillings",
+            "what is the charge for",
+        ],
+        slot="services",
+        query="""
+       MATCH (s:Services {service_name: $service})
+       RETURN s.service_name AS service, s.cost_ksh AS cost_ksh,
+              s.duration_minutes AS duration_minutes
+       """,
+        render=render_service_cost,
+        keywords=("cost", "price", "fees", "charge", "shillings", "ksh"),
+    ),
+    Intent(
+        name="service_duration",
+        examples=[
+            "how long does it take",
+            "how many minutes does the service take",
+            "what is the duration of the service",
+            "how long will i wait",
+            "how much time does it take",
+        ],
+        slot="services",
+        query="""
+       MATCH (s:Services {service_name: $service})
+       RETURN s.service_name AS service, s.cost_ksh AS cost_ksh,
+              s.duration_minutes AS duration_minutes
+       """,
+        render=render_service_duration,
+        keywords=("long", "duration", "minutes"),
+    ),
+    Intent(
+        name="office_contact",
+        examples=[
+            "what is the address of the office",
+            "where is the office located",
+            "what is the phone number",
+            "how can i contact the branch",
+            "where can i find the office",
+            "contact details and location",
+        ],
+        slot="office_locations",
+        query="""
+       MATCH (o:OfficeLocation {location_name: $office})
+       RETURN o.location_name AS office, o.address AS address,
+              o.region AS region, o.phone_number AS phone_number
+       """,
+        render=render_office_contact,
+        keywords=("address", "phone", "contact", "located", "location", "where"),
+    ),
+    Intent(
+        name="appointment_status",
+        examples=[
+            "what is the status of my appointment",
+            "is my appointment confirmed",
+            "check my booking status",
+            "has my appointment been cancelled",
+            "is my appointment still pending",
+            "when is my appointment",
+        ],
+        slot="appointments",
+        query="""
+       MATCH (a:Appointment {appointment_id: $appointment})
+       OPTIONAL MATCH (a)-[:SCHEDULED_AT]->(o:OfficeLocation)
+       OPTIONAL MATCH (a)-[:FOR_SERVICE]->(s:Services)
+       RETURN a.appointment_id AS appointment_id, a.status AS status,
+              a.appointment_date AS appointment_date,
+              a.appointment_time AS appointment_time,
+              o.location_name AS office, s.service_name AS service
+       """,
+        render=render_appointment_status,
+        keywords=("status", "confirmed", "cancelled", "pending", "booking"),
+    ),
+]
+
+SLOT_PARAMS = {"office_locations": "office", "services": "service",
+               "appointments": "appointment"}
+
+
+class IntentRouter:
+    """Routes simple FAQ questions to a parameterized query and a markdown template.
+
+    Intents are scored by TF-IDF cosine similarity against a few example
+    phrasings, entity words removed so only the question's shape counts.
+    A question takes the fast path when the best intent is confident, clearly
+    ahead of the runner up, most of its words are known to the intents, and
+    the local extractor found exactly the one entity the intent needs. Everything else goes to the GraphRAG chain.
+    """
+
+    def __init__(self, entity_extractor, intents: Optional[List[Intent]] = None,
+                 min_confidence: float = 0.35, min_margin: float = 0.1,
+                 min_coverage: float = 0.5, history: int = 500):
+        self.entity_extractor = entity_extractor
+        self.intents = {intent.name: intent for intent in (intents or INTENTS)}
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self.min_coverage = min_coverage
+        self._lock = threading.Lock()
+        self.decisions: deque = deque(maxlen=history)
+        self.routes: Counter = Counter()
+        self.intent_counts: Counter = Counter()
+        self.fallbacks = 0
+        self.confidence_total = 0.0
+        self._fit()
+
+    def _fit(self) -> None:
+        """Build an idf table and one normalized vector per intent"""
+        documents = {name: [term for example in intent.examples for term in terms(example)]
+                     for name, intent in self.intents.items()}
+        document_frequency = Counter(
+            term for words in documents.values() for term in set(words))
+        count = len(documents)
+        self.idf = {term: math.log((1 + count) / (1 + df)) + 1
+                    for term, df in document_frequency.items()}
+        # Words no intent uses weigh like the rarest term, they only add to the norm
+        self.unknown_idf = math.log(1 + count) + 1
+        self.vectors = {name: self._vector(words) for name, words in documents.items()}
+        self.keywords = {name: {term for keyword in intent.keywords for term in terms(keyword)}
+                         for name, intent in self.intents.items()}
+
+    def _vector(self, words: List[str]) -> Dict[str, float]:
+        """Normalized tf-idf weights, unknown words lower every intent's cosine"""
+        weights = {term: tf * self.idf.get(term, self.unknown_idf)
+                   for term, tf in Counter(words).items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {term: weight / norm for term, weight in weights.items()} if norm else {}
+
+    def classify(self, text: str) -> List[Tuple[str, float]]:
+        """Intents ranked by cosine similarity to text plus the keyword boost"""
+        words = terms(text)
+        vector = self._vector(words)
+        scores = []
+        for name, intent_vector in self.vectors.items():
+            score = sum(weight * intent_vector.get(term, 0.0)
+                        for term, weight in vector.items())
+            if self.keywords[name].intersection(words):
+                score += KEYWORD_BOOST
+            scores.append((name, min(score, 1.0)))
+        return sorted(scores, key=lambda item: item[1], reverse=True)
+
+    def coverage(self, text: str) -> float:
+        """Share of the content words that some intent's examples use"""
+        words = terms(text)
+        return sum(term in self.idf for term in words) / len(words) if words else 1.0
+
+    def route(self, question: str,
+              extraction: Optional[ExtractionResultV1] = None) -> RouteDecision:
+        """Decide between the fast path and the full chain, reusing extraction if given"""
+        extraction = extraction or self.entity_extractor.extract(question)
+        # Score what is left once entity mentions are removed
+        shape = question
+        for match in extraction.matches:
+            # Mentions are normalized tokens, "mobile topup" must also remove "Mobile Top-up"
+            mention = r"[\W_]*".join(map(re.escape, match.mention.replace(" ", "")))
+            shape = re.sub(mention, " ", shape, flags=re.IGNORECASE)
+        ranked = self.classify(shape)
+        (name, confidence), runner_up = ranked[0], ranked[1][1] if len(ranked) > 1 else 0.0
+
+        def decide(route: str, reason: str, params=None) -> RouteDecision:
+            return self.record(RouteDecision(
+                question, name if confidence > 0 else None, confidence,
+                route, reason, params or {}))
+
+        if confidence < self.min_confidence:
+            return decide("chain", "low_confidence")
+        if confidence - runner_up < self.min_margin:
+            return decide("chain", "ambiguous_intent")
+        if self.coverage(shape) <= self.min_coverage:
+            # e.g. "refund" or "cancel", a request the templates cannot answer
+            return decide("chain", "unknown_terms")
+        if not self.entity_extractor.is_confident(extraction):
+            return decide("chain", "uncertain_entities")
+
+        intent = self.intents[name]
+        entities = extraction.entities
+        values = entities.get(intent.slot) or []
+        if len(values) != 1:
+            return decide("chain", "missing_entity" if not values else "multiple_entities")
+        allowed = {intent.slot, *intent.optional}
+        if any(entities[other] for other in entities if other not in allowed):
+            return decide("chain", "extra_entities")
+
+        params = {SLOT_PARAMS[intent.slot]: values[0]}
+        if "office_hours" in intent.optional:
+            days = entities.get("office_hours") or []
+            if len(days) > 1:
+                return decide("chain", "multiple_entities")
+            params["day"] = days[0] if days else None
+        return decide("fast", "matched", params)
+
+    def render(self, decision: RouteDecision, rows: List[Dict]) -> Optional[str]:
+        """Markdown answer for a fast path decision, None when the query found nothing"""
+        if not rows:
+            self.record_fallback(decision, "no_rows")
+            return None
+        try:
+            return self.intents[decision.intent].render(decision.params, rows)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Error rendering {decision.intent} answer: {e}")
+            self.record_fallback(decision, "render_error")
+            return None
+
+    def query(self, decision: RouteDecision) -> Tuple[str, Dict[str, Any]]:
+        return self.intents[decision.intent].query, decision.params
+
+    def record(self, decision: RouteDecision) -> RouteDecision:
+        with self._lock:
+            self.routes[decision.route] += 1
+            if decision.fast:
+                self.intent_counts[decision.intent] += 1
+            self.confidence_total += decision.confidence
+            self.decisions.append(decision)
+        return decision
+
+    def record_fallback(self, decision: RouteDecision, reason: str) -> None:
+        """The fast path could not answer, the chain answers instead"""
+        with self._lock:
+            self.routes["fast"] -= 1
+            self.routes["chain"] += 1
+            self.intent_counts[decision.intent] -= 1
+            self.fallbacks += 1
+            decision.route, decision.reason = "chain", reason
+
+    def stats(self, recent: int = 20) -> Dict[str, Any]:
+        """How much traffic the fast path takes off the LLM"""
+        with self._lock:
+            total = sum(self.routes.values())
+            fast = self.routes["fast"]
+            return {
+                "decisions": total,
+                "fast": fast,
+                "chain": self.routes["chain"],
+                "fast_rate": fast / total if total else 0.0,
+                "fallbacks": self.fallbacks,
+                "llm_calls_avoided": fast * LLM_CALLS_PER_CHAIN,
+                "mean_confidence": self.confidence_total / total if total else 0.0,
+                "by_intent": dict(self.intent_counts),
+                "recent": [{"timestamp": decision.timestamp,
+                            "question": decision.question, **decision.to_dict()}
+                           for decision in list(self.decisions)[-recent:]],
+            }
@@ -0,0 +1,5 @@
+from .connection import connect_to_neo4j
+from .delta import InvalidationEvent, SyncReport, SyncState, compute_delta, sync
+from .loaders import LOADERS, PHASES, Loader
+from .runner import IngestReport, LoadStats, ingest, load
+from .schema import create_schema
@@ -0,0 +1,78 @@
+import argparse
+import sys
+
+from .connection import connect_to_neo4j
+from .delta import DEFAULT_STATE_FILE, notify, refresh_schema, sync
+from .loaders import LOADERS
+from .runner import DEFAULT_BATCH_SIZE, DEFAULT_DATA_DIR, ingest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m ingestion",
+        description="Bulk load the Paysoko CSV files into Neo4j.")
+    parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR),
+                        help="Directory holding the CSV files")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows per UNWIND batch")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Loaders run in parallel within a phase")
+    parser.add_argument("--only", nargs="+", choices=sorted(LOADERS),
+                        help="Load only these entity types")
+    parser.add_argument("--skip-schema", action="store_true",
+                        help="Do not create constraints and fulltext indexes")
+    parser.add_argument("--sync", action="store_true",
+                        help="Push only rows changed since the last sync")
+    parser.add_argument("--state-file", default=str(DEFAULT_STATE_FILE),
+                        help="Fingerprints of the last sync")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="With --sync, report the delta without writing it")
+    parser.add_argument("--notify",
+                        help="POST the touched labels to this URL, e.g. "
+                             "http://localhost:8000/cache/invalidate, and call "
+                             "/schema/refresh next to it when labels or properties "
+                             "are new")
+    args = parser.parse_args()
+
+    if args.sync and args.dry_run:
+        report = sync(None, data_dir=args.data_dir, state_file=args.state_file,
+                      batch_size=args.batch_size, only=args.only, dry_run=True)
+        print(report.summary())
+        return 0
+
+    driver = connect_to_neo4j(max_connection_pool_size=args.workers + 1)
+    if driver is None:
+        return 1
+    if args.sync:
+        try:
+            report = sync(driver, data_dir=args.data_dir,
+                          state_file=args.state_file,
+                          batch_size=args.batch_size, workers=args.workers,
+                          only=args.only, setup_schema=not args.skip_schema)
+        finally:
+            driver.close()
+        print(report.summary())
+        if args.notify and report.labels:
+            notify(args.notify, report.labels)
+        if args.notify and report.schema_changes:
+            refresh_schema(args.notify)
+        return 0 if report.ok else 1
+
+    try:
+        report = ingest(driver, data_dir=args.data_dir,
+                        batch_size=args.batch_size, workers=args.workers,
+                        only=args.only, setup_schema=not args.skip_schema)
+    finally:
+        driver.close()
+
+    print(report.summary())
+    if args.notify:
+        # A full load may create any label or property
+        selected = args.only or sorted(LOADERS)
+        notify(args.notify, sorted({LOADERS[name].label for name in selected}))
+        refresh_schema(args.notify)
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
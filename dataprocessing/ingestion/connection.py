@@ -0,0 +1,55 @@
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+from neo4j import Driver, GraphDatabase
+from neo4j.exceptions import AuthError, ServiceUnavailable
+
+
+def connect_to_neo4j(max_connection_pool_size: int = 10) -> Optional[Driver]:
+    """
+    Establishes a connection to Neo4j database using environment variables.
+
+    Required environment variables:
+    - NEO4J_URI: The URI of the Neo4j database
+    - NEO4J_USERNAME: Username for authentication
+    - NEO4J_PASSWORD: Password for authentication
+
+    Args:
+        max_connection_pool_size: Upper bound on connections, one per parallel loader is enough
+
+    Returns:
+        Neo4j driver instance if connection is successful, None otherwise
+    """
+    load_dotenv()
+
+    uri = os.getenv("NEO4J_URI")
+    username = os.getenv("NEO4J_USERNAME")
+    password = os.getenv("NEO4J_PASSWORD")
+
+    if not all([uri, username, password]):
+        missing_vars = [var for var, val in
+                        [("NEO4J_URI", uri),
+                         ("NEO4J_USERNAME", username),
+                         ("NEO4J_PASSWORD", password)]
+                        if not val]
+        print(f"Error: Missing required environment variables: {', '.join(missing_vars)}")
+        return None
+
+    try:
+        driver = GraphDatabase.driver(
+            uri, auth=(username, password),
+            max_connection_pool_size=max_connection_pool_size)
+        driver.verify_connectivity()
+        print("Successfully connected to Neo4j database")
+        return driver
+
+    except AuthError as e:
+        print(f"Authentication error: {str(e)}")
+        return None
+    except ServiceUnavailable as e:
+        print(f"Neo4j database is not available: {str(e)}")
+        return None
+    except Exception as e:
+        print(f"An error occurred while connecting to Neo4j: {str(e)}")
+        return None
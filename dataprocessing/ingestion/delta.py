@@ -0,0 +1,314 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urljoin
+
+import requests
+from neo4j import Driver
+
+from .loaders import LOADERS, PHASES, Loader
+from .runner import DEFAULT_BATCH_SIZE, DEFAULT_DATA_DIR, write_batch
+from .schema import create_schema
+
+
+DEFAULT_STATE_FILE = Path(
+    os.getenv("PAYSOKO_SYNC_STATE", Path(__file__).resolve().parents[1] / ".ingestion_state.json"))
+
+
+def row_key(loader: Loader, row: Dict) -> str:
+    """Primary key of a row, stored as a JSON list so composite keys round trip."""
+    return json.dumps([row[column] for column in loader.key])
+
+
+def fingerprint(row: Dict) -> str:
+    """Stable hash of every column in a row."""
+    payload = json.dumps(row, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Delta:
+    """Rows of one CSV file that differ from the previous sync."""
+    loader: Loader
+    inserts: List[Dict] = field(default_factory=list)
+    updates: List[Dict] = field(default_factory=list)
+    deletes: List[Dict] = field(default_factory=list)
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    columns: List[str] = field(default_factory=list)
+
+    @property
+    def upserts(self) -> List[Dict]:
+        return self.inserts + self.updates
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.inserts or self.updates or self.deletes)
+
+
+@dataclass
+class InvalidationEvent:
+    """Tells caches built on the graph which nodes and relationships a sync touched."""
+    label: str
+    operation: str
+    keys: List[Dict]
+    relationships: List[str] = field(default_factory=list)
+    endpoints: List[str] = field(default_factory=list)
+
+    @property
+    def labels(self) -> List[str]:
+        """The node label, relationship types and labels at their other end."""
+        return sorted({self.label, *self.relationships, *self.endpoints})
+
+    def to_dict(self) -> Dict:
+        return {"label": self.label, "operation": self.operation, "keys": self.keys,
+                "relationships": self.relationships, "endpoints": self.endpoints}
+
+
+@dataclass
+class SyncReport:
+    """Per-loader delta sizes, invalidation events and the run time."""
+    deltas: Dict[str, Delta] = field(default_factory=dict)
+    events: List[InvalidationEvent] = field(default_factory=list)
+    schema_changes: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    @property
+    def labels(self) -> List[str]:
+        return sorted({label for event in self.events for label in event.labels})
+
+    def summary(self) -> str:
+        lines = [f"{'loader':<14}{'inserted':>10}{'updated':>9}{'deleted':>9}{'unchanged':>11}"]
+        for name, delta in self.deltas.items():
+            unchanged = len(delta.fingerprints) - len(delta.upserts)
+            lines.append(
+                f"{name:<14}{len(delta.inserts):>10}{len(delta.updates):>9}"
+                f"{len(delta.deletes):>9}{unchanged:>11}")
+        lines.append(f"synced in {self.seconds:.2f}s, invalidated: "
+                     f"{', '.join(self.labels) or 'nothing'}")
+        if self.schema_changes:
+            lines.append(f"new labels or properties: {', '.join(sorted(self.schema_changes))}")
+        return "\n".join(lines)
+
+
+class SyncState:
+    """Fingerprints from the last successful sync, kept in a local JSON file."""
+
+    def __init__(self, path: Path = DEFAULT_STATE_FILE):
+        self.path = Path(path)
+        self.fingerprints: Dict[str, Dict[str, str]] = {}
+        self.columns: Dict[str, List[str]] = {}
+        self.load()
+
+    def load(self) -> None:
+        """Reads the state file, a missing or corrupt file means a full sync."""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                state = json.load(file)
+            self.fingerprints = state.get("fingerprints", {})
+            self.columns = state.get("columns", {})
+        except (OSError, ValueError) as e:
+            print(f"Error reading sync state {self.path}: {str(e)}")
+            self.fingerprints = {}
+            self.columns = {}
+
+    def save(self) -> None:
+        """Writes the state atomically so an interrupted sync keeps the old file."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump({"updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "fingerprints": self.fingerprints,
+                       "columns": self.columns}, file)
+        os.replace(tmp, self.path)
+
+    def get(self, name: str) -> Dict[str, str]:
+        return self.fingerprints.get(name, {})
+
+    def set(self, name: str, fingerprints: Dict[str, str],
+            columns: Optional[List[str]] = None) -> None:
+        self.fingerprints[name] = fingerprints
+        if columns is not None:
+            self.columns[name] = columns
+
+
+def compute_delta(loader: Loader, data_dir: Path, previous: Dict[str, str],
+                  chunk_size: int = DEFAULT_BATCH_SIZE) -> Delta:
+    """Compares the current CSV file against the fingerprints of the last sync.
+
+    Args:
+        loader: Loader describing the CSV file
+        data_dir: Directory holding the CSV files
+        previous: Fingerprints by primary key from the last sync
+        chunk_size: Rows read from the CSV file at a time
+
+    Returns:
+        Delta with the inserted, updated and deleted rows
+    """
+    delta = Delta(loader)
+    for rows in loader.read(data_dir, chunk_size):
+        for row in rows:
+            if not delta.columns:
+                delta.columns = sorted(row)
+            key = row_key(loader, row)
+            digest = fingerprint(row)
+            if key in delta.fingerprints:
+                # Duplicate key in the file, the last row wins as it would with MERGE.
+                delta.inserts = [r for r in delta.inserts if row_key(loader, r) != key]
+                delta.updates = [r for r in delta.updates if row_key(loader, r) != key]
+            delta.fingerprints[key] = digest
+            if key not in previous:
+                delta.inserts.append(row)
+            elif previous[key] != digest:
+                delta.updates.append(row)
+
+    for key in previous.keys() - delta.fingerprints.keys():
+        delta.deletes.append(dict(zip(loader.key, json.loads(key))))
+    return delta
+
+
+def write_rows(driver: Driver, query: str, rows: List[Dict], batch_size: int) -> None:
+    """Writes rows in UNWIND batches, one transaction per batch."""
+    with driver.session() as session:
+        for start in range(0, len(rows), batch_size):
+            session.execute_write(write_batch, query, rows[start:start + batch_size])
+
+
+def apply_delta(driver: Driver, delta: Delta, batch_size: int) -> List[InvalidationEvent]:
+    """Pushes one loader's deletes and upserts to Neo4j.
+
+    Returns:
+        Invalidation events for the rows that were written
+    """
+    loader = delta.loader
+    # Deletes detach and upserts merge the loader's relationships, both change their ends
+    relationships = sorted(loader.relationships)
+    endpoints = sorted(set(loader.relationships.values()))
+    events = []
+    if delta.deletes:
+        write_rows(driver, loader.delete_query, delta.deletes, batch_size)
+        events.append(InvalidationEvent(loader.label, "delete", delta.deletes,
+                                        relationships, endpoints))
+    if delta.upserts:
+        write_rows(driver, loader.query, delta.upserts, batch_size)
+        for operation, rows in (("insert", delta.inserts), ("update", delta.updates)):
+            if rows:
+                keys = [{column: row[column] for column in loader.key} for row in rows]
+                events.append(InvalidationEvent(loader.label, operation, keys,
+                                                relationships, endpoints))
+    return events
+
+
+def notify(url: str, labels: List[str], timeout: float = 10.0) -> bool:
+    """Posts the touched labels to the chatbot's /cache/invalidate endpoint."""
+    try:
+        response = requests.post(url, json={"labels": labels}, timeout=timeout)
+        response.raise_for_status()
+        return True
+    except requests.RequestException as e:
+        print(f"Error notifying {url}: {str(e)}")
+        return False
+
+
+def refresh_schema(url: str, timeout: float = 30.0) -> bool:
+    """Asks the chatbot to reload its schema snapshot after new labels or properties.
+
+    Args:
+        url: The --notify URL, /schema/refresh is resolved next to its /cache/invalidate
+        timeout: Seconds to wait for the refresh
+
+    Returns:
+        True if the chatbot refreshed its schema
+    """
+    schema_url = urljoin(url, "../schema/refresh")
+    try:
+        response = requests.post(schema_url, timeout=timeout)
+        response.raise_for_status()
+        return True
+    except requests.RequestException as e:
+        print(f"Error refreshing schema at {schema_url}: {str(e)}")
+        return False
+
+
+def sync(driver: Optional[Driver], data_dir: Path = DEFAULT_DATA_DIR,
+         state_file: Path = DEFAULT_STATE_FILE,
+         batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 2,
+         only: Optional[Iterable[str]] = None, dry_run: bool = False,
+         setup_schema: bool = True,
+         on_invalidate: Optional[Callable[[InvalidationEvent], None]] = None) -> SyncReport:
+    """Pushes only the rows that changed since the last sync to Neo4j.
+
+    Loaders run phase by phase like a full load so relationships find their
+    nodes, each loader deletes before it upserts. A loader's fingerprints are only saved once all
+    of its writes succeeded, so a failed loader is retried on the next run.
+
+    Args:
+        driver: Neo4j driver instance, may be None for a dry run
+        data_dir: Directory holding the CSV files
+        state_file: JSON file holding the fingerprints of the last sync
+        batch_size: Rows per UNWIND batch
+        workers: Number of loaders run at once within a phase
+        only: Optional subset of loader names to sync
+        dry_run: Compute and report the delta without writing anything
+        setup_schema: Whether to create constraints and indexes first
+        on_invalidate: Called with every invalidation event after its write
+
+    Returns:
+        SyncReport with the delta sizes and invalidation events
+    """
+    selected = set(only) if only else set(LOADERS)
+    unknown = selected - set(LOADERS)
+    if unknown:
+        raise ValueError(f"Unknown loaders: {', '.join(sorted(unknown))}")
+
+    report = SyncReport()
+    start = time.perf_counter()
+    state = SyncState(state_file)
+    for phase in PHASES:
+        for name in phase:
+            if name in selected:
+                report.deltas[name] = compute_delta(
+                    LOADERS[name], data_dir, state.get(name), batch_size)
+
+    if dry_run:
+        report.seconds = time.perf_counter() - start
+        return report
+
+    if setup_schema and any(delta.changed for delta in report.deltas.values()):
+        create_schema(driver)
+
+    def run(name: str) -> None:
+        delta = report.deltas[name]
+        try:
+            events = apply_delta(driver, delta, batch_size) if delta.changed else []
+        except Exception as e:
+            report.errors.append(f"{name}: {str(e)}")
+            print(f"Error syncing {delta.loader.filename}: {str(e)}")
+            return
+        if delta.columns and delta.columns != state.columns.get(name):
+            # A label seen for the first time or a CSV with new columns
+            report.schema_changes.append(delta.loader.label)
+        state.set(name, delta.fingerprints, delta.columns or None)
+        report.events.extend(events)
+        if on_invalidate:
+            for event in events:
+                on_invalidate(event)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for phase in PHASES:
+            list(pool.map(run, [name for name in phase if name in selected]))
+
+    state.save()
+    report.seconds = time.perf_counter() - start
+    return report
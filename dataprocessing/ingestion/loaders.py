@@ -0,0 +1,155 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+
+OFFICES_QUERY = """
+UNWIND $rows AS row
+MERGE (o:OfficeLocation {office_id: row.office_id})
+SET
+    o.location_name = row.location_name,
+    o.address = row.address,
+    o.region = row.region,
+    o.phone_number = row.phone_number,
+    o.created_at = coalesce(o.created_at, datetime()),
+    o.last_updated = datetime()
+"""
+
+SERVICES_QUERY = """
+UNWIND $rows AS row
+MERGE (s:Services {service_id: row.service_id})
+SET
+    s.service_name = row.service_name,
+    s.description = row.description,
+    s.cost_ksh = row.cost_ksh,
+    s.duration_minutes = row.duration_minutes,
+    s.created_at = coalesce(s.created_at, datetime()),
+    s.last_updated = datetime()
+"""
+
+OFFICE_HOURS_QUERY = """
+UNWIND $rows AS row
+MERGE (oh:OfficeHour {office_id: row.office_id, day_of_week: row.day_of_week})
+SET
+    oh.opening_time = row.opening_time,
+    oh.closing_time = row.closing_time,
+    oh.created_at = coalesce(oh.created_at, datetime()),
+    oh.last_updated = datetime()
+WITH oh, row
+MATCH (o:OfficeLocation {office_id: row.office_id})
+MERGE (o)-[:WORKING_HOURS]->(oh)
+"""
+
+APPOINTMENTS_QUERY = """
+UNWIND $rows AS row
+MERGE (a:Appointment {appointment_id: row.appointment_id})
+SET
+    a.customer_id = row.customer_id,
+    a.office_id = row.office_id,
+    a.service_id = row.service_id,
+    a.appointment_date = row.appointment_date,
+    a.appointment_time = row.appointment_time,
+    a.status = row.status,
+    a.created_at = coalesce(a.created_at, datetime()),
+    a.last_updated = datetime()
+WITH a, row
+CALL {
+    WITH a, row
+    MATCH (a)-[old:SCHEDULED_AT]->(prev:OfficeLocation)
+    WHERE prev.office_id <> row.office_id
+    DELETE old
+}
+CALL {
+    WITH a, row
+    MATCH (a)-[old:FOR_SERVICE]->(prev:Services)
+    WHERE prev.service_id <> row.service_id
+    DELETE old
+}
+MATCH (o:OfficeLocation {office_id: row.office_id})
+MATCH (s:Services {service_id: row.service_id})
+MERGE (a)-[sa:SCHEDULED_AT]->(o)
+SET sa.status = row.status, sa.created_at = coalesce(sa.created_at, datetime())
+MERGE (a)-[fs:FOR_SERVICE]->(s)
+SET fs.status = row.status, fs.created_at = coalesce(fs.created_at, datetime())
+"""
+
+
+@dataclass
+class Loader:
+    """Describes how one CSV file becomes one kind of node."""
+    name: str
+    filename: str
+    label: str
+    query: str
+    key: List[str]
+    dtypes: Dict[str, str] = field(default_factory=dict)
+    transform: Optional[Callable[[Dict], Dict]] = None
+    # Relationship types the query writes, with the label at their other end
+    relationships: Dict[str, str] = field(default_factory=dict)
+
+    def read(self, data_dir: Path, chunk_size: int) -> Iterator[List[Dict]]:
+        """Yields the CSV as lists of row dictionaries, chunk_size rows at a time.
+
+        Args:
+            data_dir: Directory holding the CSV files
+            chunk_size: Number of rows per chunk, also the UNWIND batch size
+
+        Returns:
+            Iterator of row batches ready to be passed as $rows
+        """
+        path = Path(data_dir) / self.filename
+        for chunk in pd.read_csv(path, chunksize=chunk_size, dtype=str,
+                                 keep_default_na=False):
+            rows = chunk.to_dict("records")
+            if self.transform:
+                rows = [self.transform(row) for row in rows]
+            yield rows
+
+    @property
+    def delete_query(self) -> str:
+        """UNWIND query removing the nodes whose key columns are given in $rows."""
+        match = ", ".join(f"{column}: row.{column}" for column in self.key)
+        return f"""
+UNWIND $rows AS row
+MATCH (n:{self.label} {{{match}}})
+DETACH DELETE n
+"""
+
+
+def to_int(value: str) -> Optional[int]:
+    """Parses a numeric CSV cell, leaving blanks as None."""
+    value = value.strip()
+    return int(float(value)) if value else None
+
+
+def service_row(row: Dict) -> Dict:
+    """Casts the numeric service columns so filters like cost_ksh < 100 work."""
+    row["cost_ksh"] = to_int(row["cost_ksh"])
+    row["duration_minutes"] = to_int(row["duration_minutes"])
+    return row
+
+
+LOADERS = {
+    "offices": Loader("offices", "office_locations.csv", "OfficeLocation",
+                      OFFICES_QUERY, key=["office_id"]),
+    "services": Loader("services", "services.csv", "Services",
+                       SERVICES_QUERY, key=["service_id"],
+                       transform=service_row),
+    "office_hours": Loader("office_hours", "office_hours.csv", "OfficeHour",
+                           OFFICE_HOURS_QUERY,
+                           key=["office_id", "day_of_week"],
+                           relationships={"WORKING_HOURS": "OfficeLocation"}),
+    "appointments": Loader("appointments", "appointments.csv", "Appointment",
+                           APPOINTMENTS_QUERY, key=["appointment_id"],
+                           relationships={"SCHEDULED_AT": "OfficeLocation",
+                                          "FOR_SERVICE": "Services"}),
+}
+
+# Relationship loaders MATCH the nodes written in the phase before them,
+# everything inside one phase is independent and runs in parallel.
+PHASES = [
+    ["offices", "services"],
+    ["office_hours", "appointments"],
+]
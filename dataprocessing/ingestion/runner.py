@@ -0,0 +1,133 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from neo4j import Driver
+
+from .loaders import LOADERS, PHASES, Loader
+from .schema import create_schema
+
+
+DEFAULT_DATA_DIR = Path(
+    os.getenv("PAYSOKO_DATA_DIR", Path(__file__).resolve().parents[2] / "data"))
+DEFAULT_BATCH_SIZE = 1000
+
+
+@dataclass
+class LoadStats:
+    """Rows written and time spent for one loader."""
+    name: str
+    rows: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class IngestReport:
+    """Per-loader stats plus the wall clock time of the whole run."""
+    loaders: Dict[str, LoadStats] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return sum(stats.rows for stats in self.loaders.values())
+
+    @property
+    def ok(self) -> bool:
+        return not any(stats.errors for stats in self.loaders.values())
+
+    def summary(self) -> str:
+        lines = [f"{'loader':<14}{'rows':>8}{'batches':>9}{'seconds':>10}{'rows/sec':>11}"]
+        for stats in self.loaders.values():
+            lines.append(
+                f"{stats.name:<14}{stats.rows:>8}{stats.batches:>9}"
+                f"{stats.seconds:>10.2f}{stats.rows_per_second:>11.1f}")
+        rate = self.rows / self.seconds if self.seconds else 0.0
+        lines.append(f"{'total':<14}{self.rows:>8}{'':>9}{self.seconds:>10.2f}{rate:>11.1f}")
+        return "\n".join(lines)
+
+
+def write_batch(tx, query: str, rows: List[Dict]) -> None:
+    """Writes one UNWIND batch inside a managed transaction."""
+    tx.run(query, rows=rows).consume()
+
+
+def load(driver: Driver, loader: Loader, data_dir: Path,
+         batch_size: int = DEFAULT_BATCH_SIZE) -> LoadStats:
+    """Streams one CSV file into Neo4j, one transaction per batch.
+
+    Args:
+        driver: Neo4j driver instance
+        loader: Loader describing the CSV file and its MERGE query
+        data_dir: Directory holding the CSV files
+        batch_size: Rows per UNWIND batch
+
+    Returns:
+        LoadStats for the loader, failed batches are recorded in errors
+    """
+    stats = LoadStats(loader.name)
+    start = time.perf_counter()
+    with driver.session() as session:
+        for rows in loader.read(data_dir, batch_size):
+            try:
+                session.execute_write(write_batch, loader.query, rows)
+                stats.rows += len(rows)
+                stats.batches += 1
+            except Exception as e:
+                message = f"batch {stats.batches + 1} of {loader.name} failed: {str(e)}"
+                print(f"Error importing {loader.filename}: {message}")
+                stats.errors.append(message)
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def ingest(driver: Driver, data_dir: Path = DEFAULT_DATA_DIR,
+           batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 2,
+           only: Optional[Iterable[str]] = None,
+           setup_schema: bool = True) -> IngestReport:
+    """Loads every CSV file into Neo4j, phase by phase.
+
+    Constraints and fulltext indexes are created first so each MERGE is an
+    index lookup. Loaders inside a phase run in parallel on their own sessions.
+
+    Args:
+        driver: Neo4j driver instance
+        data_dir: Directory holding the CSV files
+        batch_size: Rows per UNWIND batch
+        workers: Number of loaders run at once within a phase
+        only: Optional subset of loader names to run
+        setup_schema: Whether to create constraints and indexes first
+
+    Returns:
+        IngestReport with rows, batches and rows/sec per loader
+    """
+    selected = set(only) if only else set(LOADERS)
+    unknown = selected - set(LOADERS)
+    if unknown:
+        raise ValueError(f"Unknown loaders: {', '.join(sorted(unknown))}")
+
+    report = IngestReport()
+    start = time.perf_counter()
+    if setup_schema:
+        create_schema(driver)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for phase in PHASES:
+            names = [name for name in phase if name in selected]
+            futures = {
+                name: pool.submit(load, driver, LOADERS[name], data_dir, batch_size)
+                for name in names
+            }
+            for name, future in futures.items():
+                report.loaders[name] = future.result()
+
+    report.seconds = time.perf_counter() - start
+    return report
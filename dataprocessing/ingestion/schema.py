@@ -0,0 +1,58 @@
+from neo4j import Driver
+
+
+CONSTRAINTS = [
+    """
+    CREATE CONSTRAINT office_id_unique IF NOT EXISTS
+    FOR (o:OfficeLocation) REQUIRE o.office_id IS UNIQUE
+    """,
+    """
+    CREATE CONSTRAINT service_id_unique IF NOT EXISTS
+    FOR (s:Services) REQUIRE s.service_id IS UNIQUE
+    """,
+    """
+    CREATE CONSTRAINT appointment_id_unique IF NOT EXISTS
+    FOR (a:Appointment) REQUIRE a.appointment_id IS UNIQUE
+    """,
+    """
+    CREATE CONSTRAINT office_hour_unique IF NOT EXISTS
+    FOR (h:OfficeHour) REQUIRE (h.office_id, h.day_of_week) IS UNIQUE
+    """,
+]
+
+FULLTEXT_INDEXES = [
+    """
+    CREATE FULLTEXT INDEX locationIndex IF NOT EXISTS FOR (n:OfficeLocation)
+    ON EACH [n.location_name, n.address, n.region]
+    """,
+    """
+    CREATE FULLTEXT INDEX serviceIndex IF NOT EXISTS FOR (n:Services)
+    ON EACH [n.service_name, n.description]
+    """,
+    """
+    CREATE FULLTEXT INDEX appointmentIndex IF NOT EXISTS FOR (n:Appointment)
+    ON EACH [n.appointment_id, n.customer_id]
+    """,
+    """
+    CREATE FULLTEXT INDEX officeHours IF NOT EXISTS FOR (o:OfficeHour)
+    ON EACH [o.day_of_week, o.opening_time, o.closing_time]
+    """,
+]
+
+
+def create_schema(driver: Driver) -> None:
+    """Creates the unique constraints and fulltext indexes before any data is loaded.
+
+    The constraints also back the MERGE lookups, so batches stay fast as the
+    graph grows.
+
+    Args:
+        driver: Neo4j driver instance
+    """
+    with driver.session() as session:
+        for statement in CONSTRAINTS + FULLTEXT_INDEXES:
+            try:
+                session.run(statement).consume()
+            except Exception as e:
+                print(f"Error creating schema: {str(e)}")
+        session.run("CALL db.awaitIndexes(300)").consume()
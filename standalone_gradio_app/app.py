@@ -1,13 +1,16 @@
+import html
 import gradio as gr
 import pandas as pd
 from qa_chatbot import PaysokoQA
 from qa_logger import QALogger
+from qa_log_reader import QALogReader
 
 
 class PaysokoGradioApp:
     def __init__(self):
         self.qa = PaysokoQA()
-        self.logger = QALogger()
+        self.logger = QALogger(batched=True)
+        self.log_reader = QALogReader("qa_logs.csv")
 
     def chat(self, message, tone, history):
         """Handle chat interactions"""
@@ -17,18 +20,30 @@ class PaysokoGradioApp:
         history.append([message, response])
         return history, history
 
-    def load_logs(self):
-        """Load and format chat logs"""
+    def load_logs(self, search="", page=1, page_size=50):
+        """Load and format one page of chat logs, newest first"""
         try:
-            df = pd.read_csv("qa_logs.csv")
+            page = max(1, int(page or 1))
+            page_size = max(1, int(page_size or 50))
+            if search:
+                rows = self.log_reader.search(search, page, page_size)
+                summary = f"Page {page} of matches for '{search}'"
+            else:
+                rows = self.log_reader.page(page, page_size)
+                total = f"{self.log_reader.count()}{'' if self.log_reader.complete else '+'}"
+                first = (page - 1) * page_size + 1
+                summary = (f"Showing {first}-{first + len(rows) - 1} of {total} "
+                           f"(newest first)" if rows else f"No rows on page {page} of {total}")
+            df = pd.DataFrame(rows, columns=self.log_reader.header or None)
             styled_html = f"""
             <div style="background-color: #1f2937; color: white; padding: 20px;">
+                <p>{html.escape(summary)}</p>
                 {df.to_html(index=False, classes="styled-table")}
             </div>
             """
             return styled_html
         except Exception as e:
-            return f"Error loading logs: {str(e)}"
+            return html.escape(f"Error loading logs: {str(e)}")
 
     def create_interface(self):
         """Create Gradio interface"""
@@ -113,6 +128,20 @@ class PaysokoGradioApp:
                         clear = gr.Button("Clear", variant="secondary")
 
                 with gr.Tab("Logs"):
+                    with gr.Row():
+                        log_search = gr.Textbox(
+                            label="Search",
+                            placeholder="Filter questions and answers...",
+                            scale=3
+                        )
+                        log_page = gr.Number(label="Page", value=1, precision=0,
+                                             minimum=1, scale=1)
+                        log_page_size = gr.Dropdown(
+                            choices=[25, 50, 100, 200],
+                            label="Rows per page",
+                            value=50,
+                            scale=1
+                        )
                     logs_display = gr.HTML()
                     refresh_btn = gr.Button("Refresh Logs", variant="primary")
 
@@ -130,8 +159,12 @@ class PaysokoGradioApp:
             ).then(lambda: "", None, msg)
 
             clear.click(lambda: ([], []), None, [chatbot, state])
-            refresh_btn.click(self.load_logs, None, logs_display)
-            interface.load(self.load_logs, None, logs_display)
+            log_inputs = [log_search, log_page, log_page_size]
+            refresh_btn.click(self.load_logs, log_inputs, logs_display)
+            log_search.submit(self.load_logs, log_inputs, logs_display)
+            log_page.change(self.load_logs, log_inputs, logs_display)
+            log_page_size.change(self.load_logs, log_inputs, logs_display)
+            interface.load(self.load_logs, log_inputs, logs_display)
 
         return interface
 
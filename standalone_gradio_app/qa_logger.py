@@ -2,10 +2,14 @@ import csv
 from datetime import datetime
 import os
 
+from async_qa_logger import AsyncQALogger
+
 
 class QALogger:
-    def __init__(self, filename="qa_logs.csv"):
+    def __init__(self, filename="qa_logs.csv", batched=False):
         self.filename = filename
+        # Batched mode hands rows to a background writer thread
+        self.writer = AsyncQALogger(filename) if batched else None
         self.setup_csv()
 
     def setup_csv(self):
@@ -17,7 +21,15 @@ class QALogger:
 
     def log_qa(self, question: str, response: str):
         """Log a question-answer pair to CSV"""
+        if self.writer is not None:
+            self.writer.log_qa(question, response)
+            return
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         with open(self.filename, 'a', newline='') as file:
             writer = csv.writer(file)
             writer.writerow([timestamp, question, response])
+
+    def close(self):
+        """Flush queued rows when running in batched mode"""
+        if self.writer is not None:
+            self.writer.close()
@@ -2,6 +2,7 @@ import streamlit as st
 import time
 from qa_chatbot import PaysokoQA
 from qa_logger import QALogger
+from qa_log_reader import QALogReader
 import pandas as pd
 import os
 
@@ -9,6 +10,12 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 image_path = os.path.join(current_dir, "images", "paysoko_chatbot.png")
 
 
+@st.cache_resource
+def get_log_reader(filename: str) -> QALogReader:
+    """One reader per process so its row index survives reruns"""
+    return QALogReader(filename)
+
+
 class PaysokoStreamlitApp:
     def __init__(self):
         self.qa = PaysokoQA()
@@ -103,11 +110,33 @@ class PaysokoStreamlitApp:
     def display_logs(self):
         st.title("Chat Logs")
 
-        try:
-            df = pd.read_csv("qa_logs.csv")
-            st.dataframe(df, use_container_width=True, hide_index=True)
-        except FileNotFoundError:
+        reader = get_log_reader("qa_logs.csv")
+        if reader.refresh() == 0 and not reader.rotated_files():
             st.warning("No logs found. Start chatting to generate logs.")
+            return
+
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            search = st.text_input("Search", key="log_search")
+        with col2:
+            page = st.number_input("Page", min_value=1, value=1, step=1,
+                                   key="log_page")
+        with col3:
+            page_size = st.selectbox("Rows per page", [25, 50, 100, 200],
+                                     index=1, key="log_page_size")
+
+        if search:
+            rows = reader.search(search, int(page), page_size)
+            st.caption(f"Page {page} of matches for '{search}'")
+        else:
+            rows = reader.page(int(page), page_size)
+            # Older rows are indexed only as pages reach them, so the total can grow
+            more = "" if reader.complete else "+"
+            st.caption(f"Page {page} of {max(1, -(-reader.count() // page_size))}{more} "
+                       f"({reader.count()}{more} rows, newest first)")
+
+        df = pd.DataFrame(rows, columns=reader.header or None)
+        st.dataframe(df, use_container_width=True, hide_index=True)
 
     def run(self):
         self.initialize_session_state()
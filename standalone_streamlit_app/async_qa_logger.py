@@ -0,0 +1,177 @@
+import atexit
+import csv
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+class AsyncQALogger:
+    """Drop-in replacement for QALogger that never blocks the caller.
+
+    log_qa only puts the record on a bounded in-memory queue; a background
+    thread writes queued rows in batches with a single file open per batch
+    and rotates the file once it passes max_bytes or the day changes. When
+    the queue is full records are dropped and counted rather than stalling
+    the request.
+    """
+
+    HEADER = ['timestamp', 'question', 'response', 'stage_latencies']
+
+    def __init__(self, filename: str = "qa_logs.csv", max_queue: int = 10000,
+                 batch_size: int = 200, flush_interval: float = 1.0,
+                 max_bytes: Optional[int] = 10 * 1024 * 1024,
+                 rotate_daily: bool = True, backup_count: int = 30,
+                 on_rotate: Optional[Callable[[str], None]] = None):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.backup_count = backup_count
+        # Called from the writer thread with the path of each rotated file
+        self.on_rotate = on_rotate
+        self._queue: "queue.Queue[Optional[List[str]]]" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        if self._has_old_header():
+            self.rotate()
+        self.setup_csv()
+        self._thread = threading.Thread(
+            target=self._run, name="qa-logger", daemon=True)
+        self._thread.start()
+        # Do not lose queued rows when the process exits normally
+        atexit.register(self.close)
+
+    def setup_csv(self):
+        """Create CSV file with headers if it doesn't exist"""
+        if not os.path.exists(self.filename):
+            with open(self.filename, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(self.HEADER)
+
+    def _has_old_header(self) -> bool:
+        """True if the existing file was written without the latency column"""
+        if not os.path.exists(self.filename):
+            return False
+        with open(self.filename, newline='') as file:
+            return next(csv.reader(file), self.HEADER) != self.HEADER
+
+    def log_qa(self, question: str, response: str,
+               stage_latencies: Optional[Dict[str, Any]] = None):
+        """Queue a question-answer pair, returns immediately"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        latencies = json.dumps(stage_latencies) if stage_latencies else ""
+        self._enqueue([timestamp, question, response, latencies])
+
+    def _enqueue(self, row: List[str]) -> bool:
+        try:
+            if self._closed:
+                raise queue.Full
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self._count_dropped(1)
+            return False
+
+    def _count_dropped(self, count: int):
+        with self._lock:
+            self.dropped += count
+
+    def _run(self):
+        running = True
+        while running:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if row is None:
+                    running = False
+                    break
+                batch.append(row)
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    self._count_dropped(len(batch))
+                    print(f"Error writing QA logs: {e}")
+
+    def _write(self, batch: List[List[str]]):
+        if self._should_rotate():
+            self.rotate()
+        self.setup_csv()
+        with open(self.filename, 'a', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerows(batch)
+        self.written += len(batch)
+        self.batches += 1
+
+    def _should_rotate(self) -> bool:
+        if not os.path.exists(self.filename):
+            return False
+        if self.max_bytes and os.path.getsize(self.filename) >= self.max_bytes:
+            return True
+        if self.rotate_daily:
+            modified = date.fromtimestamp(os.path.getmtime(self.filename))
+            return modified != date.today()
+        return False
+
+    def rotated_files(self) -> List[str]:
+        """Rotated log files, oldest first"""
+        root, ext = os.path.splitext(self.filename)
+        return sorted(glob.glob(f"{root}.*{ext}"))
+
+    def rotate(self) -> Optional[str]:
+        """Move the current file aside as <name>.<timestamp>-<seq>.csv"""
+        if not os.path.exists(self.filename):
+            return None
+        root, ext = os.path.splitext(self.filename)
+        stamp = datetime.fromtimestamp(os.path.getmtime(self.filename))
+        # Sequence suffix keeps names unique and sorted oldest first
+        sequence = 0
+        rotated = f"{root}.{stamp.strftime('%Y%m%d-%H%M%S')}-{sequence:03d}{ext}"
+        while os.path.exists(rotated):
+            sequence += 1
+            rotated = f"{root}.{stamp.strftime('%Y%m%d-%H%M%S')}-{sequence:03d}{ext}"
+        os.replace(self.filename, rotated)
+        self.rotations += 1
+        if self.on_rotate is not None:
+            try:
+                self.on_rotate(rotated)
+            except Exception as e:
+                print(f"Error handling rotated QA log {rotated}: {e}")
+        if self.backup_count:
+            for old in self.rotated_files()[:-self.backup_count]:
+                if os.path.exists(old):
+                    os.remove(old)
+        return rotated
+
+    def close(self, timeout: float = 5.0):
+        """Flush everything still queued and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """Queue depth and write/drop counters"""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "dropped": self.dropped,
+            "written": self.written,
+            "batches": self.batches,
+            "rotations": self.rotations,
+        }
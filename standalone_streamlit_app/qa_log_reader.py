@@ -0,0 +1,283 @@
+import csv
+import glob
+import io
+import os
+import re
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# Every logged row starts with its timestamp, used to find row starts mid-file
+ROW_START = re.compile(rb"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},")
+
+
+class QALogSegment:
+    """Paginated reader for one QA log file that never loads the whole file.
+
+    The reader keeps a byte-offset index of where rows start. The first
+    refresh seeks to the last backfill_bytes of the file and indexes only
+    those rows; older rows are indexed a block at a time, backwards, when a
+    page or search reaches them. Later refreshes only scan the bytes appended
+    since the last call. Responses contain newlines, so moving forward row
+    boundaries are found by tracking CSV quote parity. Moving backwards they
+    are lines starting with a timestamp, the first column of every row.
+    """
+
+    def __init__(self, filename: str = "qa_logs.csv", backfill_bytes: int = 256 * 1024):
+        self.filename = filename
+        self.backfill_bytes = backfill_bytes
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.header: List[str] = []
+        # Start offset of every indexed row, oldest first
+        self._offsets = array("q")
+        # Indexed rows cover [_indexed_from, _indexed_to), data starts after the header
+        self._data_start = 0
+        self._indexed_from = 0
+        self._indexed_to = 0
+        self._file_id: Optional[Tuple[int, int]] = None
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the file has been opened by refresh"""
+        return self._file_id is not None
+
+    @property
+    def complete(self) -> bool:
+        """Whether every row of the file is indexed"""
+        return self._indexed_from <= self._data_start
+
+    def _row_starts(self, file, begin: int, end: int) -> List[int]:
+        """Offsets in [begin, end) of lines that start a row"""
+        file.seek(begin)
+        chunk = file.read(end - begin)
+        starts = []
+        position = 0
+        if begin > self._data_start:
+            # Skip the partial line the block starts in, unless it starts on a line
+            file.seek(begin - 1)
+            if file.read(1) != b"\n":
+                position = chunk.find(b"\n") + 1 if b"\n" in chunk else len(chunk)
+        while position < len(chunk):
+            if ROW_START.match(chunk, position):
+                starts.append(begin + position)
+            newline = chunk.find(b"\n", position)
+            if newline < 0:
+                break
+            position = newline + 1
+        return starts
+
+    def _open(self, file, size: int) -> None:
+        """Read the header and place the index at the last backfill_bytes"""
+        header = file.readline()
+        if not header.endswith(b"\n"):
+            return
+        self.header = next(csv.reader(io.StringIO(header.decode("utf-8"))))
+        self._data_start = self._indexed_from = self._indexed_to = len(header)
+        start = max(self._data_start, size - self.backfill_bytes)
+        if start > self._data_start:
+            starts = self._row_starts(file, start, size)
+            # No row start in the tail means one huge row, index it all
+            self._indexed_from = self._indexed_to = starts[0] if starts else self._data_start
+
+    def refresh(self) -> int:
+        """Index rows appended since the last refresh, returns the indexed row count"""
+        with self._lock:
+            if not os.path.exists(self.filename):
+                self._reset()
+                return 0
+            stat = os.stat(self.filename)
+            file_id = (stat.st_dev, stat.st_ino)
+            if file_id != self._file_id or stat.st_size < self._indexed_to:
+                # Rotated or truncated, start over
+                self._reset()
+                self._file_id = file_id
+            if self.header and stat.st_size == self._indexed_to:
+                return self.count()
+
+            with open(self.filename, "rb") as file:
+                if not self.header:
+                    self._open(file, stat.st_size)
+                    if not self.header:
+                        return 0
+                file.seek(self._indexed_to)
+                row_start = position = self._indexed_to
+                in_quotes = False
+                for line in file:
+                    position += len(line)
+                    if line.count(b'"') % 2:
+                        in_quotes = not in_quotes
+                    if in_quotes or not line.endswith(b"\n"):
+                        # Row continues, or is still being written
+                        continue
+                    self._offsets.append(row_start)
+                    row_start = position
+                    self._indexed_to = position
+            return self.count()
+
+    def backfill(self) -> bool:
+        """Index the block of rows before the oldest indexed one, False if there are none"""
+        with self._lock:
+            if self.complete or not self.header:
+                return False
+            with open(self.filename, "rb") as file:
+                begin = self._indexed_from
+                starts: List[int] = []
+                while not starts and begin > self._data_start:
+                    begin = max(self._data_start, begin - self.backfill_bytes)
+                    starts = self._row_starts(file, begin, self._indexed_from)
+            if not starts:
+                self._indexed_from = self._data_start
+                return False
+            self._offsets = array("q", starts) + self._offsets
+            self._indexed_from = starts[0]
+            return True
+
+    def count(self) -> int:
+        return len(self._offsets)
+
+    def _read_rows(self, start: int, stop: int) -> List[Dict[str, str]]:
+        """Indexed rows [start, stop) in file order, read with one seek"""
+        if start >= stop:
+            return []
+        begin = self._offsets[start]
+        end = self._offsets[stop] if stop < len(self._offsets) else self._indexed_to
+        with open(self.filename, "rb") as file:
+            file.seek(begin)
+            chunk = file.read(end - begin).decode("utf-8")
+        return [dict(zip(self.header, row)) for row in csv.reader(io.StringIO(chunk))]
+
+
+class QALogReader:
+    """Paginated reader for qa_logs.csv and the files rotated out of it.
+
+    Rotated files (qa_logs.<timestamp>-<seq>.csv) come first, oldest first,
+    then the live file, so row numbers run from the oldest indexed question
+    to the newest. Files are indexed from their end, and older rows and
+    older files only when a page or search needs them, so the first load
+    costs the same however long the logs are.
+    """
+
+    def __init__(self, filename: str = "qa_logs.csv", backfill_bytes: int = 256 * 1024):
+        self.filename = filename
+        self.backfill_bytes = backfill_bytes
+        self.live = QALogSegment(filename, backfill_bytes)
+        self._rotated: Dict[str, QALogSegment] = {}
+        self._segments: List[QALogSegment] = [self.live]
+
+    @property
+    def header(self) -> List[str]:
+        for segment in reversed(self._segments):
+            if segment.header:
+                return segment.header
+        return []
+
+    @property
+    def complete(self) -> bool:
+        """Whether count() covers every logged row"""
+        return all((segment.loaded or segment is self.live) and segment.complete
+                   for segment in self._segments)
+
+    def rotated_files(self) -> List[str]:
+        """Rotated log files, oldest first, named the way AsyncQALogger rotates"""
+        root, ext = os.path.splitext(self.filename)
+        return sorted(glob.glob(f"{root}.*{ext}"))
+
+    def _visible(self) -> List[QALogSegment]:
+        """Newest segments whose rows are contiguous with the live file, oldest first"""
+        visible = []
+        for segment in reversed(self._segments):
+            if not segment.loaded and segment is not self.live:
+                break
+            visible.append(segment)
+            if not segment.complete:
+                break
+        return visible[::-1]
+
+    def refresh(self) -> int:
+        """Pick up new and deleted rotated files and rows appended to the live file"""
+        files = self.rotated_files()
+        self._rotated = {path: self._rotated.get(path) or QALogSegment(path, self.backfill_bytes)
+                         for path in files}
+        self._segments = [self._rotated[path] for path in files] + [self.live]
+        self.live.refresh()
+        return self.count()
+
+    def _ensure(self, rows: int) -> bool:
+        """Index until at least rows newest rows are known, True if anything was added"""
+        added = False
+        for segment in reversed(self._segments):
+            if not segment.loaded and segment is not self.live:
+                # Rotated files never change, they are opened once when first reached
+                added = segment.refresh() > 0 or added
+            while segment.count() < rows and segment.backfill():
+                added = True
+            rows -= segment.count()
+            if rows <= 0 or not segment.complete:
+                break
+        return added
+
+    def count(self) -> int:
+        return sum(segment.count() for segment in self._visible())
+
+    def _read_rows(self, start: int, stop: int) -> List[Dict[str, str]]:
+        """Rows [start, stop) across the visible segments in logging order"""
+        rows = []
+        offset = 0
+        for segment in self._visible():
+            size = segment.count()
+            if start < offset + size and stop > offset:
+                rows += segment._read_rows(max(start - offset, 0), min(stop - offset, size))
+            offset += size
+        return rows
+
+    def page(self, page: int = 1, page_size: int = 50,
+             newest_first: bool = True) -> List[Dict[str, str]]:
+        """One page of rows, page 1 holds the newest rows by default"""
+        self.refresh()
+        if newest_first:
+            self._ensure(page * page_size)
+            total = self.count()
+            stop = max(0, total - (page - 1) * page_size)
+            rows = self._read_rows(max(0, stop - page_size), stop)
+            return rows[::-1]
+        # Counting from the oldest row needs the whole index
+        while self._ensure(self.count() + 10 * page_size):
+            pass
+        start = (page - 1) * page_size
+        return self._read_rows(start, min(self.count(), start + page_size))
+
+    def tail(self, n: int = 50) -> List[Dict[str, str]]:
+        """The newest n rows, newest first"""
+        return self.page(1, n)
+
+    def search(self, text: str, page: int = 1, page_size: int = 50,
+               block_size: int = 500) -> List[Dict[str, str]]:
+        """Rows whose question or response contain text, newest first.
+
+        Blocks are scanned backwards from the end, indexing older rows as
+        they are reached, and scanning stops as soon as the requested page
+        is full, so recent matches are cheap.
+        """
+        self.refresh()
+        needle = text.lower()
+        wanted = page * page_size
+        matches = []
+        # Rows scanned so far, counted from the newest, stable while older rows are indexed
+        scanned = 0
+        while len(matches) < wanted:
+            total = self.count()
+            if scanned >= total:
+                if not self._ensure(total + block_size):
+                    break
+                total = self.count()
+            stop = total - scanned
+            start = max(0, stop - block_size)
+            for row in reversed(self._read_rows(start, stop)):
+                if (needle in row.get("question", "").lower()
+                        or needle in row.get("response", "").lower()):
+                    matches.append(row)
+            scanned = total - start
+        return matches[(page - 1) * page_size:wanted]